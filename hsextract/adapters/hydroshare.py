@@ -4,13 +4,12 @@ import os
 from datetime import datetime
 from typing import Any, List, Optional, Union, Literal
 
-import requests
 from pydantic import BaseModel, EmailStr, HttpUrl
 
 from hsextract.adapters.utils import RepositoryType
 from hsextract.exceptions import RepositoryException
 from hsextract.models import schema
-from hsextract.models.schema import CoreMetadataDOC
+from hsextract.models.schema import CoreMetadataDOC, RasterMetadataDOC
 
 
 class BasePerson(BaseModel):
@@ -180,6 +179,9 @@ class HydroshareMetadataAdapter:
         return hs_metadata_model.to_catalog_dataset()
 
     def retrieve_user_metadata(self, record_id: str, input_path: str):
+        # imported here since only this command talks to HydroShare, extraction does not need requests
+        import requests
+
         hs_meta_url = f"https://hydroshare.org/hsapi2/resource/{record_id}/json/"
         hs_sharing_status_url = f"https://www.hydroshare.org/hsapi2/resource/{record_id}/sharing_status/json/"
 
@@ -217,6 +219,7 @@ class _HydroshareResourceMetadata(BaseModel):
     relations: List[Relation] = []
     citation: Optional[str]
     associatedMedia: List[Any] = []
+    band_information: List[dict] = []
     sharing_status: Literal["private", "public", "published", "discoverable"]
 
     def to_dataset_creators(self):
@@ -273,6 +276,29 @@ class _HydroshareResourceMetadata(BaseModel):
         if self.rights:
             return self.rights.to_dataset_license()
 
+    def to_dataset_additional_property(self):
+        # a property for each raster band, with its minimum and maximum and the strategy they were computed with
+        properties = []
+        for band in self.band_information:
+            band_property = {
+                "@type": "PropertyValue",
+                "name": band.get("name"),
+                "minValue": band.get("minimum_value"),
+                "maxValue": band.get("maximum_value"),
+            }
+            if band.get("variable_unit"):
+                band_property["unitText"] = band["variable_unit"]
+            if band.get("statistics"):
+                band_property["measurementTechnique"] = band["statistics"]
+            if band.get("no_data_value") is not None:
+                band_property["valueReference"] = {
+                    "@type": "PropertyValue",
+                    "name": "noDataValue",
+                    "value": band["no_data_value"],
+                }
+            properties.append(band_property)
+        return properties
+
     def to_dataset_creative_work_status(self):
         status_defined_terms = {
             "public": schema.Public,
@@ -290,7 +316,8 @@ class _HydroshareResourceMetadata(BaseModel):
         return provider
 
     def to_catalog_dataset(self):
-        dataset = CoreMetadataDOC.construct()
+        # only raster records carry band properties
+        dataset = RasterMetadataDOC.construct() if self.band_information else CoreMetadataDOC.construct()
         dataset.additionalType = self.type
         dataset.provider = self.to_dataset_provider()
         dataset.name = self.title
@@ -313,4 +340,6 @@ class _HydroshareResourceMetadata(BaseModel):
         dataset.license = self.to_dataset_license()
         dataset.citation = [self.citation]
         dataset.creativeWorkStatus = self.to_dataset_creative_work_status()
+        if self.band_information:
+            dataset.additionalProperty = self.to_dataset_additional_property()
         return dataset
@@ -0,0 +1,186 @@
+import bisect
+import os
+
+from hsextract.serialization import dumps, loads
+
+
+def read_metadata(path: str):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_metadata(path: str, metadata: dict, indent: int = None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(dumps(metadata, indent))
+
+
+class Aggregation:
+    """The output metadata of one aggregation, held in memory until the graph is written"""
+
+    def __init__(self, input_path: str, output_path: str, extracted: bool):
+        self.input_path = input_path
+        self.output_path = output_path
+        # extracted in this run, otherwise kept from a previous incremental run
+        self.extracted = extracted
+        self._metadata = None
+        # changed since it was last written; only dirty aggregations are written
+        self.dirty = False
+        # output path of the dataset the isPartOf of the metadata links to
+        self.is_part_of = None
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            if self.extracted:
+                raise ValueError(f"The metadata of {self.input_path} has not been extracted yet")
+            # kept from a previous incremental run, only read when a dataset links to it
+            self._metadata = read_metadata(self.output_path)
+        return self._metadata
+
+    def set_metadata(self, metadata: dict):
+        self._metadata = metadata
+        self.dirty = True
+
+    @property
+    def is_dataset(self):
+        return self.output_path.endswith("dataset_metadata.json")
+
+    @property
+    def directory(self):
+        """The input directory a dataset describes, "" for the root"""
+        return os.path.dirname(self.input_path)
+
+
+class AggregationGraph:
+    """
+    The aggregations of a run in listing order. Datasets are linked to their parts (hasPart and
+    isPartOf) and urls are resolved on the in-memory metadata, so outputs are not re-read and
+    rewritten for each link. A part can be written as soon as it is extracted and the datasets are
+    known; it is only written again if the dataset it links to changes.
+    """
+
+    def __init__(self, output_path: str, input_base_url: str, output_base_url: str):
+        self.output_path = output_path
+        self.input_base_url = input_base_url
+        self.output_base_url = output_base_url
+        self._aggregations = {}
+        self._datasets_by_directory = {}
+        # built on first use, after every part has been added
+        self._part_paths = None
+        self._parts = None
+
+    def add(self, input_path: str, output_path: str, metadata: dict = None, extracted: bool = None):
+        """
+        Add an aggregation. It is extracted in this run when metadata is given or extracted is True,
+        in which case the metadata may be set later; otherwise the output of a previous run is kept.
+        Return: the Aggregation
+        """
+        aggregation = Aggregation(input_path, output_path, metadata is not None if extracted is None else extracted)
+        if metadata is not None:
+            aggregation.set_metadata(metadata)
+        self._aggregations[input_path] = aggregation
+        if aggregation.is_dataset:
+            self._datasets_by_directory[aggregation.directory] = aggregation
+        else:
+            self._part_paths = self._parts = None
+        return aggregation
+
+    def get(self, input_path: str):
+        return self._aggregations[input_path]
+
+    def remove(self, input_path: str):
+        """Remove an aggregation, e.g. one whose extraction failed"""
+        aggregation = self._aggregations.pop(input_path)
+        if aggregation.is_dataset:
+            del self._datasets_by_directory[aggregation.directory]
+        else:
+            self._part_paths = self._parts = None
+
+    def __iter__(self):
+        return iter(self._aggregations.values())
+
+    def datasets(self):
+        return [aggregation for aggregation in self if aggregation.is_dataset]
+
+    def parts(self):
+        return [aggregation for aggregation in self if not aggregation.is_dataset]
+
+    def _build_index(self):
+        # parts sorted by input path, so the parts under a directory are one contiguous slice
+        parts = sorted((part.input_path, position, part) for position, part in enumerate(self.parts()))
+        self._part_paths = [input_path for input_path, _, _ in parts]
+        self._parts = [(position, part) for _, position, part in parts]
+
+    def descendant_parts(self, dataset: Aggregation):
+        """
+        Return: the parts in the dataset's directory and its subdirectories, in the order they were
+        added. The parts are found with a binary search for the directory prefix, O(log n + k) for k
+        parts, rather than by comparing the prefix with every part.
+        """
+        if self._part_paths is None:
+            self._build_index()
+        if not dataset.directory:
+            start, end = 0, len(self._parts)
+        else:
+            prefix = dataset.directory + "/"
+            start = bisect.bisect_left(self._part_paths, prefix)
+            # "0" follows "/", so this is the first path after every path starting with the prefix
+            end = bisect.bisect_left(self._part_paths, dataset.directory + "0", lo=start)
+        return [part for _, part in sorted(self._parts[start:end], key=lambda item: item[0])]
+
+    def enclosing_dataset(self, part: Aggregation):
+        """Return: the dataset of the nearest directory containing the part, or None"""
+        directory = os.path.dirname(part.input_path)
+        while True:
+            dataset = self._datasets_by_directory.get(directory)
+            if dataset is not None or not directory:
+                return dataset
+            directory = os.path.dirname(directory)
+
+    def output_url(self, aggregation: Aggregation):
+        return os.path.join(self.output_base_url, os.path.relpath(aggregation.output_path, self.output_path))
+
+    def set_has_part(self, dataset: Aggregation, parts):
+        has_part = []
+        for part in parts:
+            metadata = part.metadata
+            name = metadata["name"]
+            if not name:
+                name = "Not Found and name is required"
+            has_part.append(
+                {
+                    "@type": "CreativeWork",
+                    "name": name,
+                    "description": metadata["description"] if "description" in metadata else None,
+                    "url": self.output_url(part),
+                }
+            )
+        dataset.metadata["hasPart"] = has_part
+        self._resolve_content_urls(dataset)
+        dataset.dirty = True
+
+    def set_is_part_of(self, part: Aggregation, dataset: Aggregation):
+        """Link the part to the dataset, or remove its link when dataset is None"""
+        if dataset is None:
+            part.metadata.pop("isPartOf", None)
+            part.is_part_of = None
+        else:
+            part.metadata["isPartOf"] = [self.output_url(dataset)]
+            part.is_part_of = dataset.output_path
+        part.dirty = True
+
+    def resolve_urls(self, part: Aggregation):
+        """Make the contentUrls and url of an aggregation extracted in this run absolute"""
+        metadata = part.metadata
+        self._resolve_content_urls(part)
+        if "url" in metadata:
+            metadata["url"] = self.output_url(part)
+
+    def _resolve_content_urls(self, aggregation: Aggregation):
+        for md in aggregation.metadata.get("associatedMedia") or []:
+            if not md["contentUrl"].startswith(self.input_base_url):
+                md["contentUrl"] = os.path.join(self.input_base_url, md["contentUrl"])
+
+    def dirty_aggregations(self):
+        return [aggregation for aggregation in self if aggregation.dirty]
@@ -9,4 +9,14 @@ class RepositoryException(Exception):
 
     @property
     def status_code(self):
-        return self._status_code
\ No newline at end of file
+        return self._status_code
+
+
+class WorkerProcessException(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self._detail = detail
+
+    @property
+    def detail(self):
+        return self._detail
@@ -0,0 +1,201 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from hsextract.exceptions import WorkerProcessException
+
+EXECUTOR_BACKENDS = ("thread", "process", "hybrid")
+
+# categories whose extractors spend most of their time holding the GIL or a library lock (GDAL
+# statistics, OGR parsing, dateutil parsing); the hybrid backend sends these to worker processes
+PROCESS_CATEGORIES = frozenset(["raster", "feature", "timeseries"])
+
+# categories whose libraries are not thread safe or may crash the interpreter (netCDF4/HDF5); these
+# always run in IsolatedProcessPool workers, whatever the backend
+ISOLATED_CATEGORIES = frozenset(["netcdf"])
+
+
+def _isolated_worker_loop(conn):
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            break
+        if item is None:
+            break
+        func, args = item
+        try:
+            conn.send((True, func(*args)))
+        except Exception:
+            # exceptions raised by extension libraries are not always picklable
+            conn.send((False, traceback.format_exc()))
+    conn.close()
+
+
+class _IsolatedWorker:
+    """A single worker process that is replaced whenever it crashes or exceeds its timeout"""
+
+    def __init__(self, mp_context):
+        self._mp_context = mp_context
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        parent_conn, child_conn = self._mp_context.Pipe()
+        self._process = self._mp_context.Process(target=_isolated_worker_loop, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def call(self, func, args, timeout: float = None):
+        if self._process is None or not self._process.is_alive():
+            self._start()
+        try:
+            self._conn.send((func, args))
+            if not self._conn.poll(timeout):
+                self.kill()
+                raise WorkerProcessException(f"Worker process timed out after {timeout} seconds")
+            succeeded, result = self._conn.recv()
+        except (EOFError, ConnectionError):
+            self._process.join(5)
+            exitcode = self._process.exitcode
+            self.kill()
+            raise WorkerProcessException(f"Worker process exited unexpectedly with exit code {exitcode}")
+        if not succeeded:
+            raise WorkerProcessException(result)
+        return result
+
+    def kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def close(self):
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(5)
+        self.kill()
+
+
+class IsolatedProcessPool:
+    """
+    Pool of long-lived worker processes, each with its own copy of the extension libraries' global
+    state. Unlike ProcessPoolExecutor, a call that times out or a worker that crashes only fails that
+    call: the worker is killed and replaced and the other calls keep running.
+    """
+
+    def __init__(self, max_workers: int = None, timeout: float = None):
+        max_workers = max_workers or os.cpu_count() or 1
+        mp_context = multiprocessing.get_context("spawn")
+        self.timeout = timeout
+        self._workers = [_IsolatedWorker(mp_context) for _ in range(max_workers)]
+        self._idle_workers = queue.Queue()
+        for worker in self._workers:
+            self._idle_workers.put(worker)
+        # each worker is driven by a thread blocked on its pipe, so calls do not hold up other pools
+        self._threads = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _call(self, func, args):
+        worker = self._idle_workers.get()
+        try:
+            return worker.call(func, args, self.timeout)
+        finally:
+            self._idle_workers.put(worker)
+
+    def run(self, func, *args):
+        """Return: an awaitable for func(*args) in a worker process, raising WorkerProcessException on failure"""
+        return asyncio.get_running_loop().run_in_executor(self._threads, self._call, func, args)
+
+    def shutdown(self):
+        self._threads.shutdown()
+        for worker in self._workers:
+            worker.close()
+
+
+class ExtractionExecutor:
+    """
+    Runs extraction work on a thread pool, a process pool or both. With the "process" backend every
+    category is extracted in worker processes, with "hybrid" only the PROCESS_CATEGORIES are. File
+    hashing and writing the outputs always run on the thread pool since they are I/O bound. The
+    ISOLATED_CATEGORIES always run in an IsolatedProcessPool with a per-file timeout.
+
+    Functions and arguments sent to the process pool must be picklable. Workers are started with
+    the spawn method so they do not inherit the parent's threads, locks or open GDAL handles. A
+    worker that crashes breaks the whole process pool, failing every call it was running or had
+    queued: the pool is replaced and those calls are run again in the IsolatedProcessPool, where
+    only the call that crashed fails.
+    """
+
+    def __init__(self, backend: str = "thread", max_workers: int = None, isolated_timeout: float = None):
+        if backend not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Unknown executor backend {backend}, expected one of {', '.join(EXECUTOR_BACKENDS)}")
+        self.backend = backend
+        self.thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.process_pool = None
+        self._max_workers = max_workers
+        if backend != "thread":
+            self.process_pool = self._new_process_pool()
+        self.isolated_pool = IsolatedProcessPool(max_workers=max_workers, timeout=isolated_timeout)
+
+    def _new_process_pool(self):
+        return ProcessPoolExecutor(max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def executor_for(self, category: str):
+        if category in ISOLATED_CATEGORIES:
+            return self.isolated_pool
+        if self.backend == "process" or (self.backend == "hybrid" and category in PROCESS_CATEGORIES):
+            return self.process_pool
+        return self.thread_pool
+
+    def run(self, category: str, func, *args):
+        """Return: an awaitable for func(*args) on the pool that handles the category"""
+        executor = self.executor_for(category)
+        if executor is self.isolated_pool:
+            return executor.run(func, *args)
+        if executor is self.process_pool:
+            return self._run_in_process_pool(func, *args)
+        return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def _run_in_process_pool(self, func, *args):
+        pool = self.process_pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # replaced once, by the first of the calls the crash failed
+            if self.process_pool is pool:
+                self.process_pool = self._new_process_pool()
+                pool.shutdown(wait=False)
+        return await self.isolated_pool.run(func, *args)
+
+    def threads_per_call(self):
+        """
+        Return: the threads a call may start itself (e.g. to read the windows of a raster), so the
+        workers running calls at the same time do not start more threads than there are cores. One
+        with the default max_workers, which is a worker per core.
+        """
+        return max(1, (os.cpu_count() or 1) // (self._max_workers or os.cpu_count() or 1))
+
+    def run_in_thread(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.thread_pool, func, *args)
+
+    def shutdown(self):
+        self.thread_pool.shutdown()
+        self.isolated_pool.shutdown()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
@@ -0,0 +1,92 @@
+import importlib
+from typing import NamedTuple
+
+
+class Extractor(NamedTuple):
+    """
+    An extractor function named by its module, so the module and the libraries it depends on (GDAL,
+    netCDF4, OGR, ...) are only imported the first time a file of that category is extracted.
+    """
+
+    module: str
+    function: str
+    # the aggregation "type" set on the extracted metadata, None when the extractor sets it
+    aggregation_type: str = None
+    # only use this extractor for files with this suffix, "" matches every file of the category
+    suffix: str = ""
+    # the extractor function takes a storage keyword, to read the file from remote storage by
+    # ranged reads rather than through its path
+    remote: bool = False
+    # the extractor function takes a max_threads keyword, the threads it may start to extract one file
+    threaded: bool = False
+
+
+# category -> extractors, the first extractor whose suffix matches the file is used
+EXTRACTORS = {
+    "raster": [
+        Extractor("hsextract.raster.utils", "extract_from_tif_file", "GeographicRasterAggregation", threaded=True)
+    ],
+    "feature": [Extractor("hsextract.feature.utils", "extract_metadata_and_files", "GeographicFeatureAggregation")],
+    "netcdf": [Extractor("hsextract.netcdf.utils", "get_nc_meta_dict", "MultidimensionalAggregation", remote=True)],
+    "timeseries": [
+        Extractor("hsextract.timeseries.utils", "extract_metadata_csv", "TimeSeriesAggregation", ".csv"),
+        Extractor("hsextract.timeseries.utils", "extract_metadata", "TimeSeriesAggregation", ".sqlite"),
+    ],
+    "reftimeseries": [
+        Extractor(
+            "hsextract.reftimeseries.utils",
+            "extract_referenced_timeseries_metadata",
+            "ReferencedTimeSeriesAggregation",
+        )
+    ],
+    "user_meta": [Extractor("hsextract.utils", "extract_user_metadata")],
+}
+
+_loaded_functions = {}
+
+
+def register_extractor(category: str, extractor: Extractor, first: bool = False):
+    """Add an extractor for the category, ahead of the existing ones when first is True"""
+    extractors = EXTRACTORS.setdefault(category, [])
+    if first:
+        extractors.insert(0, extractor)
+    else:
+        extractors.append(extractor)
+
+
+def extractor_for(category: str, filepath: str):
+    """Return: the Extractor for a file of the category, or None"""
+    for extractor in EXTRACTORS.get(category, []):
+        if filepath.endswith(extractor.suffix):
+            return extractor
+    return None
+
+
+def load_extractor(extractor: Extractor):
+    """Return: the extractor function, importing its module on first use"""
+    key = (extractor.module, extractor.function)
+    func = _loaded_functions.get(key)
+    if func is None:
+        func = getattr(importlib.import_module(extractor.module), extractor.function)
+        _loaded_functions[key] = func
+    return func
+
+
+def run_extractor(category: str, filepath: str, options: dict = None, storage=None, max_threads: int = None):
+    """
+    Return: the metadata extracted from filepath with the category's extractor, or None. options are
+    passed to the extractor function as keyword arguments, storage to a remote extractor and
+    max_threads to a threaded extractor.
+    """
+    extractor = extractor_for(category, filepath)
+    if extractor is None:
+        return None
+    options = options or {}
+    if extractor.remote and storage is not None:
+        options = {**options, "storage": storage}
+    if extractor.threaded and max_threads is not None:
+        options = {**options, "max_threads": max_threads}
+    metadata = load_extractor(extractor)(filepath, **options)
+    if extractor.aggregation_type is not None:
+        metadata["type"] = extractor.aggregation_type
+    return metadata
@@ -1,17 +1,192 @@
 import hashlib
 import mimetypes
+import mmap
 import os
-from functools import partial
+import re
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from functools import lru_cache
 
+# read sizes used when streaming a file through the digest; larger files get larger reads so a
+# multi-GB file over a FUSE mount costs thousands of read calls instead of millions
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# local files at least this large are hashed through a memory map
+MMAP_THRESHOLD = 64 * 1024 * 1024
 
-def file_metadata(path: str):
+# filesystem types where a memory map or small reads translate into network round trips
+_REMOTE_FS_TYPES = ("fuse", "nfs", "cifs", "smb", "9p", "sshfs")
+
+
+@lru_cache(maxsize=None)
+def _mount_points():
+    mounts = []
+    try:
+        with open("/proc/self/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    # mount points escape whitespace as octal sequences
+                    mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+                    mounts.append((mount_point, fields[2]))
+    except OSError:
+        pass
+    # longest mount point first so the most specific mount wins
+    return sorted(mounts, key=lambda m: len(m[0]), reverse=True)
+
+
+def is_local_file(path: str):
+    """
+    Return: True when the path lives on a local filesystem, False for FUSE and network mounts
+    or when the mount table cannot be read
+    """
+    mounts = _mount_points()
+    if not mounts:
+        return False
+    real_path = os.path.realpath(path)
+    for mount_point, fs_type in mounts:
+        if real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/"):
+            return not fs_type.startswith(_REMOTE_FS_TYPES)
+    return False
+
+
+def chunk_size_for(size: int):
+    """Return: the read size for a file of the given size, between MIN_CHUNK_SIZE and MAX_CHUNK_SIZE"""
+    return min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, size // 64))
+
+
+def _digest_chunked(f, size: int):
+    d = hashlib.sha256()
+    buf = bytearray(chunk_size_for(size))
+    view = memoryview(buf)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        d.update(view[:n])
+    return d
+
+
+def _digest_mmap(f):
+    d = hashlib.sha256()
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        d.update(mm)
+    return d
+
+
+def sha256_digest(path: str):
+    """
+    (string) -> (string, int)
+
+    Return: the hex sha256 digest and the size in bytes of the file, read in a single pass
+    """
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            d = hashlib.sha256()
+        elif not is_local_file(path):
+            d = _digest_chunked(f, size)
+        elif size >= MMAP_THRESHOLD:
+            d = _digest_mmap(f)
+        elif hasattr(hashlib, "file_digest"):
+            d = hashlib.file_digest(f, "sha256")
+        else:
+            d = _digest_chunked(f, size)
+    return d.hexdigest(), size
+
+
+class ChecksumCache:
+    """
+    sqlite backed store of sha256 checksums that persists between runs
+
+    An entry is reused only while the file's size, modification time and version (the inode, or the
+    ETag when the file was listed from object storage) are unchanged, so re-running over a mostly
+    unchanged tree only reads the files that changed.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checksums ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, version TEXT, sha256 TEXT)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def sha256_digest(self, path: str, listed_file=None):
+        """
+        (string, ListedFile) -> (string, int)
+
+        Return: the hex sha256 digest and the size in bytes of the file, computed only when the
+        cached entry is missing or stale. The size, mtime and version come from listed_file when
+        the storage listing provided them, otherwise from a stat of the path.
+        """
+        key = os.path.normpath(path)
+        if listed_file is not None:
+            fingerprint = (listed_file.size, listed_file.mtime_ns, listed_file.version)
+        else:
+            st = os.stat(path)
+            fingerprint = (st.st_size, st.st_mtime_ns, str(st.st_ino))
+        with self._lock:
+            self._seen.add(key)
+            row = self._conn.execute(
+                "SELECT sha256 FROM checksums WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (key, *fingerprint),
+            ).fetchone()
+            if row:
+                self.hits += 1
+                return row[0], fingerprint[0]
+            self.misses += 1
+
+        checksum, size = sha256_digest(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checksums (path, size, mtime_ns, version, sha256) VALUES (?, ?, ?, ?, ?)",
+                (key, *fingerprint, checksum),
+            )
+        return checksum, size
+
+    def evict(self, keep=None):
+        """
+        Remove entries for files that no longer exist. When keep is given, every path not in it is
+        treated as removed, which avoids a stat per entry after a full listing of the tree.
+        """
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM checksums")]
+            if keep is not None:
+                keep = {os.path.normpath(p) for p in keep} | self._seen
+                stale = [p for p in paths if p not in keep]
+            else:
+                stale = [p for p in paths if not os.path.isfile(p)]
+            self._conn.executemany("DELETE FROM checksums WHERE path = ?", [(p,) for p in stale])
+            self._conn.commit()
+        return stale
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def file_metadata(path: str, checksum_cache: ChecksumCache = None, listed_file=None):
     # path = "/files/" + path
-    with open(path, "rb") as f:
-        d = hashlib.sha256()
-        for buf in iter(partial(f.read, 128), b''):
-            d.update(buf)
-    checksum = d.hexdigest()
-    size = f"{os.path.getsize(path)/1000.00} KB"
+    if checksum_cache is not None:
+        checksum, size = checksum_cache.sha256_digest(path, listed_file)
+    else:
+        checksum, size = sha256_digest(path)
+    size = f"{size/1000.00} KB"
     mime_type = mimetypes.guess_type(path)[0]
     _, extension = os.path.splitext(path)
     mime_type = mime_type if mime_type else extension
@@ -24,3 +199,44 @@ def file_metadata(path: str):
         "sha256": checksum,
         "encodingFormat": mime_type,
     }, None
+
+
+class FileMetadataRegistry:
+    """
+    Per-run store of file_metadata results shared by the flat file listing and every aggregation,
+    so each file is hashed at most once no matter how many aggregations reference it.
+    """
+
+    def __init__(self, checksum_cache: ChecksumCache = None):
+        self._checksum_cache = checksum_cache
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._listed_files = {}
+        # number of times each file was handed to file_metadata, expected to be 1 for every file
+        self.reads = Counter()
+
+    def add_listed_file(self, listed_file):
+        """Record the size, mtime and version the storage listing returned for a file"""
+        with self._lock:
+            self._listed_files[os.path.normpath(listed_file.path)] = listed_file
+
+    def file_metadata(self, path: str):
+        key = os.path.normpath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            is_owner = entry is None
+            if is_owner:
+                entry = Future()
+                self._entries[key] = entry
+                self.reads[key] += 1
+
+        if is_owner:
+            try:
+                metadata, _ = file_metadata(path, self._checksum_cache, self._listed_files.get(key))
+            except Exception as e:
+                entry.set_exception(e)
+                raise
+            entry.set_result(metadata)
+        # other callers of the same file block here until the first one has computed it
+        metadata = entry.result()
+        return {**metadata, "contentUrl": path}, None
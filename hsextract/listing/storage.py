@@ -0,0 +1,119 @@
+"""
+Storage backends that list the files of a resource and read byte ranges from them.
+
+The extractors open files through the input path (a local directory or an s3fs mount), but
+listing a bucket through the mount costs a LIST per directory and a HEAD per file. The S3 backend
+lists the bucket with paginated ListObjectsV2 calls instead, which return the size, ETag and
+modification time of up to 1000 objects per request, and serves header reads with ranged GETs.
+Extractors that can read a file by ranges (netcdf) are given a remote storage to read from
+instead of the mount.
+"""
+
+import os
+from typing import NamedTuple
+
+from hsextract.listing.utils import walk_entries
+
+
+class ListedFile(NamedTuple):
+    # path relative to the root of the storage, using "/" separators
+    path: str
+    size: int
+    mtime_ns: int
+    # identifies the content of the file together with size and mtime: the inode of a local file or
+    # the ETag of an object
+    version: str
+
+
+def _is_hidden(path: str):
+    return any(part.startswith('.') for part in path.split("/"))
+
+
+class LocalStorage:
+    """Files under a local (or FUSE mounted) directory"""
+
+    # the extractors read the files through the input path
+    remote = False
+
+    def __init__(self, root: str = ""):
+        self.root = root
+
+    def list_files(self, include_hidden: bool = False, exclude=()):
+        """
+        Yield a ListedFile for each file in sorted path order, leaving out the files and directories
+        whose path is in exclude
+        """
+        if self.root:
+            exclude = {os.path.join(self.root, path) for path in exclude}
+        for path, entry in walk_entries(self.root, include_hidden, exclude):
+            st = entry.stat()
+            if self.root:
+                path = os.path.relpath(path, self.root)
+            yield ListedFile(path, st.st_size, st.st_mtime_ns, str(st.st_ino))
+
+    def size(self, path: str):
+        return os.path.getsize(os.path.join(self.root, path))
+
+    def read_range(self, path: str, start: int, length: int):
+        with open(os.path.join(self.root, path), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+
+class S3Storage:
+    """
+    Objects in an S3 or MinIO bucket, optionally under a key prefix. The storage can be pickled, to
+    be sent to a worker process, which creates its own client from the environment's credentials.
+    """
+
+    remote = True
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, endpoint_url: str = None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.endpoint_url = endpoint_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def __getstate__(self):
+        # clients can't be pickled
+        return {**self.__dict__, "_client": None}
+
+    def list_files(self, include_hidden: bool = False, exclude=()):
+        """
+        Yield a ListedFile for each object in key order, which is sorted path order, leaving out the
+        files and directories whose path is in exclude
+        """
+        exclude = {path.strip("/") for path in exclude}
+        excluded_prefixes = tuple(path + "/" for path in exclude)
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                path = obj["Key"][len(self.prefix) :]
+                # keys ending with a separator are directory markers created by s3fs and the console
+                if not path or path.endswith("/"):
+                    continue
+                if not include_hidden and _is_hidden(path):
+                    continue
+                if exclude and (path in exclude or path.startswith(excluded_prefixes)):
+                    continue
+                mtime_ns = int(obj["LastModified"].timestamp()) * 1_000_000_000
+                yield ListedFile(path, obj["Size"], mtime_ns, obj["ETag"].strip('"'))
+
+    def size(self, path: str):
+        return self.client.head_object(Bucket=self.bucket, Key=self.prefix + path)["ContentLength"]
+
+    def read_range(self, path: str, start: int, length: int):
+        if length <= 0:
+            return b""
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.prefix + path, Range=f"bytes={start}-{start + length - 1}"
+        )
+        return response["Body"].read()
@@ -1,68 +1,155 @@
 import os
 from collections import defaultdict
-from multiprocessing.sharedctypes import Value
-from pathlib import Path
 
-from hsextract.raster.utils import list_tif_files
 
-
-def _is_not_hidden_file(path):
-    if path.is_dir():
-        return False
-
-    is_not_hidden_file = not any(part.startswith('.') for part in path.parts)
-    return is_not_hidden_file
+def _directory_entry_sort_key(entry):
+    # directories sort with a trailing separator so the walk yields files in the same order as
+    # sorting their full paths
+    name, is_dir, _ = entry
+    return name + "/" if is_dir else name
+
+
+def walk_entries(directory: str = "", include_hidden: bool = False, exclude=()):
+    """
+    Yield (path, os.DirEntry) for the files under directory in sorted order, without building the
+    full listing. Hidden directories, and the directories whose path is in exclude (e.g. an output
+    directory inside the input), are pruned without being read and the file type comes from the
+    directory entry, so there is no extra stat per file. Files whose path is in exclude are left out.
+    Symlinked directories are not followed.
+    """
+    entries = []
+    try:
+        with os.scandir(directory or ".") as it:
+            for entry in it:
+                if not include_hidden and entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        entries.append((entry.name, True, entry))
+                elif entry.is_file():
+                    entries.append((entry.name, False, entry))
+    except OSError:
+        return
+
+    entries.sort(key=_directory_entry_sort_key)
+    for name, is_dir, entry in entries:
+        path = os.path.join(directory, name) if directory else name
+        if path in exclude:
+            continue
+        if is_dir:
+            yield from walk_entries(path, include_hidden, exclude)
+        else:
+            yield path, entry
+
+
+def walk_files(directory: str = "", include_hidden: bool = False, exclude=()):
+    """Yield the paths of the files under directory in sorted order, see walk_entries"""
+    for path, _ in walk_entries(directory, include_hidden, exclude):
+        yield path
 
 
 def sort_files(include_hidden: bool = False):
-    if include_hidden:
-        files = [str(p) for p in Path().rglob('*') if not p.is_dir()]
-    else:
-        files = [str(p) for p in Path().rglob('*') if _is_not_hidden_file(p)]
-
-    sorted_files = sorted(files, key=lambda i: (i, len(i.split("/"))))
-    return sorted_files
+    return list(walk_files(include_hidden=include_hidden))
+
+
+# file suffix -> category. A suffix may span several extensions (".refts.json"), the longest
+# registered suffix of a file name wins. The "raster-vrt" and "raster-tif" categories are resolved to
+# "raster" by iter_categorized_files.
+FILE_CATEGORIES = {
+    ".vrt": "raster-vrt",
+    ".tif": "raster-tif",
+    ".tiff": "raster-tif",
+    ".nc": "netcdf",
+    ".shp": "feature",
+    ".refts.json": "reftimeseries",
+    ".csv": "timeseries",
+    ".sqlite": "timeseries",
+}
+
+# last extension -> [(suffix, category)] longest suffix first, so a file is dispatched with one dict
+# lookup on its extension
+_suffixes_by_extension = {}
+
+
+def _index_file_categories():
+    _suffixes_by_extension.clear()
+    for suffix, category in sorted(FILE_CATEGORIES.items(), key=lambda item: -len(item[0])):
+        extension = suffix[suffix.rfind('.') :]
+        _suffixes_by_extension.setdefault(extension, []).append((suffix, category))
+
+
+_index_file_categories()
+
+
+def register_file_category(suffix: str, category: str):
+    """Categorize files ending with suffix (e.g. ".tar.gz") as category"""
+    FILE_CATEGORIES[suffix] = category
+    _index_file_categories()
+
+
+def file_category(path: str):
+    """Return: the category registered for the longest suffix of the file name, or None"""
+    candidates = _suffixes_by_extension.get(path[path.rfind('.') :])
+    if candidates:
+        for suffix, category in candidates:
+            if path.endswith(suffix):
+                return category
+    return None
+
+
+class FileCategorizer:
+    """
+    Categorizes files one at a time as they are listed, see iter_categorized_files. TIFF files are
+    held back until finish, since a VRT listed later may reference them.
+    """
+
+    def __init__(self, user_metadata_filename: str):
+        self.user_metadata_filename = user_metadata_filename
+        self._user_metadata_suffix = "/" + user_metadata_filename
+        self._tif_files = []
+        self._vrt_referenced_files = set()
+
+    def add(self, f: str):
+        """Return: the (category, file) of the aggregations of the listed file"""
+        aggregations = []
+        category = file_category(f)
+        if category == "raster-vrt":
+            aggregations.append(("raster", f))
+            # imported here so listing does not load GDAL unless the resource has a VRT
+            from hsextract.raster.utils import list_tif_files
+
+            vrt_file_dir = os.path.dirname(f)
+            for tif_file in list_tif_files(f):
+                self._vrt_referenced_files.add(os.path.normpath(os.path.join(vrt_file_dir, tif_file)))
+        elif category == "raster-tif":
+            self._tif_files.append(f)
+        elif category is not None:
+            aggregations.append((category, f))
+
+        if f == self.user_metadata_filename or f.endswith(self._user_metadata_suffix):
+            aggregations.append(("user_meta", f))
+        return aggregations
+
+    def finish(self):
+        """Return: the (category, file) of the TIFF files that no listed VRT references"""
+        return [("raster", f) for f in self._tif_files if f not in self._vrt_referenced_files]
+
+
+def iter_categorized_files(files, user_metadata_filename):
+    """
+    Yield (category, file) for each aggregation as soon as its file is listed. TIFF files are held
+    back until the listing is complete, since a VRT listed later may reference them.
+    """
+    categorizer = FileCategorizer(user_metadata_filename)
+    for f in files:
+        yield from categorizer.add(f)
+    yield from categorizer.finish()
 
 
 def categorize_files(files, user_metadata_filename):
     categorized_files = defaultdict(list)
-
-    for f in files:
-        if f.endswith(".vrt"):
-            categorized_files["raster"].append(f)
-        if f.endswith(".tiff"):
-            categorized_files["raster-tif"].append(f)
-        if f.endswith(".tif"):
-            categorized_files["raster-tif"].append(f)
-
-        if f.endswith(".nc"):
-            categorized_files["netcdf"].append(f)
-
-        if f.endswith(".shp"):
-            categorized_files["feature"].append(f)
-
-        if f.endswith(".refts.json"):
-            categorized_files["reftimeseries"].append(f)
-
-        if f.endswith(".csv"):
-            categorized_files["timeseries"].append(f)
-        if f.endswith(".sqlite"):
-            categorized_files["timeseries"].append(f)
-
-        if os.path.basename(f) == user_metadata_filename:
-            categorized_files["user_meta"].append(f)
-
-    for vrt_file in categorized_files["raster"]:
-        vrt_file_dir = os.path.dirname(vrt_file)
-        for tif_file in list_tif_files(vrt_file):
-            try:
-                full_tif_path = os.path.join(vrt_file_dir, tif_file)
-                categorized_files["raster-tif"].remove(full_tif_path)
-            except ValueError:
-                pass  # TODO - warn about an invalid vrt file
-    categorized_files["raster"].extend(categorized_files["raster-tif"])
-    del categorized_files["raster-tif"]
-
+    for category, f in iter_categorized_files(files, user_metadata_filename):
+        categorized_files[category].append(f)
     return categorized_files
 
 
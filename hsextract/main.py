@@ -1,18 +1,54 @@
+import os
 from asyncio import run as aiorun
 
 from hsextract.adapters.hydroshare import HydroshareMetadataAdapter
 import typer
 
-from hsextract.utils import list_and_extract
+from hsextract.listing.storage import S3Storage
+from hsextract.ndjson import NDJSON_SHARD_SIZE, NDJSONWriter
+from hsextract.sinks import NDJSONSink, S3Sink
+from hsextract.utils import NETCDF_TIMEOUT, list_and_extract
 from typing_extensions import Annotated
 
 app = typer.Typer()
 
 
 async def _extract(
-    input_path: str, output_path: str, input_base_url: str, output_base_url: str, user_metadata_filename: str
+    input_path: str,
+    output_path: str,
+    input_base_url: str,
+    output_base_url: str,
+    user_metadata_filename: str,
+    incremental: bool,
+    executor: str,
+    max_workers: int,
+    netcdf_timeout: float,
+    storage,
+    indent: int,
+    output_format: str,
+    shard_size: int,
+    compression: str,
+    sink,
+    raster_statistics: str,
 ):
-    await list_and_extract(input_path, output_path, input_base_url, output_base_url, user_metadata_filename)
+    await list_and_extract(
+        input_path,
+        output_path,
+        input_base_url,
+        output_base_url,
+        user_metadata_filename,
+        incremental,
+        executor,
+        max_workers,
+        netcdf_timeout,
+        storage,
+        indent,
+        output_format,
+        shard_size,
+        compression,
+        sink,
+        raster_statistics,
+    )
 
 
 @app.command()
@@ -23,12 +59,72 @@ def extract(
     output_base_url: Annotated[str, typer.Argument()] = "https://hydroshare.org/resource/resource_id/extracted_metadata",
     user_metadata_filename: Annotated[str, typer.Argument()] = "hs_user_meta.json",
     retrieve_metadata_resource_id: Annotated[str, typer.Argument()] = None,
+    incremental: Annotated[
+        bool, typer.Option(help="Only re-extract aggregations whose files changed since the previous run")
+    ] = False,
+    executor: Annotated[
+        str, typer.Option(help="Where extractors run: thread, process, or hybrid (processes for CPU bound types)")
+    ] = "thread",
+    max_workers: Annotated[int, typer.Option(help="Number of workers in each extraction pool")] = None,
+    netcdf_timeout: Annotated[
+        float, typer.Option(help="Seconds a netcdf file may take before its worker process is killed")
+    ] = NETCDF_TIMEOUT,
+    s3_bucket: Annotated[
+        str, typer.Option(help="List the files, and read the NetCDF files, from this bucket (mounted at input_path)")
+    ] = None,
+    s3_prefix: Annotated[str, typer.Option(help="Key prefix of the files in the bucket")] = "",
+    s3_endpoint_url: Annotated[str, typer.Option(help="S3 endpoint, e.g. a MinIO server")] = None,
+    indent: Annotated[int, typer.Option(help="Indent the output JSON by this many spaces, compact by default")] = None,
+    output_format: Annotated[
+        str, typer.Option(help="json for a file per aggregation, ndjson for sharded JSON Lines files")
+    ] = "json",
+    shard_size: Annotated[int, typer.Option(help="Records per ndjson shard")] = NDJSON_SHARD_SIZE,
+    compression: Annotated[str, typer.Option(help="Compress the ndjson shards: zstd")] = None,
+    output_s3_bucket: Annotated[
+        str, typer.Option(help="Write the outputs (or upload the ndjson shards) to this bucket instead of output_path")
+    ] = None,
+    output_s3_prefix: Annotated[str, typer.Option(help="Key prefix of the outputs in the output bucket")] = "",
+    raster_statistics: Annotated[
+        str,
+        typer.Option(help="How raster band minimum/maximum are computed: exact, approximate, sampled or existing"),
+    ] = "exact",
 ):
     if retrieve_metadata_resource_id:
         adapter = HydroshareMetadataAdapter()
         adapter.retrieve_user_metadata(retrieve_metadata_resource_id, input_path)
 
-    aiorun(_extract(input_path, output_path, input_base_url, output_base_url, user_metadata_filename))
+    storage = None
+    if s3_bucket:
+        storage = S3Storage(s3_bucket, s3_prefix, endpoint_url=s3_endpoint_url)
+
+    sink = None
+    if output_s3_bucket:
+        sink = S3Sink(output_s3_bucket, output_s3_prefix, endpoint_url=s3_endpoint_url, indent=indent)
+        if output_format == "ndjson":
+            # the shards are written to output_path, which list_and_extract resolves from input_path
+            writer = NDJSONWriter(os.path.join(input_path, output_path), shard_size, compression)
+            sink = NDJSONSink(writer, upload_to=sink)
+
+    aiorun(
+        _extract(
+            input_path,
+            output_path,
+            input_base_url,
+            output_base_url,
+            user_metadata_filename,
+            incremental,
+            executor,
+            max_workers,
+            netcdf_timeout,
+            storage,
+            indent,
+            output_format,
+            shard_size,
+            compression,
+            sink,
+            raster_statistics,
+        )
+    )
 
 
 if __name__ == "__main__":
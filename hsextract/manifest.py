@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+
+MANIFEST_VERSION = 1
+
+
+class ExtractionManifest:
+    """
+    Record of a run's aggregations: the output path of each aggregation, the fingerprint (size and
+    mtime) of every input file it was built from, the has-part outputs a dataset links to and the
+    dataset output a part is linked to. Aggregations extracted with non-default extractor options
+    (e.g. sampled raster statistics) also record the options.
+    An incremental run compares the current fingerprints against the previous manifest to decide
+    which aggregations need to be extracted again.
+    """
+
+    def __init__(self, aggregations: dict = None):
+        self.aggregations = aggregations or {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as f:
+            manifest = json.loads(f.read())
+        if manifest.get("version") != MANIFEST_VERSION:
+            return cls()
+        return cls(manifest["aggregations"])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(json.dumps({"version": MANIFEST_VERSION, "aggregations": self.aggregations}, sort_keys=True))
+
+    def fingerprint(self, path: str):
+        """
+        Return: [size, mtime_ns] of the path, or None when it does not exist. Each path is only
+        stat'ed once per manifest.
+        """
+        with self._lock:
+            if path in self._fingerprints:
+                return self._fingerprints[path]
+        try:
+            st = os.stat(path)
+            fingerprint = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            fingerprint = None
+        with self._lock:
+            self._fingerprints[path] = fingerprint
+        return fingerprint
+
+    def set_fingerprint(self, path: str, size: int, mtime_ns: int):
+        """Use the size and mtime a storage listing returned for the path instead of a stat"""
+        with self._lock:
+            self._fingerprints[path] = [size, mtime_ns]
+
+    def record(self, input_path: str, output_path: str, members, options: dict = None):
+        """
+        Record an aggregation extracted from input_path, built from the member input files with the
+        extractor options
+        """
+        with self._lock:
+            self.aggregations[input_path] = {"output": output_path, "members": {}}
+            if options:
+                self.aggregations[input_path]["options"] = options
+        members = {m: self.fingerprint(m) for m in members}
+        with self._lock:
+            self.aggregations[input_path]["members"] = members
+
+    def copy_entry(self, input_path: str, previous: "ExtractionManifest"):
+        with self._lock:
+            self.aggregations[input_path] = dict(previous.aggregations[input_path])
+
+    def set_has_part(self, input_path: str, has_part_files):
+        with self._lock:
+            self.aggregations[input_path]["has_part"] = sorted(has_part_files)
+
+    def get_has_part(self, input_path: str):
+        entry = self.aggregations.get(input_path)
+        return entry.get("has_part") if entry else None
+
+    def set_is_part_of(self, input_path: str, dataset_output_path: str):
+        with self._lock:
+            self.aggregations[input_path]["is_part_of"] = dataset_output_path
+
+    def get_is_part_of(self, input_path: str):
+        entry = self.aggregations.get(input_path)
+        return entry.get("is_part_of") if entry else None
+
+    def output_path(self, input_path: str):
+        entry = self.aggregations.get(input_path)
+        return entry["output"] if entry else None
+
+    def is_unchanged(self, input_path: str, current: "ExtractionManifest", members=None, options: dict = None):
+        """
+        Return: True when input_path was extracted by the run this manifest describes with the same
+        extractor options, its output still exists and every member file has the same fingerprint in
+        the current run. When members is given, the set of member files must also be the same.
+        """
+        entry = self.aggregations.get(input_path)
+        if not entry or not os.path.exists(entry["output"]):
+            return False
+        if entry.get("options") != (options or None):
+            return False
+        if members is not None and set(members) != set(entry["members"]):
+            return False
+        return all(current.fingerprint(m) == fp for m, fp in entry["members"].items())
+
+    def removed_outputs(self, current: "ExtractionManifest"):
+        """Return: outputs of aggregations in this manifest that are no longer in the current one"""
+        return [
+            entry["output"] for input_path, entry in self.aggregations.items() if input_path not in current.aggregations
+        ]
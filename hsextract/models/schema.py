@@ -4,7 +4,18 @@ from datetime import date, datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseModel, EmailStr, Field, HttpUrl, root_validator, validator
+from pydantic import (
+    BaseModel,
+    EmailStr,
+    Field,
+    HttpUrl,
+    StrictBool,
+    StrictFloat,
+    StrictInt,
+    StrictStr,
+    root_validator,
+    validator,
+)
 
 orcid_pattern = "\\b\\d{4}-\\d{4}-\\d{4}-\\d{3}[0-9X]\\b"
 orcid_pattern_placeholder = "e.g. '0000-0001-2345-6789'"
@@ -115,6 +126,26 @@ class DefinedTerm(SchemaBaseModel):
     description: str = Field(description="The description of the item being defined.")
 
 
+class PropertyValue(SchemaBaseModel):
+    type: str = Field(alias="@type", default="PropertyValue")
+    name: str = Field(description="The name of the property.")
+    # strict types, so a validated number is not coerced to the first type of the union
+    value: Optional[Union[StrictBool, StrictInt, StrictFloat, StrictStr]] = Field(
+        description="The value of the property."
+    )
+    minValue: Optional[float] = Field(description="The lower value of the property.")
+    maxValue: Optional[float] = Field(description="The upper value of the property.")
+    unitText: Optional[str] = Field(description="The unit of measurement of the property.")
+    measurementTechnique: Optional[str] = Field(description="How the value of the property was determined.")
+    valueReference: Optional["PropertyValue"] = Field(
+        description="A secondary value that provides additional information on the property, e.g. the nodata "
+        "value of a raster band."
+    )
+
+
+PropertyValue.update_forward_refs()
+
+
 class Published(DefinedTerm):
     name: str = Field(default="Published")
     description: str = Field(
@@ -501,3 +532,12 @@ class CoreMetadataDOC(CoreMetadata):
                 year=dt.year, month=dt.month, day=dt.day, hour=dt.hour, minute=dt.minute, second=dt.second
             ),
         }
+
+
+class RasterMetadataDOC(CoreMetadataDOC):
+    # the catalog record of a raster aggregation, the only records with band properties
+    additionalProperty: Optional[List[PropertyValue]] = Field(
+        title="Additional properties",
+        description="The raster bands, with the minimum, maximum and nodata value of each and how its "
+        "statistics were computed.",
+    )
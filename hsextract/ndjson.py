@@ -0,0 +1,86 @@
+"""
+Bulk output of the catalog records as newline delimited JSON (JSON Lines), one record per line, in
+shards of a bounded number of records instead of one object per aggregation.
+"""
+
+import glob
+import io
+import os
+
+from hsextract.serialization import dumps, loads
+
+NDJSON_SHARD_SIZE = 100_000
+NDJSON_COMPRESSIONS = ("zstd",)
+SHARD_PREFIX = "catalog-"
+
+
+class NDJSONWriter:
+    """
+    Writes records to output_path/catalog-00000.ndjson, catalog-00001.ndjson, ... starting a new
+    shard every shard_size records. With compression="zstd" each shard is a zstd frame written to a
+    .ndjson.zst file. Shards left from a previous run are removed when the writer is opened.
+    """
+
+    def __init__(self, output_path: str, shard_size: int = NDJSON_SHARD_SIZE, compression: str = None):
+        if compression is not None and compression not in NDJSON_COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, expected one of {', '.join(NDJSON_COMPRESSIONS)}")
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        self.output_path = output_path
+        self.shard_size = shard_size
+        self.compression = compression
+        self.shards = []
+        self._file = None
+        self._stream = None
+        self._count = 0
+        os.makedirs(output_path, exist_ok=True)
+        for shard in glob.glob(os.path.join(glob.escape(output_path), SHARD_PREFIX + "*.ndjson*")):
+            os.remove(shard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open_shard(self):
+        extension = ".ndjson.zst" if self.compression else ".ndjson"
+        path = os.path.join(self.output_path, f"{SHARD_PREFIX}{len(self.shards):05d}{extension}")
+        self._file = open(path, "wb")
+        self._stream = self._file
+        if self.compression == "zstd":
+            import zstandard
+
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._file, closefd=False)
+        self.shards.append(path)
+
+    def _close_shard(self):
+        if self._stream is not self._file:
+            self._stream.close()
+        self._file.close()
+        self._file = self._stream = None
+
+    def write(self, record: dict):
+        if self._file is not None and self._count % self.shard_size == 0:
+            self._close_shard()
+        if self._file is None:
+            self._open_shard()
+        self._stream.write(dumps(record) + b"\n")
+        self._count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._close_shard()
+
+
+def read_ndjson(path: str):
+    """Yield the records of a shard written by NDJSONWriter"""
+    with open(path, "rb") as f:
+        lines = f
+        if path.endswith(".zst"):
+            import zstandard
+
+            lines = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f))
+        for line in lines:
+            if line.strip():
+                yield loads(line)
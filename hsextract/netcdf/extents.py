@@ -0,0 +1,124 @@
+"""
+Minimum and maximum of netCDF coordinate variables in bounded memory. Reading a whole 2-D auxiliary
+latitude/longitude grid or a long time axis only to find two values is avoided:
+
+- a coordinate variable, which CF requires to be strictly monotonic, or its bounds variable, is
+  read at its ends and a few points in between
+- a variable with an actual_range attribute is not read
+- any other variable is reduced in slabs of whole chunks along its first dimension
+
+The values are elements of the variable's data, as a full read would return them.
+"""
+
+import math
+
+import numpy
+
+# values read per slab by chunked_extent, 32 MB of doubles
+SLAB_VALUES = 4 * 1024 * 1024
+# values of a coordinate variable checked to be monotonic before its ends are taken as its extent
+MONOTONIC_SAMPLE = 16
+
+
+def variable_extent(nc_variable, monotonic: bool = False, slab_values: int = SLAB_VALUES):
+    """
+    Return: the (minimum, maximum) of the valid values of the variable, or None when every value is
+    masked. A monotonic 1-D variable, or the 2-D bounds of one, is read at its ends, unless a
+    sample of its values turns out not to be monotonic.
+    """
+    if monotonic and len(nc_variable.shape) in (1, 2):
+        extent = monotonic_extent(nc_variable)
+        if extent is not None:
+            return extent
+    extent = attribute_extent(nc_variable)
+    if extent is not None:
+        return extent
+    return chunked_extent(nc_variable, slab_values)
+
+
+def monotonic_extent(nc_variable, sample_size: int = MONOTONIC_SAMPLE):
+    """
+    Return: the (minimum, maximum) of a 1-D variable from its end values, or of the (n, 2) bounds of
+    one from its end rows, or None when a sample of at most sample_size values (rows) spread along
+    the axis, which includes the two values at each end, is not strictly monotonic or has masked or
+    NaN values
+    """
+    size = nc_variable.shape[0]
+    if size < 2:
+        return None
+    indices = numpy.union1d(numpy.linspace(0, size - 1, min(size, sample_size)).astype(int), [1, size - 2])
+    sample = nc_variable[indices]
+    if numpy.ma.is_masked(sample):
+        return None
+    # comparisons rather than differences, which wrap for unsigned types; NaN compares false
+    if (sample[1:] > sample[:-1]).all():
+        first, last = sample[0], sample[-1]
+    elif (sample[1:] < sample[:-1]).all():
+        first, last = sample[-1], sample[0]
+    else:
+        return None
+    # the bounds of the first and last cells
+    if sample.ndim == 2:
+        return first.min(), last.max()
+    return first, last
+
+
+def attribute_extent(nc_variable):
+    """Return: the (minimum, maximum) of the actual_range attribute of the variable, or None"""
+    if 'actual_range' not in nc_variable.ncattrs():
+        return None
+    actual_range = numpy.ravel(nc_variable.getncattr('actual_range'))
+    if actual_range.size != 2 or not numpy.issubdtype(actual_range.dtype, numpy.number):
+        return None
+    minimum, maximum = actual_range
+    # also rejects NaN
+    if not minimum <= maximum:
+        return None
+    return minimum, maximum
+
+
+def chunked_extent(nc_variable, slab_values: int = SLAB_VALUES):
+    """
+    Return: the (minimum, maximum) of the valid values of the variable, or None when every value is
+    masked. The variable is read in slabs of whole chunks along its first dimension, of at most
+    slab_values values or a row of chunks.
+    """
+    shape = nc_variable.shape
+    if not shape:
+        return _slab_extent(numpy.ma.atleast_1d(nc_variable[...]))
+    chunking = nc_variable.chunking()
+    # netCDF-3 and contiguous variables have no chunks, their slabs are whole rows
+    chunk_rows = chunking[0] if isinstance(chunking, list) else 1
+    row_values = math.prod(shape[1:])
+    rows = max(1, slab_values // max(1, row_values * chunk_rows)) * chunk_rows
+
+    extent = None
+    for start in range(0, shape[0], rows):
+        slab_extent = _slab_extent(nc_variable[start : start + rows])
+        if slab_extent is None:
+            continue
+        if extent is None:
+            extent = slab_extent
+        else:
+            extent = _lesser(extent[0], slab_extent[0]), _greater(extent[1], slab_extent[1])
+    return extent
+
+
+def _slab_extent(values):
+    """Return: the (minimum, maximum) element of the values, or None when every value is masked"""
+    if not values.size:
+        return None
+    minimum = values[numpy.unravel_index(values.argmin(), values.shape)]
+    if minimum is numpy.ma.masked:
+        return None
+    maximum = values[numpy.unravel_index(values.argmax(), values.shape)]
+    return minimum, maximum
+
+
+# like argmin and argmax, a NaN is the minimum and the maximum
+def _lesser(value, other):
+    return value if value < other or value != value else other
+
+
+def _greater(value, other):
+    return value if value > other or value != value else other
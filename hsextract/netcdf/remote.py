@@ -0,0 +1,171 @@
+"""
+Opens netCDF files in object storage by ranged reads, without pulling them through the s3fs mount.
+
+libnetcdf opens an http URL with "#mode=bytes" lazily: it reads the NetCDF-3 header, or the HDF5
+superblock and object headers, and then only the parts of the variables that are read (the
+coordinate values of the extents), with HTTP range requests. libnetcdf sends a HEAD request first,
+which a presigned S3 GET URL doesn't allow, so the file is served to libnetcdf by a localhost
+RangeServer, which answers the HEAD with the size of the object and the GETs from a BlockCache of
+aligned blocks read with the storage's read_range. The cache turns the many small metadata reads
+of HDF5 into a few ranged GETs.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+import netCDF4
+
+# bytes read per ranged GET, and the number of blocks kept per file
+BLOCK_SIZE = 256 * 1024
+MAX_BLOCKS = 256
+
+
+class BlockCache:
+    """
+    Read-through cache of the blocks of a file of the given size, read with read(start, length).
+    At most max_blocks blocks are kept, the least recently used are evicted. Blocks are read
+    without holding the lock, so concurrent reads of different blocks overlap; two concurrent
+    reads of the same missing block both read it.
+    """
+
+    def __init__(self, read, size: int, block_size: int = BLOCK_SIZE, max_blocks: int = MAX_BLOCKS):
+        self._read = read
+        self.size = size
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        # number of times read was called, one per block missing from the cache
+        self.reads = 0
+
+    def read(self, start: int, length: int):
+        """Return: length bytes of the file from start, fewer at the end of the file"""
+        end = min(start + length, self.size)
+        if start >= end:
+            return b""
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        data = b"".join(self._block(index) for index in range(first, last + 1))
+        offset = first * self.block_size
+        return data[start - offset : end - offset]
+
+    def _block(self, index: int):
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+                return block
+        start = index * self.block_size
+        block = self._read(start, min(self.block_size, self.size - start))
+        with self._lock:
+            self.reads += 1
+            self._blocks[index] = block
+            self._blocks.move_to_end(index)
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body: bool):
+        cache = self.server.cache
+        start, end = 0, cache.size - 1
+        status = 200
+        requested = _RANGE.match(self.headers.get("Range", "").strip())
+        if requested:
+            first, last = requested.groups()
+            if first:
+                start = int(first)
+                end = min(int(last), end) if last else end
+            elif last:
+                # the last bytes of the file
+                start = max(0, cache.size - int(last))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{cache.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        try:
+            data = cache.read(start, end - start + 1) if send_body else b""
+        except Exception as e:
+            # libnetcdf fails the read, rather than waiting on a response that never comes
+            self.send_error(502, f"Failed to read the file: {e}")
+            return
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{cache.size}")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RangeServer:
+    """
+    Serves one file of a storage at url, on a localhost port, to HTTP range requests. Use it as a
+    context manager, the server is stopped on exit.
+    """
+
+    def __init__(self, storage, path: str, block_size: int = BLOCK_SIZE, max_blocks: int = MAX_BLOCKS):
+        self.cache = BlockCache(partial(storage.read_range, path), storage.size(path), block_size, max_blocks)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeRequestHandler)
+        self._server.daemon_threads = True
+        self._server.cache = self.cache
+        host, port = self._server.server_address
+        self.url = f"http://{host}:{port}/{quote(path)}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+@contextmanager
+def open_remote_dataset(storage, path: str):
+    """
+    Yield: the netCDF4 Dataset of the file at path in the storage, read lazily by ranged reads, or
+    None when it can't be opened that way (e.g. libnetcdf was built without byte-range support or
+    the object can't be read). The dataset is closed, if it is still open, before the server stops.
+    """
+    try:
+        server = RangeServer(storage, path)
+    except Exception:
+        yield None
+        return
+    with server:
+        try:
+            nc_dataset = netCDF4.Dataset(server.url + "#mode=bytes", 'r')
+        except Exception:
+            nc_dataset = None
+        try:
+            yield nc_dataset
+        finally:
+            if nc_dataset is not None and nc_dataset.isopen():
+                nc_dataset.close()
@@ -0,0 +1,67 @@
+"""
+Decodes the values of netCDF time coordinates, "<units> since <reference date>" in one of the CF
+calendars, with cftime.
+
+The units and calendar of a time coordinate are parsed and checked once, and the extent of the
+axis (the first and last values, or bounds, of a monotonic coordinate; see
+hsextract.netcdf.extents) is decoded with a single num2date call. A time axis that can't be decoded
+raises ValueError with the reason, rather than leaving the coverage empty without one.
+
+Dates of the model calendars (noleap, all_leap, 360_day, ...) are not all valid datetimes, e.g.
+2000-02-30 in the 360_day calendar. to_datetime clamps their day to the end of the month.
+"""
+
+import calendar as calendars
+import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+import cftime
+import numpy
+
+# the calendar of a time coordinate without a calendar attribute
+DEFAULT_CALENDAR = 'standard'
+
+
+class TimeAxis(NamedTuple):
+    """The units and calendar of a time coordinate, see get_time_axis"""
+
+    units: str
+    calendar: str
+
+    def decode(self, values):
+        """Return: the cftime datetimes of the values, decoded together"""
+        return list(cftime.num2date(numpy.asarray(values), self.units, calendar=self.calendar))
+
+
+def get_time_axis(units, calendar=None):
+    """
+    Return: the TimeAxis of the units and calendar attributes of a time coordinate, the calendar
+    defaults to standard. Raises ValueError when cftime can't decode them, e.g. "months since"
+    units in a calendar other than 360_day, or an unknown calendar.
+    """
+    if calendar is None:
+        calendar = DEFAULT_CALENDAR
+    if not isinstance(units, str) or not isinstance(calendar, str):
+        raise ValueError(f"time units {units!r} and calendar {calendar!r} are not strings")
+    return _get_time_axis(units, calendar.strip().lower() or DEFAULT_CALENDAR)
+
+
+@lru_cache(maxsize=None)
+def _get_time_axis(units: str, calendar: str):
+    try:
+        cftime.num2date(0, units, calendar=calendar)
+    except Exception as e:
+        raise ValueError(f"can't decode time units {units!r} in the {calendar} calendar: {e}") from e
+    return TimeAxis(units, calendar)
+
+
+def to_datetime(date):
+    """
+    Return: the datetime of a cftime datetime, to the second, with its day clamped to the end of
+    its month in the standard calendar. Raises ValueError for a year datetime can't represent.
+    """
+    if not datetime.MINYEAR <= date.year <= datetime.MAXYEAR:
+        raise ValueError(f"the year of {date} is out of the range of datetime")
+    day = min(date.day, calendars.monthrange(date.year, date.month)[1])
+    return datetime.datetime(date.year, date.month, day, date.hour, date.minute, date.second)
@@ -23,15 +23,56 @@ http://netcdf4-python.googlecode.com/svn/trunk/docs/netCDF4-module.html
 """
 
 import json
+import logging
 import re
 from collections import OrderedDict
+from functools import cached_property
+from types import MappingProxyType
 
+import cftime
 import dateutil.parser
 import netCDF4
 import numpy
 from osgeo import osr
 from pyproj import Transformer
 
+from hsextract.netcdf.extents import variable_extent
+from hsextract.netcdf.remote import open_remote_dataset
+from hsextract.netcdf.time_axis import get_time_axis, to_datetime
+
+# the variable classification runs for every variable of the file, some model outputs have thousands
+# a standard (or long) name starting with one of these gives the coordinate type of the matched group
+_COORDINATE_NAME_PATTERN = re.compile(
+    '(latitude)|(longitude)|(time)|(projection_x_coordinate)|(projection_y_coordinate)', re.I
+)
+COORDINATE_NAME_TYPES = (None, 'Y', 'X', 'T', 'X', 'Y')
+_EAST_UNITS_PATTERN = re.compile('degree(s)?.e(ast)?', re.I)
+_NORTH_UNITS_PATTERN = re.compile('degree(s)?.n(orth)?', re.I)
+_DEGREE_UNITS_PATTERN = re.compile('degree', re.I)
+# the units of "<units> since <date>" time coordinates that cftime decodes, months and common_years
+# only in the 360_day and noleap calendars
+TIME_UNITS = frozenset(
+    ['days', 'hours', 'minutes', 'seconds', 'milliseconds', 'microseconds', 'months', 'common_years']
+)
+# numpy type name -> type of the data variable metadata
+NC_DATA_TYPES = MappingProxyType(
+    {
+        'int8': 'Byte',
+        'int16': 'Short',
+        'int32': 'Int',
+        'int64': 'Int64',
+        'float32': 'Float',
+        'float64': 'Double',
+        'uint8': 'Unsigned Byte',
+        'uint16': 'Unsigned Short',
+        'uint32': 'Unsigned Int',
+        'uint64': 'Unsigned Int64',
+    }
+)
+# types of the time coordinate variables and their bounds
+TIME_COORDINATE_TYPES = frozenset(['TC', 'TA', 'TC_bnd', 'TA_bnd'])
+_URL_PATTERN = re.compile(r'(?P<url>https?://[^\s]+)')
+
 
 def get_nc_meta_json(nc_file_name):
     """
@@ -45,20 +86,32 @@ def get_nc_meta_json(nc_file_name):
     return nc_meta_json
 
 
-def get_nc_meta_dict(nc_file_name):
+def get_nc_meta_dict(nc_file_name, storage=None):
     """
-    (string)-> dict
+    (string, object)-> dict
 
-    Return: the netCDF Dublincore and Type specific Metadata
+    Return: the netCDF Dublincore and Type specific Metadata. With a remote storage the file is
+            read from it by ranged reads, only the header, the metadata and the coordinate values
+            are fetched; the file is read through its path when it can't be opened or read that way.
     """
 
     if isinstance(nc_file_name, netCDF4.Dataset):
-        nc_dataset = nc_file_name
-    else:
-        nc_dataset = get_nc_dataset(nc_file_name)
-
-    res_dublin_core_meta = get_dublin_core_meta(nc_dataset)
-    res_type_specific_meta = get_type_specific_meta(nc_dataset)
+        return _get_nc_meta_dict(nc_file_name, nc_file_name)
+    if storage is not None:
+        try:
+            with open_remote_dataset(storage, nc_file_name) as nc_dataset:
+                if nc_dataset is not None:
+                    return _get_nc_meta_dict(nc_dataset, nc_file_name)
+        except Exception as e:
+            logging.warning(f"Failed to read {nc_file_name} by ranged reads, reading it through its path: {e}")
+    return _get_nc_meta_dict(get_nc_dataset(nc_file_name), nc_file_name)
+
+
+def _get_nc_meta_dict(nc_dataset, nc_file_name):
+    # the variable lookups are shared by all the metadata functions
+    nc_context = NetCDFContext(nc_dataset)
+    res_dublin_core_meta = get_dublin_core_meta(nc_context)
+    res_type_specific_meta = get_type_specific_meta(nc_context)
     nc_dataset.close()
 
     md = combine_metadata(res_dublin_core_meta, res_type_specific_meta)
@@ -75,10 +128,11 @@ def get_dublin_core_meta(nc_dataset):
     Return: the netCDF dublin core metadata
     """
 
-    nc_global_meta = extract_nc_global_meta(nc_dataset)
+    nc_context = get_nc_context(nc_dataset)
+    nc_global_meta = extract_nc_global_meta(nc_context.dataset)
 
     try:
-        nc_coverage_meta = extract_nc_coverage_meta(nc_dataset)
+        nc_coverage_meta = extract_nc_coverage_meta(nc_context)
     except Exception:
         nc_coverage_meta = {}
 
@@ -130,6 +184,7 @@ def extract_nc_coverage_meta(nc_dataset):
     Return netCDF spatial reference (original coverage), spatial coverage and temporal coverage
     """
 
+    nc_dataset = get_nc_context(nc_dataset)
     projection_info = get_projection_info(nc_dataset)
 
     period_info = get_period_info(nc_dataset)
@@ -178,6 +233,7 @@ def get_period_info(nc_dataset):
     Return: the netCDF original coverage period info
     """
 
+    nc_dataset = get_nc_context(nc_dataset)
     if get_period_info_by_acdd_convention(nc_dataset):
         period_info = get_period_info_by_acdd_convention(nc_dataset)
     else:
@@ -194,6 +250,7 @@ def get_period_info_by_acdd_convention(nc_dataset):
     """
 
     period_info = {}
+    nc_dataset = get_nc_context(nc_dataset).dataset
 
     if nc_dataset.__dict__.get('time_coverage_start', '') and nc_dataset.__dict__.get('time_coverage_end', ''):
         period_info['start'] = nc_dataset.__dict__['time_coverage_start']
@@ -210,17 +267,20 @@ def get_period_info_by_data(nc_dataset):
     """
 
     period_info = {}
-    coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    nc_dataset = get_nc_context(nc_dataset)
+    coor_type_mapping = nc_dataset.coordinate_type_mapping
     for coor_type in ['TA', 'TC']:
         limit_meta = get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping)
-        try:
-            if limit_meta:
-                if limit_meta['start'].year and limit_meta['end'].year:
-                    period_info['start'] = limit_meta['start'].strftime('%Y-%m-%d %H:%M:%S')
-                    period_info['end'] = limit_meta['end'].strftime('%Y-%m-%d %H:%M:%S')
-                    break
-        except Exception:
+        # time values that could not be decoded were logged when they were read
+        if not limit_meta or not all(isinstance(limit_meta[key], cftime.datetime) for key in ('start', 'end')):
             continue
+        try:
+            period_info['start'] = to_datetime(limit_meta['start']).isoformat(sep=' ')
+            period_info['end'] = to_datetime(limit_meta['end']).isoformat(sep=' ')
+            break
+        except ValueError as e:
+            period_info = {}
+            logging.warning(f"No period coverage from the {coor_type} time coordinates: {e}")
 
     return period_info
 
@@ -232,6 +292,7 @@ def get_box_info(nc_dataset):
     Return: the netCDF spatial coverage box info as wgs84 crs
     """
     box_info = {}
+    nc_dataset = get_nc_context(nc_dataset)
     original_box_info = get_original_box_info(nc_dataset)
 
     if original_box_info:
@@ -322,6 +383,7 @@ def get_original_box_info(nc_dataset):
     Return: the netCDF original coverage box info
     """
 
+    nc_dataset = get_nc_context(nc_dataset)
     original_box_info = get_original_box_info_by_data(nc_dataset)
 
     if original_box_info:
@@ -341,6 +403,8 @@ def get_original_box_info_by_acdd_convention(nc_dataset):
     """
 
     original_box_info = {}
+    nc_context = get_nc_context(nc_dataset)
+    nc_dataset = nc_context.dataset
     if (
         nc_dataset.__dict__.get('geospatial_lat_min', '')
         and nc_dataset.__dict__.get('geospatial_lat_max', '')
@@ -352,7 +416,7 @@ def get_original_box_info_by_acdd_convention(nc_dataset):
         original_box_info['westlimit'] = str(nc_dataset.__dict__['geospatial_lon_min'])
         original_box_info['eastlimit'] = str(nc_dataset.__dict__['geospatial_lon_max'])
         original_box_info['units'] = 'degree'
-        original_box_info['projection'] = get_nc_grid_mapping_crs_name(nc_dataset)
+        original_box_info['projection'] = get_nc_grid_mapping_crs_name(nc_context)
     # TODO: check the geospatial_bounds and geospatial_bounds_crs attributes
 
     return original_box_info
@@ -366,6 +430,7 @@ def get_original_box_info_by_data(nc_dataset):
     """
 
     original_box_info = {}
+    nc_dataset = get_nc_context(nc_dataset)
 
     for info_source in ['A', 'C']:  # check auxiliary and coordinate variables
         limits_info = get_limits_info(nc_dataset, info_source)
@@ -385,7 +450,8 @@ def get_limits_info(nc_dataset, info_source):
     """
 
     limits_info = {}
-    coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    nc_dataset = get_nc_context(nc_dataset)
+    coor_type_mapping = nc_dataset.coordinate_type_mapping
 
     # get all limits values and units
     for coor_dir in ['X', 'Y']:
@@ -428,7 +494,7 @@ def get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping):
                 coor_end.append(var_coor_meta.get('coordinate_end'))
             if coor_units == '':
                 coor_units = var_coor_meta.get('coordinate_units', '')
-                if re.match('degree', coor_units, re.I):
+                if _DEGREE_UNITS_PATTERN.match(coor_units):
                     coor_units = 'degree'
 
     if coor_start and coor_end:
@@ -460,7 +526,7 @@ def get_type_specific_meta(nc_dataset):
     Return: the netCDF type specific metadata
     """
 
-    nc_data_variables = nc_dataset.variables  # get_nc_data_variables(nc_dataset)
+    nc_data_variables = get_nc_context(nc_dataset).dataset.variables  # get_nc_data_variables(nc_dataset)
     type_specific_meta = extract_nc_data_variables_meta(nc_data_variables)
     variables = [val for val in type_specific_meta.values()]
 
@@ -474,40 +540,34 @@ def extract_nc_data_variables_meta(nc_data_variables):
     Return : the netCDF data variable metadata which are required by HS system.
     """
     nc_data_variables_meta = {}
-    for var_name, var_obj in list(nc_data_variables.items()):
+    for var_name, var_obj in nc_data_variables.items():
+        units, long_name, missing_value, comment = get_nc_variable_attributes(
+            var_obj, 'units', 'long_name', 'missing_value', 'comment'
+        )
+        dimensions = var_obj.dimensions
         nc_data_variables_meta[var_name] = {
             'name': var_name,
-            'unit': var_obj.units if (hasattr(var_obj, 'units') and var_obj.units) else 'Unknown',
-            'shape': ','.join(var_obj.dimensions) if var_obj.dimensions else 'Not defined',
-            'descriptive_name': var_obj.long_name if hasattr(var_obj, 'long_name') else '',
-            'missing_value': str(var_obj.missing_value if hasattr(var_obj, 'missing_value') else ''),
-            'method': str(var_obj.comment if hasattr(var_obj, 'comment') else ''),
+            'unit': units if units else 'Unknown',
+            'shape': ','.join(dimensions) if dimensions else 'Not defined',
+            'descriptive_name': long_name if long_name is not None else '',
+            'missing_value': str(missing_value if missing_value is not None else ''),
+            'method': str(comment if comment is not None else ''),
         }
 
         # check and add variable 'type' info:
-        nc_data_type_dict = {
-            'int8': 'Byte',
-            'int16': 'Short',
-            'int32': 'Int',
-            'int64': 'Int64',
-            'float32': 'Float',
-            'float64': 'Double',
-            'uint8': 'Unsigned Byte',
-            'uint16': 'Unsigned Short',
-            'uint32': 'Unsigned Int',
-            'uint64': 'Unsigned Int64',
-        }
-
-        if var_obj.dimensions:
+        if dimensions:
             try:
-                if isinstance(var_obj.datatype, netCDF4.CompoundType) or isinstance(var_obj.datatype, netCDF4.VLType):
+                datatype = var_obj.datatype
+                if isinstance(datatype, (netCDF4.CompoundType, netCDF4.VLType)):
                     nc_data_variables_meta[var_name]['type'] = 'User Defined Type'
-                elif var_obj.datatype.name in list(nc_data_type_dict.keys()):
-                    nc_data_variables_meta[var_name]['type'] = nc_data_type_dict[var_obj.datatype.name]
-                elif ('string' in var_obj.datatype.name) or ('unicode' in var_obj.datatype.name):
-                    nc_data_variables_meta[var_name]['type'] = 'Char' if '8' in var_obj.datatype.name else 'String'
                 else:
-                    nc_data_variables_meta[var_name]['type'] = 'Unknown'
+                    datatype_name = datatype.name
+                    if datatype_name in NC_DATA_TYPES:
+                        nc_data_variables_meta[var_name]['type'] = NC_DATA_TYPES[datatype_name]
+                    elif ('string' in datatype_name) or ('unicode' in datatype_name):
+                        nc_data_variables_meta[var_name]['type'] = 'Char' if '8' in datatype_name else 'String'
+                    else:
+                        nc_data_variables_meta[var_name]['type'] = 'Unknown'
             except Exception:
                 nc_data_variables_meta[var_name]['type'] = 'Unknown'
         else:
@@ -574,6 +634,142 @@ def get_nc_variable_original_meta(nc_dataset, nc_variable_name):
     return nc_variable_original_meta
 
 
+# Analysis context of a dataset
+def get_nc_context(nc_dataset):
+    """
+    (object)-> NetCDFContext
+
+    Return: the analysis context of the netCDF dataset, or nc_dataset when it is already a context
+    """
+
+    if isinstance(nc_dataset, NetCDFContext):
+        return nc_dataset
+    return NetCDFContext(nc_dataset)
+
+
+class NetCDFContext:
+    """
+    The variable classification of a netCDF dataset, computed once and shared by the metadata
+    functions, which take either a dataset or its context. The coordinate type mapping and the
+    coordinate, auxiliary, bounds, data and grid mapping variables are looked up on first use, and
+    the coordinate metadata of each variable is kept once its data has been read.
+    """
+
+    def __init__(self, nc_dataset):
+        self.dataset = nc_dataset
+        # get_nc_variable_coordinate_meta of the variables, by variable name
+        self.coordinate_meta = {}
+
+    @cached_property
+    def coordinate_variables(self):
+        nc_coordinate_variables = {}
+        for var_name, var_obj in self.dataset.variables.items():
+            if len(var_obj.shape) == 1 and var_name == var_obj.dimensions[0]:
+                nc_coordinate_variables[var_name] = var_obj
+        return nc_coordinate_variables
+
+    @cached_property
+    def auxiliary_coordinate_variable_namelist(self):
+        raw_namelist = []
+        for var_obj in self.dataset.variables.values():
+            if hasattr(var_obj, 'coordinates'):
+                raw_namelist.extend(var_obj.coordinates.split(' '))
+        return list(set(raw_namelist))
+
+    @cached_property
+    def auxiliary_coordinate_variables(self):
+        nc_auxiliary_coordinate_variables = {}
+        for name in self.auxiliary_coordinate_variable_namelist:
+            if self.dataset.variables.get(name, ''):
+                nc_auxiliary_coordinate_variables[name] = self.dataset.variables[name]
+        return nc_auxiliary_coordinate_variables
+
+    @cached_property
+    def coordinate_type_mapping(self):
+        nc_variables_dict = {
+            "C": self.coordinate_variables,
+            "A": self.auxiliary_coordinate_variables,
+        }
+        nc_variables_coordinate_type_mapping = {}
+        for variables_type, variables_dict in nc_variables_dict.items():
+            for var_name, var_obj in variables_dict.items():
+                var_coor_type_name = get_nc_variable_coordinate_type(var_obj) + variables_type
+                nc_variables_coordinate_type_mapping[var_name] = var_coor_type_name
+                if hasattr(var_obj, 'bounds') and self.dataset.variables.get(var_obj.bounds, None):
+                    var_coor_bounds_type_name = var_coor_type_name + '_bnd'
+                    nc_variables_coordinate_type_mapping[var_obj.bounds] = var_coor_bounds_type_name
+        return nc_variables_coordinate_type_mapping
+
+    @cached_property
+    def coordinate_type_names(self):
+        """the first variable of each coordinate type"""
+        names = {}
+        for var_name, coor_type in self.coordinate_type_mapping.items():
+            names.setdefault(coor_type, var_name)
+        return names
+
+    @cached_property
+    def coordinate_bounds_variables(self):
+        nc_coordinate_bounds_variables = {}
+        for var_obj in {**self.coordinate_variables, **self.auxiliary_coordinate_variables}.values():
+            if hasattr(var_obj, 'bounds') and self.dataset.variables.get(var_obj.bounds, None):
+                nc_coordinate_bounds_variables[var_obj.bounds] = self.dataset.variables[var_obj.bounds]
+        return nc_coordinate_bounds_variables
+
+    @cached_property
+    def monotonic_variable_names(self):
+        """the coordinate variables, which CF requires to be strictly monotonic, and their bounds"""
+        names = set(self.coordinate_variables)
+        for var_obj in self.coordinate_variables.values():
+            bounds = getattr(var_obj, 'bounds', None)
+            if bounds in self.coordinate_bounds_variables:
+                names.add(bounds)
+        return names
+
+    @cached_property
+    def time_axes(self):
+        """the TimeAxis of the first variable of each time coordinate type, None when it can't be decoded"""
+        time_axes = {}
+        for coor_type in ['TC', 'TA']:
+            var_name = self.coordinate_type_names.get(coor_type)
+            if var_name is None:
+                continue
+            units, calendar = get_nc_variable_attributes(self.dataset.variables[var_name], 'units', 'calendar')
+            time_axes[coor_type] = None
+            if not units:
+                logging.warning(f"The time coordinate {var_name} has no units")
+                continue
+            try:
+                time_axes[coor_type] = get_time_axis(units, calendar)
+            except ValueError as e:
+                logging.warning(f"The time coordinate {var_name}: {e}")
+        return time_axes
+
+    @cached_property
+    def data_variables(self):
+        nc_data_variables = {}
+        for var_name, var_obj in self.dataset.variables.items():
+            if (var_name not in self.coordinate_type_mapping) and (len(var_obj.shape) >= 1):
+                nc_data_variables[var_name] = var_obj
+        return nc_data_variables
+
+    @cached_property
+    def grid_mapping_variable_name(self):
+        nc_grid_mapping_variable_name = ''
+        for var_name, var_obj in self.dataset.variables.items():
+            if hasattr(var_obj, 'grid_mapping_name') and var_obj.grid_mapping_name:
+                nc_grid_mapping_variable_name = var_name
+        return nc_grid_mapping_variable_name
+
+    @cached_property
+    def grid_mapping_variable(self):
+        nc_grid_mapping_variable = None
+        for var_obj in self.dataset.variables.values():
+            if hasattr(var_obj, 'grid_mapping_name'):
+                nc_grid_mapping_variable = var_obj
+        return nc_grid_mapping_variable
+
+
 # Functions for coordinate information of the dataset
 # The functions below will call functions defined for auxiliary, coordinate and bounds variables.
 def get_nc_variables_coordinate_type_mapping(nc_dataset):
@@ -585,21 +781,8 @@ def get_nc_variables_coordinate_type_mapping(nc_dataset):
             XC_bnd, YC_bnd, ZC_bnd, TC_bnd, Unknown_bnd for coordinate bounds variable
             XA_bnd, YA_bnd, ZA_bnd, TA_bnd, Unknown_A_bnd for auxiliary coordinate bounds variable
     """
-    nc_variables_dict = {
-        "C": get_nc_coordinate_variables(nc_dataset),
-        "A": get_nc_auxiliary_coordinate_variables(nc_dataset),
-    }
-    nc_variables_coordinate_type_mapping = {}
 
-    for variables_type, variables_dict in list(nc_variables_dict.items()):
-        for var_name, var_obj in list(variables_dict.items()):
-            var_coor_type_name = get_nc_variable_coordinate_type(var_obj) + variables_type
-            nc_variables_coordinate_type_mapping[var_name] = var_coor_type_name
-            if hasattr(var_obj, 'bounds') and nc_dataset.variables.get(var_obj.bounds, None):
-                var_coor_bounds_type_name = var_coor_type_name + '_bnd'
-                nc_variables_coordinate_type_mapping[var_obj.bounds] = var_coor_bounds_type_name
-
-    return nc_variables_coordinate_type_mapping
+    return dict(get_nc_context(nc_dataset).coordinate_type_mapping)
 
 
 def get_nc_variable_coordinate_type(nc_variable):
@@ -610,39 +793,45 @@ def get_nc_variable_coordinate_type(nc_variable):
             If not discerned as X, Y, Z, T, Unknown is returned
     """
 
-    if hasattr(nc_variable, 'axis') and nc_variable.axis:
-        return nc_variable.axis
+    axis, standard_name, long_name, positive, units = get_nc_variable_attributes(
+        nc_variable, 'axis', 'standard_name', 'long_name', 'positive', 'units'
+    )
+    if axis:
+        return axis
 
-    nc_variable_standard_name = getattr(nc_variable, 'standard_name', getattr(nc_variable, 'long_name', None))
+    nc_variable_standard_name = standard_name if standard_name is not None else long_name
     if nc_variable_standard_name:
-        compare_dict = {
-            'latitude': 'Y',
-            'longitude': 'X',
-            'time': 'T',
-            'projection_x_coordinate': 'X',
-            'projection_y_coordinate': 'Y',
-        }
-        for standard_name, coor_type in list(compare_dict.items()):
-            if re.match(standard_name, nc_variable_standard_name, re.I):
-                return coor_type
+        match = _COORDINATE_NAME_PATTERN.match(nc_variable_standard_name)
+        if match:
+            return COORDINATE_NAME_TYPES[match.lastindex]
 
-    if hasattr(nc_variable, 'positive'):
+    if positive is not None:
         return 'Z'
 
-    if hasattr(nc_variable, 'units') and nc_variable.units:
-        if re.match('degree(s)?.e(ast)?', nc_variable.units, re.I):
+    if units:
+        if _EAST_UNITS_PATTERN.match(units):
             return 'X'
-        elif re.match('degree(s)?.n(orth)?', nc_variable.units, re.I):
+        elif _NORTH_UNITS_PATTERN.match(units):
             return 'Y'
         else:
-            info = nc_variable.units.split(' ')
-            time_units = ['days', 'hours', 'minutes', 'seconds', 'milliseconds', 'microseconds']  # see python netcdf4
-            if len(info) >= 3 and (info[0].lower() in time_units) and info[1].lower() == 'since':
+            info = units.split(' ')
+            if len(info) >= 3 and (info[0].lower() in TIME_UNITS) and info[1].lower() == 'since':
                 return 'T'
 
     return 'Unknown'
 
 
+def get_nc_variable_attributes(nc_variable, *names):
+    """
+    (object, string...)-> list
+
+    Return: the values of the named attributes of the variable, None for the missing ones. The names
+            of the attributes are read once, rather than a failed lookup per missing attribute.
+    """
+    nc_attribute_names = nc_variable.ncattrs()
+    return [nc_variable.getncattr(name) if name in nc_attribute_names else None for name in names]
+
+
 def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
     """
     (object)-> dict
@@ -650,33 +839,38 @@ def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
     Return: coordinate meta data if the variable is related to a coordinate type:
             coordinate or auxiliary coordinate variable or bounds variable
     """
-    nc_variables_coordinate_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    nc_context = get_nc_context(nc_dataset)
+    # the data of each coordinate variable is read once per dataset
+    if nc_variable_name not in nc_context.coordinate_meta:
+        nc_context.coordinate_meta[nc_variable_name] = _get_nc_variable_coordinate_meta(nc_context, nc_variable_name)
+
+    return dict(nc_context.coordinate_meta[nc_variable_name])
+
+
+def _get_nc_variable_coordinate_meta(nc_context, nc_variable_name):
+    nc_dataset = nc_context.dataset
+    nc_variables_coordinate_type_mapping = nc_context.coordinate_type_mapping
     nc_variable_coordinate_meta = {}
-    if nc_variable_name in list(nc_variables_coordinate_type_mapping.keys()):
+    if nc_variable_name in nc_variables_coordinate_type_mapping:
         nc_variable = nc_dataset.variables[nc_variable_name]
-        nc_variable_data = nc_variable[:]
         nc_variable_coordinate_type = nc_variables_coordinate_type_mapping[nc_variable_name]
         coordinate_max = None
         coordinate_min = None
-        if nc_variable_data.size:
-            coordinate_min = nc_variable_data[numpy.unravel_index(nc_variable_data.argmin(), nc_variable_data.shape)]
-            coordinate_max = nc_variable_data[numpy.unravel_index(nc_variable_data.argmax(), nc_variable_data.shape)]
+        if nc_variable.size:
+            # without reading the whole variable, coordinate variables and their bounds are monotonic
+            extent = variable_extent(nc_variable, monotonic=nc_variable_name in nc_context.monotonic_variable_names)
+            if extent is not None:
+                coordinate_min, coordinate_max = extent
             coordinate_units = nc_variable.units if hasattr(nc_variable, 'units') else ''
 
-            if nc_variable_coordinate_type in ['TC', 'TA', 'TC_bnd', 'TA_bnd']:
-                index = list(nc_variables_coordinate_type_mapping.values()).index(nc_variable_coordinate_type[:2])
-                var_name = list(nc_variables_coordinate_type_mapping.keys())[index]
-                var_obj = nc_dataset.variables[var_name]
-                time_units = var_obj.units if hasattr(var_obj, 'units') else ''
-                time_calendar = var_obj.calendar if hasattr(var_obj, 'calendar') else 'standard'
-
-                if time_units and time_calendar:
+            if nc_variable_coordinate_type in TIME_COORDINATE_TYPES:
+                time_axis = nc_context.time_axes.get(nc_variable_coordinate_type[:2])
+                if time_axis is not None and extent is not None:
                     try:
-                        coordinate_min = netCDF4.num2date(coordinate_min, units=time_units, calendar=time_calendar)
-                        coordinate_max = netCDF4.num2date(coordinate_max, units=time_units, calendar=time_calendar)
-                        coordinate_units = time_units
-                    except Exception:
-                        pass
+                        coordinate_min, coordinate_max = time_axis.decode([coordinate_min, coordinate_max])
+                        coordinate_units = time_axis.units
+                    except Exception as e:
+                        logging.warning(f"Can't decode the time values of {nc_variable_name}: {e}")
 
             nc_variable_coordinate_meta = {
                 'coordinate_type': nc_variable_coordinate_type,
@@ -704,13 +898,7 @@ def get_nc_coordinate_variables(nc_dataset):
     Return netCDF coordinate variable
     """
 
-    nc_all_variables = nc_dataset.variables
-    nc_coordinate_variables = {}
-    for var_name, var_obj in list(nc_all_variables.items()):
-        if len(var_obj.shape) == 1 and var_name == var_obj.dimensions[0]:
-            nc_coordinate_variables[var_name] = nc_dataset.variables[var_name]
-
-    return nc_coordinate_variables
+    return dict(get_nc_context(nc_dataset).coordinate_variables)
 
 
 def get_nc_coordinate_variable_namelist(nc_dataset):
@@ -740,15 +928,7 @@ def get_nc_auxiliary_coordinate_variable_namelist(nc_dataset):
     Return: the netCDF auxiliary coordinate variable names
     """
 
-    nc_all_variables = nc_dataset.variables
-    raw_namelist = []
-    for var_name, var_obj in list(nc_all_variables.items()):
-        if hasattr(var_obj, 'coordinates'):
-            raw_namelist.extend(var_obj.coordinates.split(' '))
-
-    nc_auxiliary_coordinate_variable_namelist = list(set(raw_namelist))
-
-    return nc_auxiliary_coordinate_variable_namelist
+    return list(get_nc_context(nc_dataset).auxiliary_coordinate_variable_namelist)
 
 
 def get_nc_auxiliary_coordinate_variables(nc_dataset):
@@ -759,13 +939,7 @@ def get_nc_auxiliary_coordinate_variables(nc_dataset):
     Format: {'var_name': var_obj}
     """
 
-    nc_auxiliary_coordinate_variable_namelist = get_nc_auxiliary_coordinate_variable_namelist(nc_dataset)
-    nc_auxiliary_coordinate_variables = {}
-    for name in nc_auxiliary_coordinate_variable_namelist:
-        if nc_dataset.variables.get(name, ''):
-            nc_auxiliary_coordinate_variables[name] = nc_dataset.variables[name]
-
-    return nc_auxiliary_coordinate_variables
+    return dict(get_nc_context(nc_dataset).auxiliary_coordinate_variables)
 
 
 # Functions for Bounds Variable
@@ -783,16 +957,8 @@ def get_nc_coordinate_bounds_variables(nc_dataset):
     Return: the netCDF coordinate bounds variable
     Format: {'var_name': var_obj}
     """
-    nc_coordinate_variables = get_nc_coordinate_variables(nc_dataset)
-    nc_auxiliary_coordinate_variables = get_nc_auxiliary_coordinate_variables(nc_dataset)
-    nc_coordinate_bounds_variables = {}
-    for var_name, var_obj in list(
-        dict(list(nc_coordinate_variables.items()) + list(nc_auxiliary_coordinate_variables.items())).items()
-    ):
-        if hasattr(var_obj, 'bounds') and nc_dataset.variables.get(var_obj.bounds, None):
-            nc_coordinate_bounds_variables[var_obj.bounds] = nc_dataset.variables[var_obj.bounds]
 
-    return nc_coordinate_bounds_variables
+    return dict(get_nc_context(nc_dataset).coordinate_bounds_variables)
 
 
 def get_nc_coordinate_bounds_variable_namelist(nc_dataset):
@@ -816,14 +982,7 @@ def get_nc_data_variables(nc_dataset):
     Return: the netCDF Data variables
     """
 
-    nc_non_data_variables_namelist = list(get_nc_variables_coordinate_type_mapping(nc_dataset).keys())
-
-    nc_data_variables = {}
-    for var_name, var_obj in list(nc_dataset.variables.items()):
-        if (var_name not in nc_non_data_variables_namelist) and (len(var_obj.shape) >= 1):
-            nc_data_variables[var_name] = var_obj
-
-    return nc_data_variables
+    return dict(get_nc_context(nc_dataset).data_variables)
 
 
 def get_nc_data_variable_namelist(nc_dataset):
@@ -846,13 +1005,8 @@ def get_nc_grid_mapping_variable_name(nc_dataset):
 
     Return: the netCDF grid mapping variable name
     """
-    nc_all_variables = nc_dataset.variables
-    nc_grid_mapping_variable_name = ''
-    for var_name, var_obj in list(nc_all_variables.items()):
-        if hasattr(var_obj, 'grid_mapping_name') and var_obj.grid_mapping_name:
-            nc_grid_mapping_variable_name = var_name
 
-    return nc_grid_mapping_variable_name
+    return get_nc_context(nc_dataset).grid_mapping_variable_name
 
 
 def get_nc_grid_mapping_variable(nc_dataset):
@@ -862,13 +1016,7 @@ def get_nc_grid_mapping_variable(nc_dataset):
     Return: the netCDF grid mapping variable object
     """
 
-    nc_all_variables = nc_dataset.variables
-    nc_grid_mapping_variable = None
-    for var_name, var_obj in list(nc_all_variables.items()):
-        if hasattr(var_obj, 'grid_mapping_name'):
-            nc_grid_mapping_variable = var_obj
-
-    return nc_grid_mapping_variable
+    return get_nc_context(nc_dataset).grid_mapping_variable
 
 
 def get_nc_grid_mapping_projection_name(nc_dataset):
@@ -1201,7 +1349,7 @@ def combine_metadata(extracted_core_meta, extracted_specific_meta):
     # add rights (applies only to NetCDF resource type)
     if extracted_core_meta.get('rights'):
         raw_info = extracted_core_meta.get('rights')
-        b = re.search("(?P<url>https?://[^\s]+)", raw_info)
+        b = _URL_PATTERN.search(raw_info)
         url = b.group('url') if b else ''
         statement = raw_info.replace(url, '') if url else raw_info
         rights = {'rights': {'statement': statement, 'url': url}}
@@ -0,0 +1,2 @@
+# how the minimum and maximum of raster bands are computed, see hsextract.raster.statistics
+BAND_STATISTICS = ("exact", "approximate", "sampled", "existing")
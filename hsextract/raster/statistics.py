@@ -0,0 +1,360 @@
+"""
+Minimum and maximum of raster bands. Exact statistics read every pixel of the band, which dominates
+the extraction of multi-GB GeoTIFFs and VRT mosaics, so cheaper strategies can be chosen instead:
+
+- "exact": every pixel, read in block aligned windows by windowed_statistics
+- "approximate": ComputeRasterMinMax with approx_ok, which uses an overview or a subset of the blocks
+- "sampled": reads the band decimated to at most SAMPLE_SIZE x SAMPLE_SIZE pixels
+- "existing": the STATISTICS_* metadata stored in the file or its .aux.xml (e.g. by gdalinfo -stats),
+  computing exact statistics when there is none or they are approximate
+
+Unlike ComputeStatistics, none of the strategies store the statistics they compute, which GDAL would
+save to an .aux.xml next to the input.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+import numpy
+
+from hsextract.raster import BAND_STATISTICS
+
+SAMPLE_SIZE = 1024
+# pixels read per window by windowed_statistics, 16 MB of Float32
+WINDOW_PIXELS = 4 * 1024 * 1024
+# values within this tolerance of the nodata value (numpy.isclose's defaults) are taken as nodata
+# pixels whose value lost precision, e.g. a Float32 fill value declared as a double
+NO_DATA_RTOL = 1e-05
+NO_DATA_ATOL = 1e-08
+
+
+class BandStatistics(NamedTuple):
+    minimum: float
+    maximum: float
+    # the band's nodata value, corrected to the value of the nodata pixels when it only matched them
+    # approximately
+    no_data: float
+    # the strategy the statistics were computed with
+    statistics: str
+    # the valid pixels, when every pixel was read
+    count: int = None
+
+
+def band_statistics(band, strategy: str = "exact"):
+    """
+    Return: the minimum and maximum of the band and the strategy they were computed with, which is
+    "exact" when the strategy is "existing" and the band has no stored statistics. Exact statistics
+    are computed by GDAL's ComputeStatistics; dataset_statistics computes them for every band in
+    parallel windows instead.
+    """
+    if strategy not in BAND_STATISTICS:
+        raise ValueError(f"Unknown band statistics {strategy}, expected one of {', '.join(BAND_STATISTICS)}")
+    if strategy == "existing":
+        stored = stored_statistics(band)
+        if stored is not None:
+            return stored + ("existing",)
+        strategy = "exact"
+    if strategy == "sampled":
+        return sampled_statistics(band) + ("sampled",)
+    if strategy == "approximate":
+        return approximate_statistics(band) + ("approximate",)
+    minimum, maximum, _, _ = band.ComputeStatistics(False)
+    return minimum, maximum, strategy
+
+
+def dataset_statistics(
+    dataset,
+    strategy: str = "exact",
+    open_dataset: Callable = None,
+    max_workers: int = None,
+    window_pixels: int = WINDOW_PIXELS,
+):
+    """
+    Return: a BandStatistics for each band of the dataset, computed with the strategy. Exact
+    statistics are computed by windowed_statistics, in parallel when open_dataset is given.
+
+    When the minimum or maximum of a band only approximately matches its nodata value, those pixels
+    are taken as nodata: the nodata value is corrected to their value and they are left out of the
+    statistics. The corrected value is returned, the band is not changed.
+    """
+    if strategy not in BAND_STATISTICS:
+        raise ValueError(f"Unknown band statistics {strategy}, expected one of {', '.join(BAND_STATISTICS)}")
+    results = {}
+    exact = []
+    for band_number in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(band_number)
+        if strategy == "existing":
+            stored = stored_statistics(band)
+            # stored statistics that need the nodata correction are computed again
+            if stored is None or _corrected_no_data(band.GetNoDataValue(), *stored) is not None:
+                exact.append(band_number)
+            else:
+                results[band_number] = BandStatistics(*stored, band.GetNoDataValue(), "existing")
+        elif strategy == "exact":
+            exact.append(band_number)
+        else:
+            results[band_number] = _corrected_statistics(band, strategy)
+    if exact:
+        results.update(zip(exact, windowed_statistics(dataset, exact, open_dataset, max_workers, window_pixels)))
+    return [results[band_number] for band_number in sorted(results)]
+
+
+def _corrected_statistics(band, strategy: str):
+    """
+    Return: the BandStatistics of the approximate or sampled strategy, computed again with the
+    corrected nodata value when needed
+    """
+    minimum, maximum, _ = band_statistics(band, strategy)
+    no_data = band.GetNoDataValue()
+    corrected = _corrected_no_data(no_data, minimum, maximum)
+    if corrected is None:
+        return BandStatistics(minimum, maximum, no_data, strategy)
+    band.SetNoDataValue(corrected)
+    try:
+        minimum, maximum, _ = band_statistics(band, strategy)
+    finally:
+        band.SetNoDataValue(no_data)
+    return BandStatistics(minimum, maximum, corrected, strategy)
+
+
+def _corrected_no_data(no_data, minimum, maximum):
+    """Return: the minimum or maximum that approximately matches the nodata value, or None"""
+    if not _may_need_correction(no_data):
+        return None
+    for value in (minimum, maximum):
+        if value is not None and numpy.isclose(value, no_data, rtol=NO_DATA_RTOL, atol=NO_DATA_ATOL):
+            return value
+    return None
+
+
+def _may_need_correction(no_data):
+    # a nodata value of 0 has never been corrected
+    return bool(no_data) and bool(numpy.isfinite(no_data))
+
+
+def windowed_statistics(
+    dataset,
+    band_numbers=None,
+    open_dataset: Callable = None,
+    max_workers: int = None,
+    window_pixels: int = WINDOW_PIXELS,
+):
+    """
+    Return: the exact BandStatistics of the bands (default: every band) of the dataset, with the
+    nodata correction of dataset_statistics applied in the same pass.
+
+    Bands of the same data type are read together, in a single ReadAsArray of every window, and
+    reduced with vectorised NumPy reductions, so a many band raster costs about one read of the
+    dataset. Windows are made of whole blocks (TIFF tiles or strips) and hold at most window_pixels
+    values of all the bands read together (at least a block of each band), so memory is bounded by
+    the window size times the number of workers rather than by the size of the raster.
+
+    Windows are read in parallel by max_workers threads. GDAL datasets must not be shared between
+    threads, so each thread reads from its own dataset returned by open_dataset; without
+    open_dataset the windows are read from dataset by the calling thread.
+    """
+    if band_numbers is None:
+        band_numbers = range(1, dataset.RasterCount + 1)
+    no_data = {}
+    data_types = {}
+    for band_number in band_numbers:
+        band = dataset.GetRasterBand(band_number)
+        no_data[band_number] = band.GetNoDataValue()
+        data_types.setdefault(band.DataType, []).append(band_number)
+
+    tasks = []
+    for same_type in data_types.values():
+        block_x, block_y = dataset.GetRasterBand(same_type[0]).GetBlockSize()
+        # as many bands per read as fit a block of each in the window
+        per_read = max(1, window_pixels // (block_x * block_y))
+        for i in range(0, len(same_type), per_read):
+            bands = same_type[i : i + per_read]
+            windows = block_windows(dataset.GetRasterBand(bands[0]), window_pixels // len(bands))
+            tasks.extend((bands, window) for window in windows)
+
+    if open_dataset is None:
+        reductions = (_reduce_window(dataset, bands, window, no_data) for bands, window in tasks)
+        return _combine(band_numbers, tasks, reductions, no_data)
+
+    local = threading.local()
+
+    def reduce_window(task):
+        bands, window = task
+        thread_dataset = getattr(local, "dataset", None)
+        if thread_dataset is None:
+            thread_dataset = local.dataset = open_dataset()
+        return _reduce_window(thread_dataset, bands, window, no_data)
+
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+    # the datasets opened by the workers are closed with their threads on shutdown
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return _combine(band_numbers, tasks, executor.map(reduce_window, tasks), no_data)
+
+
+def block_windows(band, window_pixels: int = WINDOW_PIXELS):
+    """
+    Yield: (xoff, yoff, xsize, ysize) windows covering the band, each made of whole blocks: full
+    rows of strips, or rectangles of tiles at most a row of tiles wide
+    """
+    block_x, block_y = band.GetBlockSize()
+    width, height = band.XSize, band.YSize
+    block_x, block_y = min(block_x, width), min(block_y, height)
+    blocks = max(1, window_pixels // (block_x * block_y))
+    blocks_per_row = min(-(-width // block_x), blocks)
+    window_x = blocks_per_row * block_x
+    window_y = max(1, blocks // blocks_per_row) * block_y
+    for yoff in range(0, height, window_y):
+        for xoff in range(0, width, window_x):
+            yield xoff, yoff, min(window_x, width - xoff), min(window_y, height - yoff)
+
+
+def _reduce_window(dataset, band_numbers, window, no_data: dict):
+    """
+    Return: for each band, the (minimum, maximum, count) of the valid values of the window, and of
+    the valid values that are not approximately nodata
+    """
+    xoff, yoff, xsize, ysize = window
+    values = read_bands(dataset, band_numbers, window).reshape(len(band_numbers), ysize, xsize)
+    band_no_data = [no_data[band_number] for band_number in band_numbers]
+    valid = _valid_band_mask(values, band_no_data)
+    reductions = _min_max_count(values, valid)
+    corrected = [_may_need_correction(value) for value in band_no_data]
+    if not any(corrected):
+        return reductions, reductions
+    # double bounds, which may be outside the range of the bands' type; values of bands without a
+    # correction are always outside (inf, -inf)
+    tolerance = [NO_DATA_ATOL + NO_DATA_RTOL * abs(value) if c else 0 for value, c in zip(band_no_data, corrected)]
+    lower = numpy.array([v - t if c else numpy.inf for v, t, c in zip(band_no_data, tolerance, corrected)])
+    upper = numpy.array([v + t if c else -numpy.inf for v, t, c in zip(band_no_data, tolerance, corrected)])
+    valid &= (values < lower[:, None, None]) | (values > upper[:, None, None])
+    return reductions, _min_max_count(values, valid)
+
+
+def read_bands(dataset, band_numbers, window):
+    """
+    Return: the window of the bands, which must be of the same data type, as a (bands, rows, columns)
+    array, or a (rows, columns) array for a single band
+    """
+    xoff, yoff, xsize, ysize = window
+    try:
+        return dataset.ReadAsArray(xoff, yoff, xsize, ysize, band_list=band_numbers)
+    except TypeError:
+        # ReadAsArray of older GDAL (e.g. 3.2 of the production image) has no band_list; the bands
+        # of a pixel interleaved block are cached together, so the block is still read once
+        bands = [dataset.GetRasterBand(band_number) for band_number in band_numbers]
+        return numpy.stack([band.ReadAsArray(xoff, yoff, xsize, ysize) for band in bands])
+
+
+_EMPTY = (None, None, 0)
+
+
+def _min_max_count(values, mask):
+    """Return: the (minimum, maximum, count) of the masked values of each band"""
+    if numpy.issubdtype(values.dtype, numpy.floating):
+        low, high = -numpy.inf, numpy.inf
+    else:
+        low, high = numpy.iinfo(values.dtype).min, numpy.iinfo(values.dtype).max
+    counts = numpy.count_nonzero(mask, axis=(1, 2))
+    minimums = numpy.min(values, axis=(1, 2), where=mask, initial=high)
+    maximums = numpy.max(values, axis=(1, 2), where=mask, initial=low)
+    return [
+        (float(minimum), float(maximum), int(count)) if count else _EMPTY
+        for minimum, maximum, count in zip(minimums, maximums, counts)
+    ]
+
+
+def _merge(total, reduction):
+    """Return: the (minimum, maximum, count) of the values of two (minimum, maximum, count)"""
+    if not reduction[2]:
+        return total
+    if not total[2]:
+        return reduction
+    return min(total[0], reduction[0]), max(total[1], reduction[1]), total[2] + reduction[2]
+
+
+def _combine(band_numbers, tasks, reductions, no_data):
+    """Return: the BandStatistics of each band from the reductions of its windows"""
+    totals = {band_number: (_EMPTY, _EMPTY) for band_number in band_numbers}
+    for (bands, _), (valid, not_no_data) in zip(tasks, reductions):
+        for band_number, band_valid, band_not_no_data in zip(bands, valid, not_no_data):
+            total_valid, total_not_no_data = totals[band_number]
+            totals[band_number] = _merge(total_valid, band_valid), _merge(total_not_no_data, band_not_no_data)
+
+    statistics = []
+    for band_number in band_numbers:
+        valid, not_no_data = totals[band_number]
+        corrected = _corrected_no_data(no_data[band_number], valid[0], valid[1])
+        if corrected is None:
+            statistics.append(BandStatistics(*valid[:2], no_data[band_number], "exact", valid[2]))
+        else:
+            statistics.append(BandStatistics(*not_no_data[:2], corrected, "exact", not_no_data[2]))
+    return statistics
+
+
+def stored_statistics(band):
+    """
+    Return: the minimum and maximum stored in the band's metadata, or None when there are none or
+    they were computed approximately (e.g. by gdalinfo -approx_stats)
+    """
+    minimum = band.GetMetadataItem("STATISTICS_MINIMUM")
+    maximum = band.GetMetadataItem("STATISTICS_MAXIMUM")
+    if minimum is None or maximum is None or band.GetMetadataItem("STATISTICS_APPROXIMATE") == "YES":
+        return None
+    return float(minimum), float(maximum)
+
+
+def approximate_statistics(band):
+    """
+    Return: the approximate minimum and maximum of ComputeRasterMinMax, read from an overview or a
+    subset of the blocks (or the band's stored statistics when it has any), (None, None) when it finds
+    no valid pixel
+    """
+    minimum_maximum = band.ComputeRasterMinMax(True)
+    if minimum_maximum is None:
+        return None, None
+    minimum, maximum = minimum_maximum
+    return float(minimum), float(maximum)
+
+
+def sampled_statistics(band, sample_size: int = SAMPLE_SIZE):
+    """
+    Return: the minimum and maximum of the band read at a resolution of at most sample_size pixels
+    on each side, (None, None) when every sampled pixel is nodata. GDAL reads the decimated window
+    from an overview when the band has one.
+    """
+    columns = min(band.XSize, sample_size)
+    rows = min(band.YSize, sample_size)
+    values = band.ReadAsArray(0, 0, band.XSize, band.YSize, buf_xsize=columns, buf_ysize=rows)
+    values = valid_values(values, band.GetNoDataValue())
+    if values.size == 0:
+        return None, None
+    return float(values.min()), float(values.max())
+
+
+def valid_mask(values, no_data=None):
+    """Return: a mask of the values that are neither nodata nor NaN"""
+    return _valid_band_mask(values[numpy.newaxis], [no_data])[0]
+
+
+def _valid_band_mask(values, no_data):
+    """Return: a mask of the values of each band (the first axis) that are neither its nodata nor NaN"""
+    floating = numpy.issubdtype(values.dtype, numpy.floating)
+    no_data = numpy.array([numpy.nan if value is None else value for value in no_data], dtype=numpy.float64)
+    if floating:
+        # compare float bands in their own precision, so a float32 nodata stored as a double (e.g.
+        # -3.4028234663852886e+38) still matches
+        with numpy.errstate(over="ignore"):
+            no_data = no_data.astype(values.dtype)
+    # NaN, for bands without nodata, matches no value
+    mask = values != no_data[:, None, None]
+    if floating:
+        mask &= ~numpy.isnan(values)
+    return mask
+
+
+def valid_values(values, no_data=None):
+    """Return: the values that are neither nodata nor NaN, flattened"""
+    return values[valid_mask(values, no_data)]
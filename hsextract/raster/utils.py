@@ -1,61 +1,48 @@
 import logging
 import os
 import re
-import tempfile
 import xml.etree.ElementTree as ET
 from collections import OrderedDict
-from pathlib import Path
+from functools import partial
 from textwrap import indent
 
-import numpy
 from osgeo import gdal, osr
 from osgeo.gdalconst import GA_ReadOnly
 from pycrs.parse import from_unknown_wkt
 
+from hsextract.raster.statistics import dataset_statistics
 
-def extract_from_tif_file(tif_file):
+
+def extract_from_tif_file(tif_file, statistics="exact", max_threads=None):
+    """
+    Return: the raster metadata of a GeoTIFF or VRT, with band statistics computed by the
+    statistics strategy (see hsextract.raster.statistics) in up to max_threads threads
+    """
     ext = os.path.splitext(tif_file)[1]
     full_path = os.path.dirname(tif_file)
     if ext != ".vrt":
-        filename = create_vrt_file(tif_file)
+        # a single GeoTIFF is read directly rather than through a VRT wrapping it, with the name of
+        # the VRT HydroShare creates for it
+        name = f'{os.path.basename(tif_file)}.vrt'
         tif_files = [tif_file]
     else:
-        filename = tif_file
-        tif_files = list_tif_files(filename)
+        name = os.path.basename(tif_file)
+        tif_files = list_tif_files(tif_file)
         tif_files = [os.path.join(full_path, f) for f in tif_files] + [tif_file]
     # file validation and metadaadatta extraction
-    file_type_metadata = extract_metadata_from_vrt(filename)
+    file_type_metadata = extract_metadata_from_vrt(tif_file, statistics, name, max_threads)
     file_type_metadata["content_files"] = tif_files
 
     return file_type_metadata
 
 
-def create_vrt_file(tif_file):
-    """tif_file exists in temp directory - retrieved from irods"""
-
-    # create vrt file
-    temp_dir = tempfile.gettempdir()
-    tif_file_name = os.path.basename(tif_file)
-    vrt_file_path = os.path.join(temp_dir, f'{tif_file_name}.vrt')
-    # os.mknod(vrt_file_path)
-    input_file = gdal.Open(tif_file)
-    output_file = gdal.Translate(vrt_file_path, input_file, format="VRT")
-
-    # edit VRT contents
-    tree = ET.parse(vrt_file_path)
-    root = tree.getroot()
-    for element in root.iter('SourceFilename'):
-        element.text = tif_file_name
-        element.attrib['relativeToVRT'] = '1'
-
-    tree.write(vrt_file_path)
-
-    return vrt_file_path
-
-
-def extract_metadata_from_vrt(vrt_file_path):
+def extract_metadata_from_vrt(vrt_file_path, statistics="exact", name=None, max_threads=None):
+    """
+    Return: the raster metadata of a VRT or GeoTIFF, with cell_information named name (default: the
+    file name)
+    """
     metadata = []
-    res_md_dict = get_raster_meta_dict(vrt_file_path)
+    res_md_dict = get_raster_meta_dict(vrt_file_path, statistics, max_threads)
     wgs_cov_info = res_md_dict['spatial_coverage_info']['wgs84_coverage_info']
     # add core metadata coverage - box
     if wgs_cov_info and wgs_cov_info["northlimit"] is not None:
@@ -72,13 +59,12 @@ def extract_metadata_from_vrt(vrt_file_path):
         metadata.append(ori_cov)
 
     # Save extended meta cell info
-    res_md_dict['cell_info']['name'] = os.path.basename(vrt_file_path)
+    res_md_dict['cell_info']['name'] = name or os.path.basename(vrt_file_path)
     metadata.append({'cell_information': res_md_dict['cell_info']})
 
-    # Save extended meta band info
-    assert len(res_md_dict['band_info']) == 1
-
-    for index, band_info in enumerate(list(res_md_dict['band_info'].values())):
+    # Save extended meta band info, a list in band order
+    band_information = []
+    for band_info in res_md_dict['band_info'].values():
         b_info = {}
         b_info["name"] = band_info["name"]
         b_info["maximum_value"] = band_info["maximumValue"]
@@ -86,7 +72,9 @@ def extract_metadata_from_vrt(vrt_file_path):
         b_info["no_data_value"] = band_info["noDataValue"]
         b_info["variable_name"] = band_info["variableName"]
         b_info["variable_unit"] = band_info["variableUnit"]
-        metadata.append({f'band_information': b_info})
+        b_info["statistics"] = band_info["statistics"]
+        band_information.append(b_info)
+    metadata.append({'band_information': band_information})
 
     metadata_dict = {}
     # use the extracted metadata to populate file metadata
@@ -99,17 +87,31 @@ def extract_metadata_from_vrt(vrt_file_path):
     return metadata_dict
 
 
-def get_raster_meta_dict(raster_file_name):
+def open_raster(raster):
+    """
+    (string or object) --> object
+
+    Return: the GDAL dataset of a raster file path, or raster itself when it is already an opened dataset
     """
-    (string)-> dict
+    if isinstance(raster, (str, os.PathLike)):
+        return gdal.Open(os.fspath(raster), GA_ReadOnly)
+    return raster
+
+
+def get_raster_meta_dict(raster_file_name, statistics="exact", max_threads=None):
+    """
+    (string, string, int)-> dict
 
     Return: the raster science metadata extracted from the raster file
     """
 
+    # open the raster once: for a VRT mosaic every open parses the XML and reads each tile's header
+    raster_dataset = open_raster(raster_file_name)
+
     # get the metadata info from raster files
-    spatial_coverage_info = get_spatial_coverage_info(raster_file_name)
-    cell_info = get_cell_info(raster_file_name)
-    band_info = get_band_info(raster_file_name)
+    spatial_coverage_info = get_spatial_coverage_info(raster_dataset)
+    cell_info = get_cell_info(raster_dataset)
+    band_info = get_band_info(raster_dataset, statistics, max_threads)
 
     # write meta as dictionary
     raster_meta_dict = {
@@ -121,16 +123,16 @@ def get_raster_meta_dict(raster_file_name):
     return raster_meta_dict
 
 
-def get_spatial_coverage_info(raster_file_name):
+def get_spatial_coverage_info(raster):
     """
-    (string) --> dict
+    (string or object) --> dict
 
     Return: meta of spatial extent and projection of raster includes both original info
     and wgs84 info
     """
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    raster_dataset = open_raster(raster)
     original_coverage_info = get_original_coverage_info(raster_dataset)
-    wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset)
+    wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset, original_coverage_info)
     spatial_coverage_info = {
         'original_coverage_info': original_coverage_info,
         'wgs84_coverage_info': wgs84_coverage_info,
@@ -228,10 +230,11 @@ def get_original_coverage_info(raster_dataset):
     return spatial_coverage_info
 
 
-def get_wgs84_coverage_info(raster_dataset):
+def get_wgs84_coverage_info(raster_dataset, original_coverage_info=None):
     """
-    (object) --> dict
-    Return: meta of spatial extent as wgs84 geographic coordinate system of raster
+    (object, dict) --> dict
+    Return: meta of spatial extent as wgs84 geographic coordinate system of raster, transformed from
+    original_coverage_info when it was already computed for raster_dataset
     """
     # get original coordinate system
     try:
@@ -244,7 +247,8 @@ def get_wgs84_coverage_info(raster_dataset):
         proj = None
 
     wgs84_coverage_info = OrderedDict()
-    original_coverage_info = get_original_coverage_info(raster_dataset)
+    if original_coverage_info is None:
+        original_coverage_info = get_original_coverage_info(raster_dataset)
 
     if proj and (None not in list(original_coverage_info.values())):
         original_cs = osr.SpatialReference()
@@ -306,22 +310,23 @@ def get_wgs84_coverage_info(raster_dataset):
     return wgs84_coverage_info
 
 
-def get_cell_info(raster_file_name):
+def get_cell_info(raster):
     """
-    (object) --> dict
+    (string or object) --> dict
 
     Return: meta info of cells in raster
     """
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    raster_dataset = open_raster(raster)
 
     # get cell size info
     if raster_dataset:
         rows = raster_dataset.RasterYSize
         columns = raster_dataset.RasterXSize
         proj_wkt = raster_dataset.GetProjection()
-        cell_size_x_value = raster_dataset.GetGeoTransform()[1] if proj_wkt else 0
-        cell_size_y_value = abs(raster_dataset.GetGeoTransform()[5]) if proj_wkt else 0
+        gt = raster_dataset.GetGeoTransform() if proj_wkt else None
+        cell_size_x_value = gt[1] if proj_wkt else 0
+        cell_size_y_value = abs(gt[5]) if proj_wkt else 0
         band = raster_dataset.GetRasterBand(1)
         cell_data_type = gdal.GetDataTypeName(band.DataType)
 
@@ -348,65 +353,60 @@ def get_cell_info(raster_file_name):
     return cell_info
 
 
-def get_band_info(raster_file_name):
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+def get_band_info(raster, statistics="exact", max_threads=None):
+    """
+    (string or object, string, int) --> dict
+
+    Return: meta info of each band in raster, keyed by band number, with the minimum and maximum
+    computed by the statistics strategy and the strategy that was used. Exact statistics are read
+    in up to max_threads threads (default: dataset_statistics'), each with its own handle of the
+    raster; with a single thread they are read from raster.
+    """
+    raster_dataset = open_raster(raster)
 
     # get raster band count
     if raster_dataset:
         band_info = {}
-        band_count = raster_dataset.RasterCount
+        open_dataset = _dataset_opener(raster_dataset) if max_threads != 1 else None
+        band_statistics = dataset_statistics(raster_dataset, statistics, open_dataset, max_threads)
 
-        for i in range(0, band_count):
+        for i, band_stats in enumerate(band_statistics):
             band = raster_dataset.GetRasterBand(i + 1)
-            minimum, maximum, _, _ = band.ComputeStatistics(False)
-            no_data = band.GetNoDataValue()
-            new_no_data = None
-
-            if no_data and numpy.allclose(minimum, no_data):
-                new_no_data = minimum
-            elif no_data and numpy.allclose(maximum, no_data):
-                new_no_data = maximum
-
-            if new_no_data is not None:
-                band.SetNoDataValue(new_no_data)
-                minimum, maximum, _, _ = band.ComputeStatistics(False)
-
             band_info[i + 1] = {
                 'name': 'Band_' + str(i + 1),
                 'variableName': '',
                 'variableUnit': band.GetUnitType(),
-                'noDataValue': band.GetNoDataValue(),
-                'maximumValue': maximum,
-                'minimumValue': minimum,
+                'noDataValue': band_stats.no_data,
+                'maximumValue': band_stats.maximum,
+                'minimumValue': band_stats.minimum,
+                'statistics': band_stats.statistics,
             }
     else:
         band_info = {
-            'name': 'Band_1',
-            'variableName': '',
-            'variableUnit': '',
-            'noDataValue': None,
-            'maximumValue': None,
-            'minimumValue': None,
+            1: {
+                'name': 'Band_1',
+                'variableName': '',
+                'variableUnit': '',
+                'noDataValue': None,
+                'maximumValue': None,
+                'minimumValue': None,
+                'statistics': None,
+            }
         }
-    raster_dataset = None
     return band_info
 
 
-def raster_file_metadata_extraction(raster_path):
-    raster_resource_files = []
-    vrt_files_for_raster = get_vrt_files(raster_path)
-
-    if len(vrt_files_for_raster) == 1:
-        vrt_file = vrt_files_for_raster[0]
-        raster_resource_files.extend([vrt_file])
-    else:
-        # create the .vrt file
-        tif_files = [
-            f for f in os.listdir(os.path.dirname(raster_path)) if f.file_name == os.path.basename(raster_path)
-        ]
-        vrt_file = create_vrt_file(raster_path)
+def _dataset_opener(raster_dataset):
+    """
+    (object) --> function
 
-    raster_resource_files.extend(tif_files)
+    Return: a function opening another read only handle of the raster's file, so its blocks can be
+    read from several threads, or None when the raster is not backed by a file
+    """
+    path = raster_dataset.GetDescription()
+    if not path or gdal.VSIStatL(path) is None:
+        return None
+    return partial(gdal.Open, path, GA_ReadOnly)
 
 
 def list_tif_files(vrt_file):
@@ -415,16 +415,3 @@ def list_tif_files(vrt_file):
     root = ET.fromstring(vrt_string)
     file_names_in_vrt = [file_name.text for file_name in root.iter('SourceFilename')]
     return file_names_in_vrt
-
-
-def get_vrt_files(raster_path):
-    dir_path = os.path.dirname(raster_path)
-    vrt_files = [f for f in os.listdir(dir_path) if str(Path(f).suffix).lower() == ".vrt"]
-    vrt_files_for_raster = []
-    if vrt_files:
-        for vrt_file in vrt_files:
-            file_names_in_vrt = list_tif_files(vrt_file)
-            for vrt_ref_raster_name in file_names_in_vrt:
-                if raster_path.endswith(vrt_ref_raster_name):
-                    vrt_files_for_raster.append(vrt_file)
-    return vrt_files_for_raster
@@ -0,0 +1,98 @@
+"""
+JSON serialisation of the output documents.
+
+Records are turned into plain dicts with to_jsonable, which gives the same result as
+json.loads(model.json()) without printing and parsing the JSON text. Outputs are written compact by
+default, with orjson; indentation is opt-in.
+
+Indented outputs are encoded by the json module as they always were: non-ASCII text is escaped,
+NaN and Infinity are written as such and 1e16 as 1e+16. Compact outputs are UTF-8 text with NaN
+and Infinity written as null, by orjson or, for what orjson can't encode (e.g. integers wider than
+64 bits), by the json module. Only the exponents of floats differ between the two, 1e16 is written
+as 1e+16 by the json module.
+"""
+
+import json
+import math
+from enum import Enum
+
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_jsonable(value):
+    """
+    Return: value converted to dicts, lists, str, int, float, bool and None, the way pydantic's
+    .json() encodes it
+    """
+    if value is None or type(value) in (str, int, float, bool):
+        return value
+    if isinstance(value, BaseModel):
+        # what .dict() returns with its default arguments, without copying the fields first
+        return {k: to_jsonable(v) for k, v in value.__dict__.items()}
+    if isinstance(value, dict):
+        return {_to_key(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, Enum):
+        return to_jsonable(value.value)
+    # subclasses of the JSON types (HttpUrl, IdentifierStr, ...) are encoded as their base type
+    if isinstance(value, str):
+        return str.__str__(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    return to_jsonable(pydantic_encoder(value))
+
+
+def _to_key(key):
+    if type(key) is str:
+        return key
+    if isinstance(key, str):
+        return str.__str__(key)
+    # json.dumps writes keys of other basic types as their JSON text, e.g. 1 as "1" and True as "true"
+    return json.dumps(key)
+
+
+def dumps(value, indent: int = None):
+    """Return: value encoded as UTF-8 JSON bytes, compact unless indent is given"""
+    if indent:
+        return json.dumps(value, indent=indent).encode("utf-8")
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # e.g. integers wider than 64 bits, which the json module can still encode
+            pass
+    try:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode("utf-8")
+    except ValueError:
+        # NaN or Infinity, written as null like orjson does
+        return json.dumps(_finite(value), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _finite(value):
+    """Return: value with the NaN and Infinity floats in it replaced by None"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def loads(data):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN and Infinity, which the json module writes but orjson does not read
+            pass
+    return json.loads(data)
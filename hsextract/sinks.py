@@ -0,0 +1,185 @@
+"""
+Destinations for the output records. A record is addressed by its path relative to the output
+directory, e.g. "sub/data.csv.json" or "dataset_metadata.json".
+
+Records are queued with put() and written by a fixed number of tasks on a thread pool, so slow
+writes (a FUSE mount, S3) overlap each other and the extraction. The queue holds at most max_pending
+records: when the destination falls behind, put() waits instead of buffering without bound.
+"""
+
+import abc
+import asyncio
+import os
+
+from hsextract.aggregations import write_metadata
+from hsextract.ndjson import NDJSONWriter
+from hsextract.serialization import dumps, loads
+
+
+class OutputSink(abc.ABC):
+    """Base class of the sinks, which implement write and optionally finish and close"""
+
+    # whether writing a record again replaces it. Sinks that append (NDJSON) are given every record
+    # once, after all the links are resolved, instead of as soon as each record is extracted.
+    rewritable = True
+    # whether records are files under the output directory that a later incremental run can read
+    local = False
+
+    def __init__(self, concurrency: int = 16, max_pending: int = 256):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._queue = None
+        self._workers = []
+        self._executor = None
+        self._error = None
+
+    @abc.abstractmethod
+    def write(self, name: str, record: dict):
+        """Write the record, called on the thread pool"""
+
+    def finish(self):
+        """Complete the output once every record is written, called on the thread pool"""
+
+    def close(self):
+        """Release the destination, whether or not the output was completed"""
+
+    def start(self, executor=None):
+        """Start the writer tasks on the running event loop, writing on executor (default: the loop's)"""
+        self._executor = executor
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.ensure_future(self._write_queued()) for _ in range(self.concurrency)]
+
+    async def _write_queued(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            name, record = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self.write, name, record)
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+    async def put(self, name: str, record: dict):
+        """
+        Queue the record, waiting while max_pending records are queued. The record must not be
+        changed until flush() returns.
+        """
+        if self._queue is None:
+            self.start()
+        await self._queue.put((name, record))
+
+    async def flush(self):
+        """Wait until every queued record is written, raising the first error a write raised"""
+        if self._queue is not None:
+            await self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def aclose(self):
+        """Write the queued records, complete the output and close the sink"""
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.finish)
+        self.cancel()
+
+    def cancel(self):
+        """Stop the writer tasks without waiting for queued records and close the sink"""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queue = None
+        self.close()
+
+
+class LocalSink(OutputSink):
+    """A JSON file per record under root"""
+
+    local = True
+
+    def __init__(self, root: str, indent: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+        self.indent = indent
+
+    def write(self, name: str, record: dict):
+        write_metadata(os.path.join(self.root, name), record, self.indent)
+
+
+class S3Sink(OutputSink):
+    """
+    A JSON object per record in an S3 or MinIO bucket, optionally under a key prefix. Records are
+    sent with concurrent PUTs; upload_file sends large files such as NDJSON shards in multipart
+    uploads.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        endpoint_url: str = None,
+        indent: int = None,
+        concurrency: int = 32,
+        **kwargs,
+    ):
+        super().__init__(concurrency=concurrency, **kwargs)
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.indent = indent
+        self._client = client
+
+    def write(self, name: str, record: dict):
+        self._client.put_object(
+            Bucket=self.bucket, Key=self.prefix + name, Body=dumps(record, self.indent), ContentType="application/json"
+        )
+
+    def upload_file(self, path: str, name: str):
+        self._client.upload_file(path, self.bucket, self.prefix + name)
+
+
+class NDJSONSink(OutputSink):
+    """
+    Appends the records to the shards of an NDJSONWriter. When upload_to is given, the shards are
+    uploaded to it once the output is complete.
+    """
+
+    rewritable = False
+
+    def __init__(self, writer: NDJSONWriter, upload_to: S3Sink = None, **kwargs):
+        # a single writer task keeps the records in the order they were queued
+        super().__init__(concurrency=1, **kwargs)
+        self.writer = writer
+        self.upload_to = upload_to
+
+    def write(self, name: str, record: dict):
+        self.writer.write(record)
+
+    def finish(self):
+        self.writer.close()
+        if self.upload_to is not None:
+            for shard in self.writer.shards:
+                self.upload_to.upload_file(shard, os.path.basename(shard))
+
+    def close(self):
+        self.writer.close()
+
+
+class MemorySink(OutputSink):
+    """Keeps a copy of each record as written in records, for tests"""
+
+    def __init__(self, rewritable: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.rewritable = rewritable
+        self.records = {}
+        self.writes = []
+
+    def write(self, name: str, record: dict):
+        # a copy, since the record may be changed and written again later
+        self.records[name] = loads(dumps(record))
+        self.writes.append(name)
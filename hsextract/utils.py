@@ -2,18 +2,39 @@ import asyncio
 import json
 import logging
 import os
-from pathlib import Path
+from typing import NamedTuple
 
 from hsextract.adapters.hydroshare import HydroshareMetadataAdapter
-from hsextract.feature.utils import extract_metadata_and_files
-from hsextract.file_utils import file_metadata
-from hsextract.listing.utils import prepare_files
+from hsextract.aggregations import AggregationGraph, write_metadata
+from hsextract.exceptions import WorkerProcessException
+from hsextract.executors import ExtractionExecutor
+from hsextract.extractors import run_extractor
+from hsextract.file_utils import ChecksumCache, FileMetadataRegistry, file_metadata
+from hsextract.listing.storage import LocalStorage
+from hsextract.listing.utils import FileCategorizer, walk_files
+from hsextract.manifest import ExtractionManifest
 from hsextract.models.schema import CoreMetadataDOC
-from hsextract.netcdf.utils import get_nc_meta_dict
-from hsextract.raster.utils import extract_from_tif_file
-from hsextract.reftimeseries.utils import extract_referenced_timeseries_metadata
-from hsextract.timeseries.utils import extract_metadata as extract_timeseries_metadata
-from hsextract.timeseries.utils import extract_metadata_csv
+from hsextract.ndjson import NDJSON_SHARD_SIZE, NDJSONWriter
+from hsextract.raster import BAND_STATISTICS
+from hsextract.serialization import to_jsonable
+from hsextract.sinks import LocalSink, NDJSONSink, OutputSink
+
+CHECKSUM_CACHE_FILENAME = ".checksums.sqlite"
+MANIFEST_FILENAME = ".manifest.json"
+# the files of a run in output_path that are never extracted, sqlite keeps a journal next to the
+# cache while it writes
+INTERNAL_FILENAMES = (
+    MANIFEST_FILENAME,
+    CHECKSUM_CACHE_FILENAME,
+    CHECKSUM_CACHE_FILENAME + "-journal",
+    CHECKSUM_CACHE_FILENAME + "-wal",
+    CHECKSUM_CACHE_FILENAME + "-shm",
+)
+# seconds a single netcdf file may take before its worker process is killed
+NETCDF_TIMEOUT = 600
+OUTPUT_FORMATS = ("json", "ndjson")
+# file hashes and extractions list_and_extract keeps in flight while it lists the files
+MAX_PENDING_TASKS = 256
 
 
 def _to_metadata_path(type: str, filepath: str, output_path: str):
@@ -23,24 +44,132 @@ def _to_metadata_path(type: str, filepath: str, output_path: str):
     return os.path.join(output_path, dirname, "dataset_metadata.json")
 
 
+class ExtractionTask(NamedTuple):
+    """Picklable description of one aggregation to extract, so it can be sent to a worker process"""
+
+    category: str
+    input_path: str
+    # the root of the input tree that input_path is relative to
+    working_directory: str
+    # keyword arguments for the category's extractor, e.g. {"statistics": "sampled"} for rasters
+    options: dict = None
+    # the remote storage the file is read from by the extractors that can, not recorded in the manifest
+    storage: object = None
+    # the threads the extractors that can may start for the file, not recorded in the manifest
+    max_threads: int = None
+
+
+def run_extraction_task(task: ExtractionTask):
+    """
+    Return: the metadata extracted from the aggregation described by the task, or None when
+    extraction failed. This is the part of the extraction that runs on the executor's worker pool.
+    """
+    if os.getcwd() != task.working_directory:
+        # worker processes do not share the parent's working directory
+        os.chdir(task.working_directory)
+    try:
+        return run_extractor(task.category, task.input_path, task.options, task.storage, task.max_threads)
+    except Exception as e:
+        logging.exception(f"Failed to extract {task.category} metadata from {task.input_path}.")
+        return None
+
+
+def to_output_record(
+    task: ExtractionTask,
+    extracted_metadata: dict,
+    user_metadata_filename: str,
+    output_path: str,
+    output_base_url: str,
+    file_registry: FileMetadataRegistry = None,
+):
+    """Converts the result of run_extraction_task to the output metadata, see _output_record"""
+    if extracted_metadata is None:
+        return task.input_path, None, []
+    metadata = _to_output_metadata(
+        task.category, task.input_path, extracted_metadata, output_base_url, user_metadata_filename, file_registry
+    )
+    return _output_record(task.category, task.input_path, metadata, user_metadata_filename, output_path)
+
+
 def extract_metadata_with_file_path(
-    type: str, input_path: str, user_metadata_filename: str, output_path: str, output_base_url: str
+    type: str,
+    input_path: str,
+    user_metadata_filename: str,
+    output_path: str,
+    output_base_url: str,
+    file_registry: FileMetadataRegistry = None,
+    indent: int = None,
+    options: dict = None,
 ):
-    extracted_metadata = extract_metadata(type, input_path, output_base_url, user_metadata_filename)
-    if extracted_metadata:
-        input_path = _to_metadata_path(type, input_path, output_path)
-        os.makedirs(os.path.dirname(input_path), exist_ok=True)
-        with open(input_path, "w") as f:
-            f.write(json.dumps(extracted_metadata, indent=2))
-    return input_path, extracted_metadata is not None
+    extracted_metadata = extract_metadata(
+        type, input_path, output_base_url, user_metadata_filename, file_registry, options
+    )
+    return _write_metadata(type, input_path, extracted_metadata, user_metadata_filename, output_path, indent)
+
 
+def _output_record(type: str, input_path: str, metadata: dict, user_metadata_filename: str, output_path: str):
+    """
+    Return: the path to write the metadata to, the metadata (None when extraction failed) and the
+    input files the aggregation was built from
+    """
+    if not metadata:
+        return input_path, None, []
+    metadata_path = _to_metadata_path(type, input_path, output_path)
+    members = _aggregation_members(type, input_path, user_metadata_filename, metadata)
+    return metadata_path, metadata, members
 
-def extract_metadata(type: str, input_path: str, output_base_url: str, user_metadata_filename: str):
+
+def _write_metadata(
+    type: str, input_path: str, metadata: dict, user_metadata_filename: str, output_path: str, indent: int = None
+):
+    """
+    Return: the path the metadata was written to (the input path when extraction failed), whether
+    metadata was extracted and the input files the aggregation was built from
+    """
+    metadata_path, metadata, members = _output_record(type, input_path, metadata, user_metadata_filename, output_path)
+    if metadata is None:
+        return input_path, False, []
+    write_metadata(metadata_path, metadata, indent)
+    return metadata_path, True, members
+
+
+def _aggregation_members(type: str, input_path: str, user_metadata_filename: str, extracted_metadata: dict):
+    members = {input_path}
+    members.update(md["contentUrl"] for md in extracted_metadata.get("associatedMedia") or [])
+    if type != "user_meta":
+        # the user metadata attached to the content type and the directory, whose mtime changes when
+        # related files (e.g. a new shapefile sidecar) are added next to the aggregation
+        members.add(input_path + "." + user_metadata_filename)
+        members.add(os.path.dirname(input_path) or ".")
+    return sorted(members)
+
+
+def extract_metadata(
+    type: str,
+    input_path: str,
+    output_base_url: str,
+    user_metadata_filename: str,
+    file_registry: FileMetadataRegistry = None,
+    options: dict = None,
+):
     try:
-        extracted_metadata = _extract_metadata(type, input_path)
+        extracted_metadata = run_extractor(type, input_path, options)
     except Exception as e:
         logging.exception(f"Failed to extract {type} metadata from {input_path}.")
         return None
+    return _to_output_metadata(
+        type, input_path, extracted_metadata, output_base_url, user_metadata_filename, file_registry
+    )
+
+
+def _to_output_metadata(
+    type: str,
+    input_path: str,
+    extracted_metadata: dict,
+    output_base_url: str,
+    user_metadata_filename: str,
+    file_registry: FileMetadataRegistry = None,
+):
     if os.path.basename(input_path) == user_metadata_filename:
         path = os.path.dirname(input_path)
         extracted_metadata["url"] = os.path.join(output_base_url, path, "dataset_metadata.json")
@@ -49,15 +178,18 @@ def extract_metadata(type: str, input_path: str, output_base_url: str, user_meta
     adapter = HydroshareMetadataAdapter()
     all_file_metadata = []
     for f in extracted_metadata["content_files"]:
-        f_md, _ = file_metadata(f)
+        if file_registry is not None:
+            f_md, _ = file_registry.file_metadata(f)
+        else:
+            f_md, _ = file_metadata(f)
         all_file_metadata.append(f_md)
     del extracted_metadata["content_files"]
     if type == "user_meta":
         extracted_metadata["associatedMedia"] = all_file_metadata
-        return json.loads(CoreMetadataDOC.construct(**extracted_metadata).json())
+        return to_jsonable(CoreMetadataDOC.construct(**extracted_metadata))
     else:
         extracted_metadata["associatedMedia"] = all_file_metadata
-        catalog_record = json.loads(adapter.to_catalog_record(extracted_metadata).json())
+        catalog_record = to_jsonable(adapter.to_catalog_record(extracted_metadata))
 
         # check for user metadata attached content types
         user_meta_content_type_path = input_path + "." + user_metadata_filename
@@ -68,166 +200,292 @@ def extract_metadata(type: str, input_path: str, output_base_url: str, user_meta
         return catalog_record
 
 
-def _extract_metadata(type: str, filepath):
-    extension = os.path.splitext(filepath)[1]
-    metadata = None
-    if type == "raster":
-        metadata = extract_from_tif_file(filepath)
-        metadata["type"] = "GeographicRasterAggregation"
-    elif type == "feature":
-        metadata = extract_metadata_and_files(filepath)
-        metadata["type"] = "GeographicFeatureAggregation"
-    elif type == "netcdf":
-        metadata = get_nc_meta_dict(filepath)
-        metadata["type"] = "MultidimensionalAggregation"
-    elif type == "timeseries":
-        if extension == ".csv":
-            metadata = extract_metadata_csv(filepath)
-        elif extension == ".sqlite":
-            metadata = extract_timeseries_metadata(filepath)
-        metadata["type"] = "TimeSeriesAggregation"
-    elif type == "reftimeseries":
-        metadata = extract_referenced_timeseries_metadata(filepath)
-        metadata["type"] = "ReferencedTimeSeriesAggregation"
-    elif type == "user_meta":
-        metadata = {}
-        if os.path.exists(filepath):
-            with open(filepath) as f:
-                metadata = json.loads(f.read())
-        metadata_file_dir, filename = os.path.split(filepath)
-        metadata["content_files"] = [
-            str(f)
-            for f in Path(f'./{metadata_file_dir}').rglob('*')
-            if not str(f).endswith(filename) and os.path.isfile(str(f))
-        ]
-        if "type" not in metadata:
-            # Check type to ensure ResourceType isn't overwritten if provided
-            metadata["type"] = "FileSetAggregation"
-
+def extract_user_metadata(filepath: str, exclude=()):
+    metadata = {}
+    if os.path.exists(filepath):
+        with open(filepath) as f:
+            metadata = json.loads(f.read())
+    metadata["content_files"] = _user_meta_content_files(filepath, exclude)
+    if "type" not in metadata:
+        # Check type to ensure ResourceType isn't overwritten if provided
+        metadata["type"] = "FileSetAggregation"
     return metadata
 
 
-def read_metadata(path: str):
-    with open(path, "r") as f:
-        return json.loads(f.read())
+def _user_meta_content_files(filepath: str, exclude=()):
+    """Return: the files of the dataset of filepath, leaving out the files and directories in exclude"""
+    metadata_file_dir, filename = os.path.split(filepath)
+    return [f for f in walk_files(metadata_file_dir, include_hidden=True, exclude=exclude) if not f.endswith(filename)]
+
+
+def _excluded_paths(input_path: str, output_path: str):
+    """
+    Return: the paths, relative to input_path, that are not extracted: output_path when it is a
+    directory inside input_path, or the INTERNAL_FILENAMES when it is input_path itself
+    """
+    input_path = os.path.abspath(input_path)
+    # a relative output_path is relative to input_path, the working directory of the extraction
+    relative = os.path.relpath(os.path.join(input_path, output_path), input_path)
+    if relative == os.curdir:
+        return list(INTERNAL_FILENAMES)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return []
+    return [relative]
+
+
+async def _run_extraction(
+    executor: ExtractionExecutor,
+    task: ExtractionTask,
+    user_metadata_filename: str,
+    output_path: str,
+    output_base_url: str,
+    file_registry: FileMetadataRegistry,
+):
+    try:
+        extracted_metadata = await executor.run(task.category, run_extraction_task, task)
+    except WorkerProcessException as e:
+        logging.error(f"Failed to extract {task.category} metadata from {task.input_path}: {e.detail}")
+        extracted_metadata = None
+    return await executor.run_in_thread(
+        to_output_record,
+        task,
+        extracted_metadata,
+        user_metadata_filename,
+        output_path,
+        output_base_url,
+        file_registry,
+    )
 
 
 async def list_and_extract(
-    input_path: str, output_path: str, input_base_url: str, output_base_url: str, user_metadata_filename: str
+    input_path: str,
+    output_path: str,
+    input_base_url: str,
+    output_base_url: str,
+    user_metadata_filename: str,
+    incremental: bool = False,
+    executor_backend: str = "thread",
+    max_workers: int = None,
+    netcdf_timeout: float = NETCDF_TIMEOUT,
+    storage=None,
+    indent: int = None,
+    output_format: str = "json",
+    shard_size: int = NDJSON_SHARD_SIZE,
+    compression: str = None,
+    sink: OutputSink = None,
+    raster_statistics: str = "exact",
 ):
+    """
+    Extracts the metadata of every aggregation under input_path and writes it to output_path.
+    Outputs are compact JSON unless indent is given.
+
+    storage lists the files under input_path, defaulting to walking the directory. An S3Storage for
+    the bucket mounted at input_path lists the files without a request per file, and the NetCDF files
+    are read from the bucket by ranged reads; the other extractors read the files through input_path.
+
+    sink receives the output records, defaulting to a LocalSink for output_path. With output_format
+    "ndjson" the default is an NDJSONSink writing shards of shard_size records instead of a file per
+    aggregation, compressed by compression. Incremental runs need a local sink and compression needs
+    the ndjson output format. The checksum cache and the manifest are always kept in output_path. An
+    output_path inside input_path (e.g. /files/.hs) is not extracted: it is left out of the listing
+    and of the files of the datasets. When output_path is input_path, the checksum cache and the
+    manifest are left out.
+
+    raster_statistics is how the minimum and maximum of raster bands are computed, one of
+    BAND_STATISTICS; see hsextract.raster.statistics.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {', '.join(OUTPUT_FORMATS)}")
+    if raster_statistics not in BAND_STATISTICS:
+        raise ValueError(f"Unknown raster statistics {raster_statistics}, expected one of {', '.join(BAND_STATISTICS)}")
+    # keyword arguments for the extractors of each category, only the non-default ones so that the
+    # manifest of a default run does not record any
+    extractor_options = {}
+    if raster_statistics != "exact":
+        extractor_options["raster"] = {"statistics": raster_statistics}
+    excluded_paths = _excluded_paths(input_path, output_path)
+    if excluded_paths:
+        extractor_options["user_meta"] = {"exclude": excluded_paths}
+    if incremental and not (sink.local if sink is not None else output_format == "json"):
+        raise ValueError("Incremental extraction requires a file per aggregation in the output directory")
+    if compression is not None and output_format != "ndjson":
+        raise ValueError("Compression requires the ndjson output format")
     current_directory = os.getcwd()
+    checksum_cache = None
+    executor = None
     try:
         os.chdir(input_path)
-        sorted_files, categorized_files = prepare_files(user_metadata_filename)
-        netcdf_files = categorized_files["netcdf"]
-        del categorized_files["netcdf"]
-        tasks = []
-
-        if "user_meta" not in categorized_files or user_metadata_filename not in categorized_files["user_meta"]:
-            categorized_files["user_meta"].append(user_metadata_filename)
-
-        for category, files in categorized_files.items():
-            for file in files:
-                tasks.append(
-                    asyncio.get_running_loop().run_in_executor(
-                        None,
-                        extract_metadata_with_file_path,
-                        category,
-                        file,
-                        user_metadata_filename,
-                        output_path,
-                        output_base_url,
-                    )
-                )
+        if sink is None:
+            if output_format == "ndjson":
+                sink = NDJSONSink(NDJSONWriter(output_path, shard_size, compression))
+            else:
+                sink = LocalSink(output_path, indent)
+        executor = ExtractionExecutor(executor_backend, max_workers, isolated_timeout=netcdf_timeout)
+        sink.start(executor.thread_pool)
+        checksum_cache = ChecksumCache(os.path.join(output_path, CHECKSUM_CACHE_FILENAME))
+        file_registry = FileMetadataRegistry(checksum_cache)
+        manifest_path = os.path.join(output_path, MANIFEST_FILENAME)
+        previous_manifest = ExtractionManifest.load(manifest_path) if incremental else ExtractionManifest()
+        manifest = ExtractionManifest()
+        graph = AggregationGraph(output_path, input_base_url, output_base_url)
+        # the hashes and extractions in flight; the listing waits for a free slot, so the tasks
+        # pending at any time do not grow with the number of files
+        slots = asyncio.Semaphore(MAX_PENDING_TASKS)
+        pending = set()
+        errors = []
+        # parts extracted before the listing completed, written once every dataset is known
+        unwritten_parts = []
+        listing_complete = False
+
+        def is_unchanged(category: str, file: str):
+            if not incremental:
+                return False
+            members = None
+            if category == "user_meta":
+                members = _user_meta_content_files(file, excluded_paths) + [file]
+            if previous_manifest.is_unchanged(file, manifest, members, extractor_options.get(category)):
+                manifest.copy_entry(file, previous_manifest)
+                return True
+            return False
+
+        async def write(aggregation):
+            await sink.put(os.path.relpath(aggregation.output_path, output_path), aggregation.metadata)
+            aggregation.dirty = False
 
-        for file in sorted_files:
-            tasks.append(asyncio.get_running_loop().run_in_executor(None, file_metadata, file))
+        async def extract(task: ExtractionTask):
+            metadata_path, metadata, members = await _run_extraction(
+                executor, task, user_metadata_filename, output_path, output_base_url, file_registry
+            )
+            if metadata is None:
+                graph.remove(task.input_path)
+                return
+            manifest.record(task.input_path, metadata_path, members, task.options)
+            aggregation = graph.get(task.input_path)
+            aggregation.set_metadata(metadata)
+            if aggregation.is_dataset:
+                return
+            graph.resolve_urls(aggregation)
+            if sink.rewritable:
+                if listing_complete:
+                    await write_part(aggregation)
+                else:
+                    unwritten_parts.append(aggregation)
+
+        async def write_part(part):
+            # written while the extraction continues, linked to its nearest dataset; it is written
+            # again in the rare case that dataset fails to extract
+            graph.set_is_part_of(part, graph.enclosing_dataset(part))
+            await write(part)
+
+        def finished(future):
+            pending.discard(future)
+            slots.release()
+            if not future.cancelled() and future.exception() is not None:
+                errors.append(future.exception())
 
-        results = []
-        if tasks:
-            results.extend(await asyncio.gather(*tasks))
+        async def start(func, *args):
+            """Start func(*args), a coroutine or future, once a slot is free"""
+            await slots.acquire()
+            if errors:
+                slots.release()
+                raise errors[0]
+            future = asyncio.ensure_future(func(*args))
+            pending.add(future)
+            future.add_done_callback(finished)
 
-        # The netcdf library does not seem to be thread safe, running them in this thread
-        for file in netcdf_files:
-            results.append(
-                extract_metadata_with_file_path("netcdf", file, user_metadata_filename, output_path, output_base_url)
+        async def submit(category: str, file: str):
+            if is_unchanged(category, file):
+                graph.add(file, manifest.output_path(file))
+                return
+            graph.add(file, _to_metadata_path(category, file, output_path), extracted=True)
+            task = ExtractionTask(
+                category,
+                file,
+                os.getcwd(),
+                extractor_options.get(category),
+                storage if getattr(storage, "remote", False) else None,
+                executor.threads_per_call(),
             )
+            await start(extract, task)
+            # let the submitted extractions start while the listing continues
+            await asyncio.sleep(0)
 
-        metadata_manifest = [
-            {file_path: f"{file_path}.json"}
-            for file_path, extracted in results
-            if extracted and not file_path.endswith("dataset_metadata.json")
-        ]
-        dataset_metadata_files = [
-            file_path for file_path, extracted in results if extracted and file_path.endswith("dataset_metadata.json")
-        ]
-
-        dataset_metadata_files_metadata = {}
-        for dataset_metadata_file in dataset_metadata_files:
-            with open(dataset_metadata_file, "r") as f:
-                has_part_metadata = json.loads(f.read())
-            dataset_metadata_files_metadata[dataset_metadata_file] = has_part_metadata
-
-        for dataset_metadata_file in dataset_metadata_files:
-            dirname, _ = os.path.split(dataset_metadata_file)
-            has_part_files = [
-                list(metadata.keys())[0]
-                for metadata in metadata_manifest
-                if list(metadata.keys())[0].startswith(dirname)
-            ]
-
-            has_part = []
-            for has_part_file in has_part_files:
-                metadata_json = read_metadata(has_part_file)
-                name = metadata_json["name"]
-                if not name:
-                    name = "Not Found and name is required"
-                has_part_file = os.path.relpath(has_part_file, output_path)
-                has_part.append(
-                    {
-                        "@type": "CreativeWork",
-                        "name": name,
-                        "description": metadata_json["description"] if "description" in metadata_json else None,
-                        "url": os.path.join(output_base_url, has_part_file),
-                    }
+        if storage is None:
+            storage = LocalStorage()
+
+        categorizer = FileCategorizer(user_metadata_filename)
+        has_root_user_meta = False
+        for listed_file in storage.list_files(exclude=excluded_paths):
+            file = listed_file.path
+            file_registry.add_listed_file(listed_file)
+            manifest.set_fingerprint(file, listed_file.size, listed_file.mtime_ns)
+            await start(executor.run_in_thread, file_registry.file_metadata, file)
+            for category, aggregation_file in categorizer.add(file):
+                has_root_user_meta = has_root_user_meta or (
+                    category == "user_meta" and aggregation_file == user_metadata_filename
                 )
-            for has_part_file in has_part_files:
-                metadata_json = read_metadata(has_part_file)
-                with open(has_part_file, "w") as f:
-                    is_part_of_file = os.path.relpath(dataset_metadata_file, output_path)
-                    metadata_json["isPartOf"] = [os.path.join(output_base_url, is_part_of_file)]
-                    f.write(json.dumps(metadata_json, indent=2))
-            with open(dataset_metadata_file, "r") as f:
-                metadata_json = json.loads(f.read())
-
-            metadata_json["hasPart"] = has_part
-
-            if "associatedMedia" in metadata_json:
-                associated_media = []
-                for md in metadata_json["associatedMedia"]:
-                    md["contentUrl"] = os.path.join(input_base_url, md["contentUrl"])
-                    associated_media.append(md)
-                metadata_json["associatedMedia"] = associated_media
-
-            with open(dataset_metadata_file, "w") as f:
-                f.write(json.dumps(metadata_json, indent=2))
-
-        # add base_url to the contentUrl of the associatedMedia for the metadata_manifest files
-        for meta_manifest_item in metadata_manifest:
-            meta_manifest_file = list(meta_manifest_item.keys())[0]
-            with open(meta_manifest_file, "r") as f:
-                metadata = json.loads(f.read())
-                if "associatedMedia" in metadata:
-                    associated_media = []
-                    for md in metadata["associatedMedia"]:
-                        if not md["contentUrl"].startswith(input_base_url):
-                            md["contentUrl"] = os.path.join(input_base_url, md["contentUrl"])
-                        associated_media.append(md)
-                    metadata["associatedMedia"] = associated_media
-                if "url" in metadata:
-                    metadata["url"] = os.path.join(output_base_url, os.path.relpath(meta_manifest_file, output_path))
-            with open(meta_manifest_file, "w") as f:
-                f.write(json.dumps(metadata, indent=2))
+                await submit(category, aggregation_file)
+        for category, file in categorizer.finish():
+            await submit(category, file)
+        if not has_root_user_meta:
+            await submit("user_meta", user_metadata_filename)
+
+        listing_complete = True
+        for part in unwritten_parts:
+            await write_part(part)
+        unwritten_parts.clear()
+        while pending:
+            await asyncio.wait(set(pending))
+        if errors:
+            raise errors[0]
+        # the records below may be changed again, so the queued writes of them must finish first
+        await sink.flush()
+
+        # every listed file was hashed through the cache, which keeps the paths it has seen
+        checksum_cache.evict(keep=())
+
+        if incremental:
+            for removed_output in previous_manifest.removed_outputs(manifest):
+                if os.path.exists(removed_output):
+                    os.remove(removed_output)
+
+        for dataset in graph.datasets():
+            dataset_parts = graph.descendant_parts(dataset)
+            has_part_files = [part.output_path for part in dataset_parts]
+
+            # only datasets that were extracted again or whose parts changed need hasPart rewritten
+            previous_has_part_files = previous_manifest.get_has_part(dataset.input_path) or []
+            manifest.set_has_part(dataset.input_path, has_part_files)
+            if (
+                dataset.extracted
+                or previous_has_part_files != sorted(has_part_files)
+                or any(part.extracted for part in dataset_parts)
+            ):
+                graph.set_has_part(dataset, dataset_parts)
+
+        # a part is linked to the dataset of its nearest enclosing directory
+        for part in graph.parts():
+            dataset = graph.enclosing_dataset(part)
+            dataset_output_path = dataset.output_path if dataset is not None else None
+            manifest.set_is_part_of(part.input_path, dataset_output_path)
+            if part.extracted:
+                if part.is_part_of != dataset_output_path:
+                    graph.set_is_part_of(part, dataset)
+            # a kept part is relinked when its dataset changed, or unlinked when its dataset was removed
+            elif previous_manifest.get_is_part_of(part.input_path) != dataset_output_path:
+                graph.set_is_part_of(part, dataset)
+
+        for aggregation in graph.dirty_aggregations():
+            await write(aggregation)
+        await sink.aclose()
+
+        manifest.save(manifest_path)
 
     finally:
+        if sink is not None:
+            sink.cancel()
+        if executor is not None:
+            executor.shutdown()
+        if checksum_cache is not None:
+            checksum_cache.close()
         os.chdir(current_directory)
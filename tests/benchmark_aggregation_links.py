@@ -0,0 +1,39 @@
+"""
+Times linking datasets to their parts with AggregationGraph's prefix index. Not collected by pytest,
+run it with: python tests/benchmark_aggregation_links.py [datasets] [files]
+"""
+
+import sys
+import time
+
+from hsextract.aggregations import AggregationGraph
+
+
+def build_graph(n_datasets: int, n_files: int):
+    graph = AggregationGraph("out", "https://in.org/", "https://out.org/")
+    graph.add("hs_user_meta.json", "out/dataset_metadata.json", {})
+    for d in range(n_datasets):
+        graph.add(f"d{d}/hs_user_meta.json", f"out/d{d}/dataset_metadata.json", {})
+    for f in range(n_files):
+        # a tenth of the files are outside every nested dataset, in directories sharing their prefix
+        directory = f"d{f % n_datasets}/sub" if f % 10 else f"d{f % n_datasets}-other"
+        graph.add(f"{directory}/f{f}.csv", f"out/{directory}/f{f}.csv.json", {})
+    return graph
+
+
+def main():
+    n_datasets = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_files = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    graph = build_graph(n_datasets, n_files)
+
+    start = time.perf_counter()
+    has_part = sum(len(graph.descendant_parts(dataset)) for dataset in graph.datasets())
+    is_part_of = sum(graph.enclosing_dataset(part) is not None for part in graph.parts())
+    elapsed = time.perf_counter() - start
+    print(
+        f"{n_datasets} datasets, {n_files} files: {has_part} hasPart and {is_part_of} isPartOf links in {elapsed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Times the extraction of a synthetic tree of rasters, shapefiles and timeseries CSVs with each
+executor backend and an increasing number of workers, to show how the extraction scales across
+cores. Every aggregation is extracted with run_extraction_task on the ExtractionExecutor, as
+list_and_extract does, without the listing, hashing and writing of the outputs. Not collected by
+pytest, run it with:
+python tests/benchmark_executors.py [files] [directory] [categories]
+The default tree has 16 files of each category (raster,feature,timeseries) in a temporary directory.
+The rasters and shapefiles are written with GDAL, pass e.g. "timeseries" as categories without it.
+"""
+
+import asyncio
+import csv
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+from hsextract.executors import EXECUTOR_BACKENDS, ExtractionExecutor
+from hsextract.listing.utils import iter_categorized_files, walk_files
+from hsextract.utils import ExtractionTask, run_extraction_task
+
+CATEGORIES = ["raster", "feature", "timeseries"]
+
+
+def write_raster(path: str, size: int = 2048):
+    from osgeo import gdal, osr
+
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        path, size, size, 1, gdal.GDT_Float32, options=["TILED=YES", "BLOCKXSIZE=256", "BLOCKYSIZE=256"]
+    )
+    dataset.SetGeoTransform((445574.0, 30.0, 0, 4655492.0, 0, -30.0))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(26912)
+    dataset.SetProjection(srs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(-9999)
+    band.WriteArray(numpy.random.default_rng(0).uniform(2000, 3000, (size, size)).astype(numpy.float32))
+    dataset = None
+
+
+def write_shapefile(path: str, features: int = 5000):
+    from osgeo import ogr, osr
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    dataset = ogr.GetDriverByName("ESRI Shapefile").CreateDataSource(path)
+    layer = dataset.CreateLayer("polygons", srs, ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("name", ogr.OFTString))
+    for i in range(features):
+        x, y = -112 + (i % 100) * 0.01, 40 + (i // 100) * 0.01
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField("name", f"polygon {i}")
+        feature.SetGeometry(
+            ogr.CreateGeometryFromWkt(f"POLYGON (({x} {y}, {x + 0.01} {y}, {x + 0.01} {y + 0.01}, {x} {y}))")
+        )
+        layer.CreateFeature(feature)
+    dataset = None
+
+
+def write_csv(path: str, rows: int = 100_000):
+    start = datetime.datetime(2000, 1, 1)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time", "flow", "stage"])
+        for i in range(rows):
+            writer.writerow([(start + datetime.timedelta(minutes=15 * i)).isoformat(), i % 97, i % 13])
+
+
+def write_tree(root: str, files: int, categories: list):
+    writers = {"raster": (write_raster, "tif"), "feature": (write_shapefile, "shp"), "timeseries": (write_csv, "csv")}
+    for category in categories:
+        write, extension = writers[category]
+        for i in range(files):
+            directory = os.path.join(root, category, str(i))
+            os.makedirs(directory)
+            write(os.path.join(directory, f"{category}{i}.{extension}"))
+
+
+async def extract(tasks: list, backend: str, max_workers: int):
+    with ExtractionExecutor(backend, max_workers) as executor:
+        # start the workers before timing
+        await asyncio.gather(*[executor.run(task.category, os.getpid) for task in tasks[:max_workers]])
+        start = time.perf_counter()
+        results = await asyncio.gather(*[executor.run(task.category, run_extraction_task, task) for task in tasks])
+        elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results), "an extraction failed"
+    return elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    categories = sys.argv[3].split(",") if len(sys.argv) > 3 else CATEGORIES
+    root = os.path.join(directory, "tree")
+
+    start = time.perf_counter()
+    write_tree(root, files, categories)
+    print(f"wrote {files} files of {', '.join(categories)} in {time.perf_counter() - start:.1f}s")
+
+    tasks = [
+        ExtractionTask(category, os.path.relpath(file, root), root)
+        for category, file in iter_categorized_files(walk_files(root), "hs_user_meta.json")
+        if category != "user_meta"
+    ]
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1)))
+    for backend in EXECUTOR_BACKENDS:
+        baseline = None
+        for max_workers in worker_counts:
+            elapsed = asyncio.run(extract(tasks, backend, max_workers))
+            baseline = baseline or elapsed
+            print(f"{backend:>7} {max_workers:>3} workers: {elapsed:.2f}s, {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
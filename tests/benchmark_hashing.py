@@ -0,0 +1,83 @@
+"""
+Times the sha256 strategies of sha256_digest against the 128-byte read loop it replaced, on a
+synthetic file. Not collected by pytest, run it with:
+python tests/benchmark_hashing.py [megabytes] [directory] [repeat]
+The default file is 256 MB in a temporary directory. Pass a directory on a FUSE or network mount
+to time the chunked reads sha256_digest uses there. Drop the page cache between runs for cold-read
+timings; the best of repeat runs is a warm-cache timing.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+from hsextract.file_utils import _digest_chunked, _digest_mmap, is_local_file, sha256_digest
+
+
+def digest_128(path: str):
+    """The read loop of the original file_metadata"""
+    with open(path, "rb") as f:
+        d = hashlib.sha256()
+        for buf in iter(partial(f.read, 128), b''):
+            d.update(buf)
+    return d.hexdigest()
+
+
+def digest_chunked(path: str):
+    with open(path, "rb", buffering=0) as f:
+        return _digest_chunked(f, os.fstat(f.fileno()).st_size).hexdigest()
+
+
+def digest_mmap(path: str):
+    with open(path, "rb", buffering=0) as f:
+        return _digest_mmap(f).hexdigest()
+
+
+def digest_file_digest(path: str):
+    with open(path, "rb", buffering=0) as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def write_file(path: str, megabytes: int):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(megabytes):
+            f.write(block)
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    path = os.path.join(directory, "synthetic.bin")
+    write_file(path, megabytes)
+    print(f"{megabytes} MB file, {'local' if is_local_file(path) else 'remote'} filesystem")
+
+    strategies = {
+        "128-byte reads": digest_128,
+        "chunked": digest_chunked,
+        "mmap": digest_mmap,
+        "sha256_digest": lambda path: sha256_digest(path)[0],
+    }
+    if hasattr(hashlib, "file_digest"):
+        strategies["file_digest"] = digest_file_digest
+
+    expected = None
+    for name, digest in strategies.items():
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hexdigest = digest(path)
+            elapsed.append(time.perf_counter() - start)
+        expected = expected or hexdigest
+        assert hexdigest == expected, name
+        best = min(elapsed)
+        print(f"{name:>15}: {best:.2f}s, {megabytes / best:.0f} MB/s (best of {repeat})")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
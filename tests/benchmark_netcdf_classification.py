@@ -0,0 +1,82 @@
+"""
+Times the classification of the variables of a synthetic netCDF file with many variables, like the
+outputs of models that write thousands of them. Not collected by pytest, run it with:
+python tests/benchmark_netcdf_classification.py [variables] [directory] [repeat]
+The default file has 10000 data variables on a small grid, with a mix of standard names, long names,
+units and data types, so the time is spent on the attributes rather than the data.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import netCDF4
+import numpy
+
+from hsextract.netcdf.utils import extract_nc_data_variables_meta, get_nc_meta_dict, get_nc_variable_coordinate_type
+
+DATA_TYPES = ["i1", "i2", "i4", "i8", "f4", "f8", "u1", "u2", "u4", "u8"]
+UNITS = ["K", "m s-1", "kg m-2 s-1", "1", "degrees_east", "hours since 2000-01-01", "Pa", ""]
+NAMES = ["air_temperature", "Latitude of the cell", "eastward_wind", "time of the forecast", "soil moisture"]
+
+
+def write_dataset(path: str, variables: int):
+    dataset = netCDF4.Dataset(path, "w")
+    dataset.title = "Synthetic model output"
+    for name, size in [("time", 4), ("lat", 3), ("lon", 3)]:
+        dataset.createDimension(name, size)
+    time_variable = dataset.createVariable("time", "f8", ("time",))
+    time_variable.units = "days since 2000-01-01"
+    time_variable[:] = numpy.arange(4)
+    for name, units in [("lat", "degrees_north"), ("lon", "degrees_east")]:
+        variable = dataset.createVariable(name, "f4", (name,))
+        variable.units = units
+        variable[:] = numpy.arange(3)
+    for i in range(variables):
+        variable = dataset.createVariable(f"var{i}", DATA_TYPES[i % len(DATA_TYPES)], ("time", "lat", "lon"))
+        if i % 3:
+            variable.long_name = NAMES[i % len(NAMES)]
+        else:
+            variable.standard_name = NAMES[i % len(NAMES)]
+        if UNITS[i % len(UNITS)]:
+            variable.units = UNITS[i % len(UNITS)]
+        variable.comment = f"variable {i}"
+    dataset.close()
+
+
+def timed(label: str, repeat: int, function, *args):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed.append(time.perf_counter() - start)
+    print(f"{label:>32}: {min(elapsed) * 1000:.1f} ms (best of {repeat})")
+    return result
+
+
+def main():
+    variables = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    path = os.path.join(directory, "synthetic.nc")
+
+    start = time.perf_counter()
+    write_dataset(path, variables)
+    print(f"wrote {variables} variables in {time.perf_counter() - start:.1f}s")
+
+    dataset = netCDF4.Dataset(path)
+    nc_variables = list(dataset.variables.values())
+
+    def classify():
+        return [get_nc_variable_coordinate_type(nc_variable) for nc_variable in nc_variables]
+
+    types = timed("get_nc_variable_coordinate_type", repeat, classify)
+    print(f"{'':>32}  {', '.join(f'{t} {types.count(t)}' for t in sorted(set(types)))}")
+    timed("extract_nc_data_variables_meta", repeat, extract_nc_data_variables_meta, dataset.variables)
+    dataset.close()
+    timed("get_nc_meta_dict", repeat, get_nc_meta_dict, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Times the raster band statistics strategies, and GDAL's ComputeStatistics, on a synthetic tiled
+Float32 GeoTIFF. Not collected by pytest, run it with:
+python tests/benchmark_raster_statistics.py [size] [directory] [bands]
+The default raster is a single band of 24000 x 24000 pixels (2.1 GB). With many bands (e.g. 2000 /tmp 200,
+a pixel interleaved hyperspectral cube) the exact statistics of every band read together are also
+timed against reading them band by band. Drop the page cache between strategies for cold-read timings.
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+from osgeo import gdal
+
+from hsextract.raster.statistics import windowed_statistics
+from hsextract.raster.utils import get_band_info
+
+STRATEGIES = ["exact", "approximate", "sampled", "existing"]
+
+
+def gdal_statistics(path: str):
+    """Return: the exact statistics of GDAL's ComputeStatistics, which are stored in the .aux.xml"""
+    dataset = gdal.Open(path)
+    minimum, maximum, _, _ = dataset.GetRasterBand(1).ComputeStatistics(False)
+    return {"minimumValue": minimum, "maximumValue": maximum, "statistics": "ComputeStatistics"}
+
+
+def write_raster(path: str, size: int, bands: int = 1, overviews: bool = True):
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        path,
+        size,
+        size,
+        bands,
+        gdal.GDT_Float32,
+        options=["TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "BIGTIFF=YES", "INTERLEAVE=PIXEL"],
+    )
+    dataset.SetGeoTransform((445574.0, 30.0, 0, 4655492.0, 0, -30.0))
+    for band_number in range(1, bands + 1):
+        dataset.GetRasterBand(band_number).SetNoDataValue(-9999)
+    rng = numpy.random.default_rng(0)
+    for row in range(0, size, 512):
+        rows = min(512, size - row)
+        values = rng.uniform(2000, 3000, (bands, rows, size)).astype(numpy.float32)
+        dataset.WriteRaster(0, row, size, rows, values.tobytes())
+    if overviews:
+        dataset.BuildOverviews("AVERAGE", [4, 16, 64])
+    dataset = None
+
+
+def time_bands(path: str):
+    """Times the exact statistics of every band read together and read band by band"""
+    dataset = gdal.Open(path)
+    start = time.perf_counter()
+    together = windowed_statistics(dataset)
+    elapsed = time.perf_counter() - start
+    print(f"   together: {dataset.RasterCount} bands in {elapsed:.2f}s")
+
+    dataset = gdal.Open(path)
+    start = time.perf_counter()
+    one_by_one = [windowed_statistics(dataset, [band_number])[0] for band_number in range(1, dataset.RasterCount + 1)]
+    elapsed = time.perf_counter() - start
+    print(f"band by band: {dataset.RasterCount} bands in {elapsed:.2f}s")
+    assert together == one_by_one
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 24_000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    bands = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    path = os.path.join(directory, "synthetic.tif")
+
+    start = time.perf_counter()
+    write_raster(path, size, bands)
+    gb = os.path.getsize(path) / 1e9
+    print(f"wrote {size} x {size} x {bands} raster ({gb:.1f} GB) in {time.perf_counter() - start:.1f}s")
+
+    if bands > 1:
+        time_bands(path)
+
+    for aux in glob.glob(path + ".aux.xml"):
+        os.remove(aux)
+    # GDAL's exact statistics for comparison, "existing" runs last and reuses the ones it stored
+    for strategy in ["gdal"] + STRATEGIES:
+        start = time.perf_counter()
+        band = gdal_statistics(path) if strategy == "gdal" else get_band_info(path, strategy)[1]
+        elapsed = time.perf_counter() - start
+        print(
+            f"{strategy:>11}: min {band['minimumValue']:.3f} max {band['maximumValue']:.3f}"
+            f" ({band['statistics']}) in {elapsed:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from collections import Counter
+
+from hsextract import sinks, utils
+from hsextract.aggregations import AggregationGraph, write_metadata
+
+
+def _graph(tmp_path):
+    return AggregationGraph(str(tmp_path), "https://in.org/", "https://out.org/")
+
+
+def test_link_dataset_and_part(tmp_path):
+    graph = _graph(tmp_path)
+    dataset = graph.add("hs_user_meta.json", str(tmp_path / "dataset_metadata.json"), {"name": "dataset"})
+    part = graph.add(
+        "a.csv",
+        str(tmp_path / "a.csv.json"),
+        {"name": "", "url": "a.csv", "associatedMedia": [{"contentUrl": "a.csv"}]},
+    )
+    graph.resolve_urls(part)
+    graph.set_has_part(dataset, [part])
+    graph.set_is_part_of(part, dataset)
+
+    assert dataset.metadata["hasPart"] == [
+        {
+            "@type": "CreativeWork",
+            "name": "Not Found and name is required",
+            "description": None,
+            "url": "https://out.org/a.csv.json",
+        }
+    ]
+    assert part.metadata == {
+        "name": "",
+        "url": "https://out.org/a.csv.json",
+        "associatedMedia": [{"contentUrl": "https://in.org/a.csv"}],
+        "isPartOf": ["https://out.org/dataset_metadata.json"],
+    }
+    assert graph.datasets() == [dataset]
+    assert graph.parts() == [part]
+
+
+def test_kept_aggregations_are_read_on_demand(tmp_path):
+    write_metadata(str(tmp_path / "a.csv.json"), {"name": "a", "description": "kept"})
+    graph = _graph(tmp_path)
+    part = graph.add("a.csv", str(tmp_path / "a.csv.json"))
+    dataset = graph.add("hs_user_meta.json", str(tmp_path / "dataset_metadata.json"), {"name": "dataset"})
+
+    assert graph.dirty_aggregations() == [dataset]
+    assert part._metadata is None
+
+    graph.set_has_part(dataset, [part])
+
+    assert dataset.metadata["hasPart"][0]["description"] == "kept"
+    assert graph.dirty_aggregations() == [dataset]
+
+
+def test_list_and_extract_writes_each_output_once(tmp_path, monkeypatch):
+    input_path = tmp_path / "input"
+    for path in ["hs_user_meta.json", "a.txt", "sub/hs_user_meta.json", "sub/b.txt"]:
+        (input_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (input_path / path).write_text(json.dumps({"name": path}) if path.endswith(".json") else path)
+    output_path = tmp_path / "output"
+    writes = Counter()
+
+    def counting_write_metadata(path, metadata, indent=None):
+        writes[path] += 1
+        write_metadata(path, metadata, indent)
+
+    monkeypatch.setattr(sinks, "write_metadata", counting_write_metadata)
+    asyncio.run(
+        utils.list_and_extract(
+            str(input_path), str(output_path), "https://in.org/", "https://out.org/", "hs_user_meta.json"
+        )
+    )
+
+    assert writes == {
+        str(output_path / "dataset_metadata.json"): 1,
+        str(output_path / "sub" / "dataset_metadata.json"): 1,
+    }
+
+
+def test_descendant_parts_and_enclosing_dataset(tmp_path):
+    graph = _graph(tmp_path)
+    for path in ["nc/a.nc", "sub/b.csv", "sub-x/c.csv", "subling/d.csv", "sub/deeper/e.csv", "sub0.csv"]:
+        graph.add(path, str(tmp_path / f"{path}.json"), {"name": path})
+    root = graph.add("hs_user_meta.json", str(tmp_path / "dataset_metadata.json"), {})
+    sub = graph.add("sub/hs_user_meta.json", str(tmp_path / "sub" / "dataset_metadata.json"), {})
+    parts = {part.input_path: part for part in graph.parts()}
+
+    assert [part.input_path for part in graph.descendant_parts(sub)] == ["sub/b.csv", "sub/deeper/e.csv"]
+    assert graph.descendant_parts(root) == graph.parts()
+    assert graph.enclosing_dataset(parts["sub/deeper/e.csv"]) is sub
+    assert graph.enclosing_dataset(parts["subling/d.csv"]) is root
+
+
+def test_enclosing_dataset_without_root_dataset(tmp_path):
+    graph = _graph(tmp_path)
+    part = graph.add("a.csv", str(tmp_path / "a.csv.json"), {})
+    graph.add("sub/hs_user_meta.json", str(tmp_path / "sub" / "dataset_metadata.json"), {})
+
+    assert graph.enclosing_dataset(part) is None
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from hsextract.exceptions import WorkerProcessException
+from hsextract.executors import ExtractionExecutor, IsolatedProcessPool
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ExtractionExecutor("gpu")
+
+
+@pytest.mark.parametrize(
+    "backend, process_categories",
+    [("thread", set()), ("process", {"raster", "user_meta"}), ("hybrid", {"raster"})],
+)
+def test_executor_for(backend, process_categories):
+    with ExtractionExecutor(backend, max_workers=1) as executor:
+        for category in ("raster", "user_meta"):
+            expected = executor.process_pool if category in process_categories else executor.thread_pool
+            assert executor.executor_for(category) is expected
+        assert executor.executor_for("netcdf") is executor.isolated_pool
+
+
+@pytest.mark.parametrize("max_workers, threads", [(None, 1), (1, 8), (3, 2), (8, 1), (16, 1)])
+def test_threads_per_call(monkeypatch, max_workers, threads):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    with ExtractionExecutor("hybrid", max_workers=max_workers) as executor:
+        assert executor.threads_per_call() == threads
+
+
+def test_process_backend_runs_in_worker_process():
+    async def run():
+        with ExtractionExecutor("process", max_workers=1) as executor:
+            return await executor.run("raster", os.getpid), await executor.run_in_thread(os.getpid)
+
+    worker_pid, thread_pid = asyncio.run(run())
+
+    assert worker_pid != os.getpid()
+    assert thread_pid == os.getpid()
+
+
+def test_process_pool_is_replaced_after_a_crash():
+    async def run(executor):
+        return await asyncio.gather(
+            executor.run("raster", os._exit, 1),
+            *[executor.run("raster", abs, -i) for i in range(4)],
+            return_exceptions=True,
+        )
+
+    with ExtractionExecutor("process", max_workers=2) as executor:
+        process_pool = executor.process_pool
+        crashed, *results = asyncio.run(run(executor))
+
+        assert isinstance(crashed, WorkerProcessException) and "exit code 1" in crashed.detail
+        assert results == [0, 1, 2, 3]
+        assert executor.process_pool is not process_pool
+        assert asyncio.run(run_once(executor, "raster", os.getpid)) != os.getpid()
+
+
+async def run_once(executor, category, func, *args):
+    return await executor.run(category, func, *args)
+
+
+def test_isolated_pool_survives_timeouts_crashes_and_errors():
+    async def run(pool):
+        return await asyncio.gather(
+            pool.run(time.sleep, 30),
+            pool.run(os._exit, 1),
+            pool.run(int, "not a number"),
+            pool.run(os.getpid),
+            return_exceptions=True,
+        )
+
+    pool = IsolatedProcessPool(max_workers=2, timeout=3)
+    try:
+        timed_out, crashed, failed, pid = asyncio.run(run(pool))
+    finally:
+        pool.shutdown()
+
+    assert isinstance(timed_out, WorkerProcessException) and "timed out" in timed_out.detail
+    assert isinstance(crashed, WorkerProcessException) and "exit code 1" in crashed.detail
+    assert isinstance(failed, WorkerProcessException) and "ValueError" in failed.detail
+    assert pid != os.getpid()
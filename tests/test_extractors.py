@@ -0,0 +1,83 @@
+import subprocess
+import sys
+
+from hsextract import extractors
+from hsextract.extractors import Extractor, extractor_for, register_extractor, run_extractor
+
+
+def test_extractor_for_matches_suffix():
+    assert extractor_for("timeseries", "a/b.csv").function == "extract_metadata_csv"
+    assert extractor_for("timeseries", "a/b.sqlite").function == "extract_metadata"
+    assert extractor_for("timeseries", "a/b.txt") is None
+    assert extractor_for("unknown", "a/b.csv") is None
+
+
+def test_register_extractor(monkeypatch):
+    monkeypatch.setattr(extractors, "EXTRACTORS", {"raster": list(extractors.EXTRACTORS["raster"])})
+    register_extractor("raster", Extractor("os.path", "basename", suffix=".png"), first=True)
+    register_extractor("text", Extractor("os.path", "splitext"))
+
+    assert run_extractor("raster", "a/b.png") == "b.png"
+    assert extractor_for("raster", "a/b.tif").module == "hsextract.raster.utils"
+    assert run_extractor("text", "a/b.txt") == ("a/b", ".txt")
+
+
+def extract_with_options(filepath, statistics="exact"):
+    return {"path": filepath, "statistics": statistics}
+
+
+def test_run_extractor_passes_options(monkeypatch):
+    monkeypatch.setattr(extractors, "EXTRACTORS", {"text": [Extractor(__name__, "extract_with_options", "Text")]})
+
+    assert run_extractor("text", "a.txt") == {"path": "a.txt", "statistics": "exact", "type": "Text"}
+    assert run_extractor("text", "a.txt", {"statistics": "sampled"})["statistics"] == "sampled"
+
+
+def extract_with_storage(filepath, storage=None):
+    return {"path": filepath, "storage": storage}
+
+
+def test_run_extractor_passes_storage_to_remote_extractors(monkeypatch):
+    monkeypatch.setattr(
+        extractors,
+        "EXTRACTORS",
+        {
+            "local": [Extractor(__name__, "extract_with_options")],
+            "remote": [Extractor(__name__, "extract_with_storage", remote=True)],
+        },
+    )
+    storage = object()
+
+    assert run_extractor("remote", "a.nc", storage=storage)["storage"] is storage
+    assert run_extractor("remote", "a.nc")["storage"] is None
+    assert run_extractor("local", "a.txt", storage=storage) == {"path": "a.txt", "statistics": "exact"}
+
+
+def extract_with_threads(filepath, max_threads=None):
+    return {"path": filepath, "max_threads": max_threads}
+
+
+def test_run_extractor_passes_max_threads_to_threaded_extractors(monkeypatch):
+    assert extractor_for("raster", "a.tif").threaded
+    monkeypatch.setattr(
+        extractors,
+        "EXTRACTORS",
+        {
+            "local": [Extractor(__name__, "extract_with_options")],
+            "threaded": [Extractor(__name__, "extract_with_threads", threaded=True)],
+        },
+    )
+
+    assert run_extractor("threaded", "a.tif", max_threads=2)["max_threads"] == 2
+    assert run_extractor("threaded", "a.tif")["max_threads"] is None
+    assert run_extractor("local", "a.txt", max_threads=2) == {"path": "a.txt", "statistics": "exact"}
+
+
+def test_extractor_libraries_are_imported_on_first_use():
+    script = (
+        "import sys, hsextract.utils;"
+        "print(','.join(m for m in ('netCDF4', 'pyproj', 'bs4', 'jsonschema', 'requests') if m in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+
+    assert loaded.strip() == ""
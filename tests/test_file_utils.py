@@ -0,0 +1,116 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hsextract import file_utils
+from hsextract.file_utils import ChecksumCache, FileMetadataRegistry, file_metadata, sha256_digest
+
+
+@pytest.fixture()
+def data_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 5000)
+    return path
+
+
+def test_sha256_digest_matches_hashlib(data_file):
+    checksum, size = sha256_digest(str(data_file))
+
+    assert checksum == hashlib.sha256(data_file.read_bytes()).hexdigest()
+    assert size == data_file.stat().st_size
+
+
+def test_sha256_digest_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+
+    assert sha256_digest(str(path)) == (hashlib.sha256().hexdigest(), 0)
+
+
+@pytest.mark.parametrize("is_local, mmap_threshold", [(True, 1), (True, 2**40), (False, 1)])
+def test_sha256_digest_strategies_agree(data_file, monkeypatch, is_local, mmap_threshold):
+    monkeypatch.setattr(file_utils, "is_local_file", lambda path: is_local)
+    monkeypatch.setattr(file_utils, "MMAP_THRESHOLD", mmap_threshold)
+    monkeypatch.setattr(file_utils, "MIN_CHUNK_SIZE", 4096)
+
+    checksum, _ = sha256_digest(str(data_file))
+
+    assert checksum == hashlib.sha256(data_file.read_bytes()).hexdigest()
+
+
+def test_chunk_size_for():
+    assert file_utils.chunk_size_for(10) == file_utils.MIN_CHUNK_SIZE
+    assert file_utils.chunk_size_for(2**40) == file_utils.MAX_CHUNK_SIZE
+
+
+def test_file_metadata(data_file):
+    metadata, _ = file_metadata(str(data_file))
+
+    assert metadata == {
+        "@type": "DataDownload",
+        "name": "data.bin",
+        "contentUrl": str(data_file),
+        "contentSize": "1280.0 KB",
+        "sha256": hashlib.sha256(data_file.read_bytes()).hexdigest(),
+        "encodingFormat": "application/octet-stream",
+    }
+
+
+def test_checksum_cache_reuses_unchanged_files(data_file, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cache" / "checksums.sqlite")
+    with ChecksumCache(db_path) as cache:
+        expected = cache.sha256_digest(str(data_file))
+
+    def fail(path):
+        raise AssertionError(f"{path} should not be read")
+
+    monkeypatch.setattr(file_utils, "sha256_digest", fail)
+    with ChecksumCache(db_path) as cache:
+        assert cache.sha256_digest(str(data_file)) == expected
+        assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_checksum_cache_recomputes_changed_files(data_file, tmp_path):
+    db_path = str(tmp_path / "checksums.sqlite")
+    with ChecksumCache(db_path) as cache:
+        cache.sha256_digest(str(data_file))
+
+    data_file.write_bytes(b"changed")
+    with ChecksumCache(db_path) as cache:
+        checksum, size = cache.sha256_digest(str(data_file))
+        assert cache.misses == 1
+
+    assert checksum == hashlib.sha256(b"changed").hexdigest()
+    assert size == 7
+
+
+def test_checksum_cache_evicts_missing_files(data_file, tmp_path):
+    other_file = tmp_path / "other.txt"
+    other_file.write_text("other")
+    with ChecksumCache(str(tmp_path / "checksums.sqlite")) as cache:
+        cache.sha256_digest(str(data_file))
+        cache.sha256_digest(str(other_file))
+        other_file.unlink()
+
+        assert cache.evict() == [str(other_file)]
+
+    with ChecksumCache(str(tmp_path / "checksums.sqlite")) as cache:
+        assert cache.evict(keep=[]) == [str(data_file)]
+
+
+def test_file_metadata_registry_reads_each_file_once(tmp_path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f"file{i}.txt"
+        path.write_text(str(i))
+        paths.append(str(path))
+
+    registry = FileMetadataRegistry()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(registry.file_metadata, paths * 5))
+
+    assert set(registry.reads) == set(paths)
+    assert set(registry.reads.values()) == {1}
+    for (metadata, _), path in zip(results, paths * 5):
+        assert metadata == file_metadata(path)[0]
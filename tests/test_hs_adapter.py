@@ -2,6 +2,8 @@ import json
 from datetime import datetime
 import pytest
 from hsextract.adapters.hydroshare import HydroshareMetadataAdapter
+from hsextract.models.schema import PropertyValue
+from hsextract.serialization import to_jsonable
 
 @pytest.fixture
 def resource_metadata():
@@ -49,3 +51,56 @@ def test_to_catalog_record(resource_metadata):
     assert catalog_record.license.name == resource_metadata["rights"]["statement"]
     assert catalog_record.citation[0] == resource_metadata["citation"]
     assert catalog_record.creativeWorkStatus.name == "Published"
+
+
+def test_catalog_record_band_information():
+    metadata = {
+        "title": "raster.tif",
+        "sharing_status": "public",
+        "band_information": [
+            {
+                "name": "Band_1",
+                "minimum_value": 1.0,
+                "maximum_value": 99.0,
+                "no_data_value": -9999.0,
+                "variable_name": None,
+                "variable_unit": "m",
+                "statistics": "approximate",
+            },
+            {
+                "name": "Band_2",
+                "minimum_value": None,
+                "maximum_value": None,
+                "no_data_value": None,
+                "variable_name": None,
+                "variable_unit": None,
+                "statistics": "exact",
+            },
+        ],
+    }
+
+    catalog_record = to_jsonable(HydroshareMetadataAdapter.to_catalog_record(metadata))
+
+    assert catalog_record["additionalProperty"] == [
+        {
+            "@type": "PropertyValue",
+            "name": "Band_1",
+            "minValue": 1.0,
+            "maxValue": 99.0,
+            "unitText": "m",
+            "measurementTechnique": "approximate",
+            "valueReference": {"@type": "PropertyValue", "name": "noDataValue", "value": -9999.0},
+        },
+        {
+            "@type": "PropertyValue",
+            "name": "Band_2",
+            "minValue": None,
+            "maxValue": None,
+            "measurementTechnique": "exact",
+        },
+    ]
+    band = PropertyValue.parse_obj(catalog_record["additionalProperty"][0])
+    assert (band.minValue, band.maxValue, band.valueReference.value) == (1.0, 99.0, -9999.0)
+    # records without bands have no additionalProperty, not even null
+    catalog_record = to_jsonable(HydroshareMetadataAdapter.to_catalog_record({"sharing_status": "public"}))
+    assert "additionalProperty" not in catalog_record
@@ -24,11 +24,11 @@ def _assert_raster_from_file(filename, metadata_json):
         expected_json = json.loads(expected_str)
 
     # remove the minimumValue, maximumValue and projection_string because gdal is inconsistent
-    del metadata_json['band_information']['maximum_value']
-    del expected_json['band_information']['maximum_value']
+    del metadata_json['band_information'][0]['maximum_value']
+    del expected_json['band_information'][0]['maximum_value']
 
-    del metadata_json['band_information']['minimum_value']
-    del expected_json['band_information']['minimum_value']
+    del metadata_json['band_information'][0]['minimum_value']
+    del expected_json['band_information'][0]['minimum_value']
 
     del metadata_json['spatial_reference']['projection_string']
     del expected_json['spatial_reference']['projection_string']
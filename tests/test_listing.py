@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from hsextract.listing import utils
+from hsextract.listing.utils import (
+    categorize_files,
+    file_category,
+    iter_categorized_files,
+    register_file_category,
+    walk_files,
+)
+
+
+@pytest.fixture()
+def file_tree(tmp_path):
+    for path in [
+        "a.txt",
+        "a/b.txt",
+        "a-b/c.txt",
+        "a/.hidden/d.txt",
+        ".e.txt",
+        "rasters/logan.vrt",
+        "rasters/logan1.tif",
+        "rasters/logan2.tif",
+        "rasters/single/other.tif",
+        "netcdf/data.nc",
+        "hs_user_meta.json",
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    (tmp_path / "rasters/logan.vrt").write_text(
+        "<VRTDataset><VRTRasterBand>"
+        "<SimpleSource><SourceFilename relativeToVRT='1'>logan1.tif</SourceFilename></SimpleSource>"
+        "<SimpleSource><SourceFilename relativeToVRT='1'>logan2.tif</SourceFilename></SimpleSource>"
+        "</VRTRasterBand></VRTDataset>"
+    )
+    current_dir = os.getcwd()
+    os.chdir(tmp_path)
+    yield tmp_path
+    os.chdir(current_dir)
+
+
+def test_walk_files_matches_sorted_rglob(file_tree):
+    expected = sorted(
+        str(p) for p in Path().rglob('*') if not p.is_dir() and not any(part.startswith('.') for part in p.parts)
+    )
+
+    assert list(walk_files()) == expected
+
+
+def test_walk_files_include_hidden(file_tree):
+    assert list(walk_files("a", include_hidden=True)) == ["a/.hidden/d.txt", "a/b.txt"]
+
+
+def test_walk_files_exclude(file_tree):
+    assert list(walk_files("a", include_hidden=True, exclude={"a/.hidden"})) == ["a/b.txt"]
+
+
+def test_iter_categorized_files_holds_back_vrt_tiles(file_tree):
+    categorized = list(iter_categorized_files(walk_files(), "hs_user_meta.json"))
+
+    assert categorized == [
+        ("user_meta", "hs_user_meta.json"),
+        ("netcdf", "netcdf/data.nc"),
+        ("raster", "rasters/logan.vrt"),
+        ("raster", "rasters/single/other.tif"),
+    ]
+
+
+def test_categorize_files(file_tree):
+    categorized = categorize_files(walk_files(), "hs_user_meta.json")
+
+    assert categorized["raster"] == ["rasters/logan.vrt", "rasters/single/other.tif"]
+    assert categorized["netcdf"] == ["netcdf/data.nc"]
+    assert categorized["user_meta"] == ["hs_user_meta.json"]
+
+
+@pytest.mark.parametrize(
+    "path, category",
+    [
+        ("a/b.csv", "timeseries"),
+        ("a.b/c.refts.json", "reftimeseries"),
+        ("c.json", None),
+        ("x.tiff", "raster-tif"),
+        ("data.nc.txt", None),
+        ("no_extension", None),
+        ("a.csv/readme", None),
+        (".refts.json", "reftimeseries"),
+    ],
+)
+def test_file_category(path, category):
+    assert file_category(path) == category
+
+
+def test_register_file_category(monkeypatch):
+    monkeypatch.setattr(utils, "FILE_CATEGORIES", dict(utils.FILE_CATEGORIES))
+    monkeypatch.setattr(utils, "_suffixes_by_extension", {})
+    register_file_category(".json", "json")
+    register_file_category(".geo.tar.gz", "archive")
+
+    assert file_category("a.refts.json") == "reftimeseries"
+    assert file_category("b.json") == "json"
+    assert file_category("c.geo.tar.gz") == "archive"
+
+
+def test_vrt_references_are_normalised(file_tree):
+    (file_tree / "rasters/logan.vrt").write_text(
+        "<VRTDataset><VRTRasterBand>"
+        "<SimpleSource><SourceFilename relativeToVRT='1'>./logan1.tif</SourceFilename></SimpleSource>"
+        "<SimpleSource><SourceFilename relativeToVRT='1'>single/../logan2.tif</SourceFilename></SimpleSource>"
+        "</VRTRasterBand></VRTDataset>"
+    )
+
+    assert categorize_files(walk_files(), "hs_user_meta.json")["raster"] == [
+        "rasters/logan.vrt",
+        "rasters/single/other.tif",
+    ]
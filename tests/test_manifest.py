@@ -0,0 +1,62 @@
+import os
+
+from hsextract.manifest import ExtractionManifest
+
+
+def test_manifest_round_trip_detects_changes(tmp_path):
+    data_file = tmp_path / "data.csv"
+    data_file.write_text("a,b")
+    output_file = tmp_path / "data.csv.json"
+    output_file.write_text("{}")
+    manifest_path = str(tmp_path / "manifest.json")
+
+    manifest = ExtractionManifest()
+    manifest.record(str(data_file), str(output_file), [str(data_file)])
+    manifest.set_has_part(str(data_file), ["b", "a"])
+    manifest.set_is_part_of(str(data_file), "dataset_metadata.json")
+    manifest.save(manifest_path)
+
+    previous = ExtractionManifest.load(manifest_path)
+    assert previous.get_has_part(str(data_file)) == ["a", "b"]
+    assert previous.get_is_part_of(str(data_file)) == "dataset_metadata.json"
+    assert previous.is_unchanged(str(data_file), ExtractionManifest())
+    assert not previous.is_unchanged(str(data_file), ExtractionManifest(), members=[str(data_file), "other.csv"])
+
+    data_file.write_text("a,b,c")
+    assert not previous.is_unchanged(str(data_file), ExtractionManifest())
+
+
+def test_manifest_unchanged_requires_existing_output(tmp_path):
+    data_file = tmp_path / "data.csv"
+    data_file.write_text("a,b")
+
+    manifest = ExtractionManifest()
+    manifest.record(str(data_file), str(tmp_path / "missing.json"), [str(data_file)])
+
+    assert not manifest.is_unchanged(str(data_file), ExtractionManifest())
+
+
+def test_manifest_unchanged_requires_same_options(tmp_path):
+    data_file = tmp_path / "data.tif"
+    data_file.write_text("")
+    output_file = tmp_path / "data.tif.json"
+    output_file.write_text("{}")
+
+    manifest = ExtractionManifest()
+    manifest.record(str(data_file), str(output_file), [str(data_file)], {"statistics": "sampled"})
+
+    assert manifest.is_unchanged(str(data_file), ExtractionManifest(), options={"statistics": "sampled"})
+    assert not manifest.is_unchanged(str(data_file), ExtractionManifest(), options={"statistics": "approximate"})
+    assert not manifest.is_unchanged(str(data_file), ExtractionManifest())
+
+
+def test_manifest_removed_outputs(tmp_path):
+    previous = ExtractionManifest()
+    previous.record("kept.csv", "kept.csv.json", [])
+    previous.record("removed.csv", "removed.csv.json", [])
+
+    current = ExtractionManifest()
+    current.copy_entry("kept.csv", previous)
+
+    assert previous.removed_outputs(current) == ["removed.csv.json"]
+    assert ExtractionManifest.load(os.path.join(tmp_path, "none.json")).aggregations == {}
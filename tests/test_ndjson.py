@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from hsextract.ndjson import NDJSONWriter, read_ndjson
+from hsextract.utils import list_and_extract
+
+
+def test_writer_shards_records(tmp_path):
+    records = [{"name": f"record {i}", "values": [i, None]} for i in range(5)]
+    with NDJSONWriter(str(tmp_path), shard_size=2) as writer:
+        for record in records:
+            writer.write(record)
+
+    assert [os.path.basename(shard) for shard in writer.shards] == [
+        "catalog-00000.ndjson",
+        "catalog-00001.ndjson",
+        "catalog-00002.ndjson",
+    ]
+    assert [record for shard in writer.shards for record in read_ndjson(shard)] == records
+    with open(writer.shards[0], "rb") as f:
+        assert f.read().count(b"\n") == 2
+
+
+def test_writer_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    records = [{"name": "é" * 100}] * 3
+    with NDJSONWriter(str(tmp_path), compression="zstd") as writer:
+        for record in records:
+            writer.write(record)
+
+    assert [os.path.basename(shard) for shard in writer.shards] == ["catalog-00000.ndjson.zst"]
+    assert os.path.getsize(writer.shards[0]) < len(json.dumps(records))
+    assert list(read_ndjson(writer.shards[0])) == records
+
+
+def test_writer_removes_previous_shards(tmp_path):
+    with NDJSONWriter(str(tmp_path), shard_size=1) as writer:
+        writer.write({"a": 1})
+        writer.write({"a": 2})
+    with NDJSONWriter(str(tmp_path), shard_size=1) as writer:
+        writer.write({"a": 3})
+
+    assert sorted(os.listdir(tmp_path)) == ["catalog-00000.ndjson"]
+
+
+def test_writer_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        NDJSONWriter(str(tmp_path), compression="gzip")
+
+
+def test_list_and_extract_ndjson(tmp_path):
+    input_path = tmp_path / "input"
+    for path in ["hs_user_meta.json", "a.txt", "sub/hs_user_meta.json", "sub/b.txt"]:
+        (input_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (input_path / path).write_text(json.dumps({"name": path}) if path.endswith(".json") else path)
+    output_path = tmp_path / "output"
+
+    asyncio.run(
+        list_and_extract(
+            str(input_path),
+            str(output_path),
+            "https://in.org/",
+            "https://out.org/",
+            "hs_user_meta.json",
+            output_format="ndjson",
+        )
+    )
+
+    records = list(read_ndjson(str(output_path / "catalog-00000.ndjson")))
+    assert [record["name"] for record in records] == ["hs_user_meta.json", "sub/hs_user_meta.json"]
+    assert records[0]["associatedMedia"][0]["contentUrl"] == "https://in.org/a.txt"
+    assert not (output_path / "dataset_metadata.json").exists()
+
+
+def test_compression_requires_ndjson(tmp_path):
+    with pytest.raises(ValueError, match="ndjson"):
+        asyncio.run(
+            list_and_extract(
+                str(tmp_path),
+                str(tmp_path / "output"),
+                "https://in.org/",
+                "https://out.org/",
+                "hs_user_meta.json",
+                compression="zstd",
+            )
+        )
+    assert not (tmp_path / "output").exists()
@@ -0,0 +1,181 @@
+import netCDF4
+import numpy
+import pytest
+
+pytest.importorskip("osgeo.osr")
+
+from hsextract.netcdf import utils as nc_utils
+
+
+@pytest.fixture
+def nc_file(tmp_path):
+    path = str(tmp_path / "prcp.nc")
+    dataset = netCDF4.Dataset(path, "w")
+    dataset.title = "Precipitation"
+    dataset.createDimension("time", None)
+    dataset.createDimension("lat", 5)
+    dataset.createDimension("lon", 6)
+    dataset.createDimension("nv", 2)
+    time = dataset.createVariable("time", "f8", ("time",))
+    time.units = "days since 2000-01-01"
+    time.bounds = "time_bnds"
+    time[:] = numpy.arange(10)
+    time_bnds = dataset.createVariable("time_bnds", "f8", ("time", "nv"))
+    time_bnds[:] = numpy.stack([numpy.arange(10) - 0.5, numpy.arange(10) + 0.5], axis=1)
+    lat = dataset.createVariable("lat", "f4", ("lat",))
+    lat.units = "degrees_north"
+    lat[:] = numpy.linspace(40, 42, 5)
+    lon = dataset.createVariable("lon", "f4", ("lon",))
+    lon.units = "degrees_east"
+    lon[:] = numpy.linspace(-112, -110, 6)
+    crs = dataset.createVariable("crs", "i4")
+    crs.grid_mapping_name = "latitude_longitude"
+    prcp = dataset.createVariable("prcp", "f4", ("time", "lat", "lon"))
+    prcp.units = "mm"
+    prcp.grid_mapping = "crs"
+    prcp[:] = 1
+    dataset.close()
+    return path
+
+
+def test_context_classifies_each_variable_once(nc_file, monkeypatch):
+    classified = []
+    get_nc_variable_coordinate_type = nc_utils.get_nc_variable_coordinate_type
+
+    def counting_coordinate_type(nc_variable):
+        classified.append(nc_variable.name)
+        return get_nc_variable_coordinate_type(nc_variable)
+
+    monkeypatch.setattr(nc_utils, "get_nc_variable_coordinate_type", counting_coordinate_type)
+    metadata = nc_utils.get_nc_meta_dict(nc_file)
+
+    assert sorted(classified) == ["lat", "lon", "time"]
+    assert metadata["period_coverage"] == {"start": "1999-12-31T12:00:00", "end": "2000-01-10T12:00:00"}
+    assert metadata["spatial_coverage"]["northlimit"] == 42.0
+
+
+def test_functions_take_a_dataset_or_its_context(nc_file):
+    dataset = netCDF4.Dataset(nc_file)
+    context = nc_utils.get_nc_context(dataset)
+
+    assert nc_utils.get_nc_context(context) is context
+    assert nc_utils.get_nc_variables_coordinate_type_mapping(context) == {
+        "time": "TC",
+        "time_bnds": "TC_bnd",
+        "lat": "YC",
+        "lon": "XC",
+    }
+    for function in (
+        nc_utils.get_nc_variables_coordinate_type_mapping,
+        nc_utils.get_nc_coordinate_bounds_variable_namelist,
+        nc_utils.get_nc_data_variable_namelist,
+        nc_utils.get_nc_grid_mapping_variable_name,
+        nc_utils.get_limits_info,
+    ):
+        args = ("C",) if function is nc_utils.get_limits_info else ()
+        assert function(context, *args) == function(dataset, *args)
+    dataset.close()
+
+
+def test_coordinate_data_is_read_once(nc_file, monkeypatch):
+    context = nc_utils.get_nc_context(netCDF4.Dataset(nc_file))
+    reads = []
+    coordinate_meta = nc_utils._get_nc_variable_coordinate_meta
+
+    def counting_coordinate_meta(nc_context, nc_variable_name):
+        reads.append(nc_variable_name)
+        return coordinate_meta(nc_context, nc_variable_name)
+
+    monkeypatch.setattr(nc_utils, "_get_nc_variable_coordinate_meta", counting_coordinate_meta)
+    # the box is computed twice, for the spatial reference and the spatial coverage
+    nc_utils.extract_nc_coverage_meta(context)
+
+    assert sorted(reads) == ["lat", "lon", "time", "time_bnds"]
+    context.dataset.close()
+
+
+@pytest.mark.parametrize(
+    "attributes, expected",
+    [
+        ({"axis": "Z", "standard_name": "latitude"}, "Z"),
+        ({"axis": "", "standard_name": "Longitude of the cell"}, "X"),
+        ({"standard_name": "time", "long_name": "latitude"}, "T"),
+        ({"standard_name": "", "long_name": "latitude"}, "Unknown"),
+        ({"long_name": "PROJECTION_Y_COORDINATE"}, "Y"),
+        ({"long_name": "the latitude", "positive": "down"}, "Z"),
+        ({"units": "degrees_east"}, "X"),
+        ({"units": "Degree N"}, "Y"),
+        ({"units": "Hours since 2000-01-01"}, "T"),
+        ({"units": "years since 2000-01-01"}, "Unknown"),
+        ({"units": "days since"}, "Unknown"),
+        ({}, "Unknown"),
+    ],
+)
+def test_get_nc_variable_coordinate_type(attributes, expected):
+    dataset = netCDF4.Dataset("classify.nc", "w", diskless=True)
+    dataset.createDimension("x", 2)
+    variable = dataset.createVariable("x", "f4", ("x",))
+    variable.setncatts(attributes)
+
+    assert nc_utils.get_nc_variable_coordinate_type(variable) == expected
+    dataset.close()
+
+
+def test_extract_nc_data_variables_meta():
+    dataset = netCDF4.Dataset("data.nc", "w", diskless=True)
+    dataset.createDimension("x", 2)
+    temperature = dataset.createVariable("temperature", "f8", ("x",))
+    temperature.setncatts({"units": "K", "long_name": "Temperature", "missing_value": -999.0, "comment": "mean"})
+    dataset.createVariable("count", "u2", ("x",))
+    dataset.createVariable("label", str, ("x",))
+    dataset.createVariable("scalar", "i4")
+
+    meta = nc_utils.extract_nc_data_variables_meta(dataset.variables)
+
+    assert meta["temperature"] == {
+        "name": "temperature",
+        "unit": "K",
+        "shape": "x",
+        "descriptive_name": "Temperature",
+        "missing_value": "-999.0",
+        "method": "mean",
+        "type": "Double",
+    }
+    assert meta["count"]["unit"] == "Unknown" and meta["count"]["type"] == "Unsigned Short"
+    assert meta["label"]["type"] == "User Defined Type"
+    assert meta["scalar"]["shape"] == "Not defined" and meta["scalar"]["type"] == "Unknown"
+    dataset.close()
+
+
+@pytest.mark.parametrize(
+    "units, calendar, size, expected",
+    [
+        ("days since 2000-01-01", "360_day", 60, {"start": "2000-01-01T00:00:00", "end": "2000-02-29T00:00:00"}),
+        ("days since 2001-02-01", "all_leap", 29, {"start": "2001-02-01T00:00:00", "end": "2001-02-28T00:00:00"}),
+        ("months since 2000-01-01", "360_day", 60, {"start": "2000-01-01T00:00:00", "end": "2004-12-01T00:00:00"}),
+    ],
+)
+def test_period_coverage_of_model_calendars(tmp_path, units, calendar, size, expected):
+    path = str(tmp_path / "model.nc")
+    dataset = netCDF4.Dataset(path, "w")
+    dataset.createDimension("time", size)
+    time = dataset.createVariable("time", "f8", ("time",))
+    time.units = units
+    time.calendar = calendar
+    time[:] = numpy.arange(size)
+    dataset.close()
+
+    assert nc_utils.get_nc_meta_dict(path)["period_coverage"] == expected
+
+
+def test_time_coordinates_that_cant_be_decoded_are_logged(nc_file, caplog):
+    dataset = netCDF4.Dataset(nc_file, "a")
+    dataset["time"].calendar = "none"
+    dataset.close()
+
+    metadata = nc_utils.get_nc_meta_dict(nc_file)
+
+    assert "period_coverage" not in metadata
+    assert (
+        "The time coordinate time: can't decode time units 'days since 2000-01-01' in the none calendar" in caplog.text
+    )
@@ -0,0 +1,146 @@
+import netCDF4
+import numpy
+import pytest
+
+from hsextract.netcdf.extents import chunked_extent, monotonic_extent, variable_extent
+
+
+class RecordingVariable:
+    """A netCDF variable that records the keys it is read with"""
+
+    def __init__(self, nc_variable):
+        self.nc_variable = nc_variable
+        self.reads = []
+
+    def __getattr__(self, name):
+        return getattr(self.nc_variable, name)
+
+    def __getitem__(self, key):
+        self.reads.append(key)
+        return self.nc_variable[key]
+
+
+@pytest.fixture
+def nc_dataset():
+    dataset = netCDF4.Dataset("extents.nc", "w", diskless=True)
+    yield dataset
+    dataset.close()
+
+
+def _variable(dataset, name, values, datatype="f8", chunksizes=None, fill_value=None, **attributes):
+    for i, size in enumerate(numpy.shape(values)):
+        if f"{name}_{i}" not in dataset.dimensions:
+            dataset.createDimension(f"{name}_{i}", size)
+    dimensions = tuple(f"{name}_{i}" for i in range(numpy.ndim(values)))
+    nc_variable = dataset.createVariable(name, datatype, dimensions, chunksizes=chunksizes, fill_value=fill_value)
+    nc_variable.setncatts(attributes)
+    nc_variable[...] = values
+    return RecordingVariable(nc_variable)
+
+
+def test_monotonic_coordinate_is_read_at_a_sample(nc_dataset):
+    time = _variable(nc_dataset, "time", numpy.arange(100_000, dtype=numpy.float64) * 3600)
+
+    minimum, maximum = variable_extent(time, monotonic=True)
+
+    assert (minimum, maximum) == (0, 99_999 * 3600)
+    assert type(minimum) is numpy.float64
+    assert len(time.reads) == 1 and len(time.reads[0]) <= 18
+
+
+@pytest.mark.parametrize("step", [1, -1], ids=["ascending", "descending"])
+def test_bounds_of_a_monotonic_coordinate_are_read_at_a_sample(nc_dataset, step):
+    time = numpy.arange(100_000, dtype=numpy.float64)[::step]
+    time_bnds = _variable(nc_dataset, "time_bnds", numpy.stack([time - 0.5, time + 0.5], axis=1))
+
+    assert variable_extent(time_bnds, monotonic=True) == (-0.5, 99_999.5)
+    assert len(time_bnds.reads) == 1
+
+
+def test_bounds_that_are_not_monotonic_are_scanned(nc_dataset):
+    values = numpy.array([[0, 1], [1, 2], [2, 3], [-5, 4]])
+    time_bnds = _variable(nc_dataset, "time_bnds", values)
+
+    assert monotonic_extent(time_bnds) is None
+    assert variable_extent(time_bnds, monotonic=True) == (-5, 4)
+
+
+@pytest.mark.parametrize(
+    "values, datatype",
+    [([5, 4, 3, 1], "u1"), ([50.0, 40.0, 30.0, 20.0], "f4")],
+    ids=["unsigned", "descending"],
+)
+def test_monotonic_extent_of_a_descending_axis(nc_dataset, values, datatype):
+    assert monotonic_extent(_variable(nc_dataset, "lat", values, datatype)) == (values[-1], values[0])
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        ([50, 10, 3600, 20, 259200, 5], (5, 259200)),
+        ([1, 2, 2, 3], (1, 3)),
+        (numpy.ma.masked_array([3, 2, 1], [0, 0, 1]), (2, 3)),
+    ],
+    ids=["not monotonic", "not strictly", "masked"],
+)
+def test_monotonic_extent_falls_back(nc_dataset, values, expected):
+    nc_variable = _variable(nc_dataset, "time", values, fill_value=-999)
+
+    assert monotonic_extent(nc_variable) is None
+    assert variable_extent(nc_variable, monotonic=True) == expected
+
+
+def test_monotonic_extent_of_an_axis_with_nan(nc_dataset):
+    nc_variable = _variable(nc_dataset, "time", [1, numpy.nan, 3])
+
+    assert monotonic_extent(nc_variable) is None
+    assert all(numpy.isnan(variable_extent(nc_variable, monotonic=True)))
+
+
+def test_actual_range_is_not_read(nc_dataset):
+    lat = _variable(nc_dataset, "lat", numpy.zeros((3, 4)), actual_range=numpy.array([-10.0, 10.0]))
+
+    assert variable_extent(lat) == (-10.0, 10.0)
+    assert lat.reads == []
+
+
+def test_invalid_actual_range_is_ignored(nc_dataset):
+    lat = _variable(nc_dataset, "lat", numpy.ones((3, 4)), actual_range=numpy.array([10.0, -10.0]))
+
+    assert variable_extent(lat) == (1.0, 1.0)
+
+
+def test_chunked_extent_reads_slabs_of_whole_chunks(nc_dataset):
+    values = numpy.random.default_rng(0).uniform(-90, 90, (100, 30))
+    values[17, 3] = -999
+    lat = _variable(nc_dataset, "lat", values, chunksizes=(8, 10), fill_value=-999)
+
+    minimum, maximum = chunked_extent(lat, slab_values=500)
+
+    valid = numpy.ma.masked_equal(values, -999)
+    assert (minimum, maximum) == (valid.min(), valid.max())
+    # 16 rows of 30 values
+    assert [(key.start, key.stop) for key in lat.reads] == [(start, start + 16) for start in range(0, 100, 16)]
+
+
+def test_chunked_extent_of_a_contiguous_variable(nc_dataset):
+    values = numpy.arange(60, dtype=numpy.int32).reshape(6, 10)
+    lon = _variable(nc_dataset, "lon", values)
+
+    assert chunked_extent(lon, slab_values=25) == (0, 59)
+    assert len(lon.reads) == 3
+
+
+def test_chunked_extent_propagates_nan(nc_dataset):
+    values = numpy.arange(20, dtype=numpy.float64).reshape(10, 2)
+    values[9, 1] = numpy.nan
+
+    minimum, maximum = chunked_extent(_variable(nc_dataset, "x", values), slab_values=2)
+
+    assert numpy.isnan(minimum) and numpy.isnan(maximum)
+
+
+def test_extent_of_a_masked_variable(nc_dataset):
+    lev = _variable(nc_dataset, "lev", numpy.ma.masked_all((2, 3)), fill_value=-999)
+
+    assert variable_extent(lev, monotonic=True) is None
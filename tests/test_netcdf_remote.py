@@ -0,0 +1,155 @@
+import json
+import threading
+import urllib.request
+
+import netCDF4
+import numpy
+import pytest
+
+pytest.importorskip("osgeo.osr")
+
+from hsextract.listing.storage import LocalStorage
+from hsextract.netcdf import utils as nc_utils
+from hsextract.netcdf.remote import BlockCache, RangeServer, open_remote_dataset
+
+
+class RemoteStorage(LocalStorage):
+    """A local directory read like a bucket, counting the bytes read"""
+
+    remote = True
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.bytes_read = 0
+
+    def read_range(self, path, start, length):
+        data = super().read_range(path, start, length)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.fixture
+def nc_file(tmp_path):
+    path = tmp_path / "temp.nc"
+    dataset = netCDF4.Dataset(str(path), "w")
+    dataset.title = "Temperature"
+    dataset.createDimension("time", 50)
+    dataset.createDimension("lat", 100)
+    dataset.createDimension("lon", 100)
+    time = dataset.createVariable("time", "f8", ("time",))
+    time.units = "hours since 2020-01-01"
+    time[:] = numpy.arange(50)
+    lat = dataset.createVariable("lat", "f4", ("lat",))
+    lat.units = "degrees_north"
+    lat[:] = numpy.linspace(30, 40, 100)
+    lon = dataset.createVariable("lon", "f4", ("lon",))
+    lon.units = "degrees_east"
+    lon[:] = numpy.linspace(-100, -90, 100)
+    temp = dataset.createVariable("temp", "f8", ("time", "lat", "lon"))
+    temp.units = "K"
+    temp[:] = numpy.random.default_rng(0).uniform(250, 300, (50, 100, 100))
+    dataset.close()
+    return path
+
+
+def test_block_cache_reads_aligned_blocks():
+    data = bytes(range(256)) * 4
+    reads = []
+
+    def read(start, length):
+        reads.append((start, length))
+        return data[start : start + length]
+
+    cache = BlockCache(read, len(data), block_size=100, max_blocks=2)
+
+    assert cache.read(150, 100) == data[150:250]
+    assert cache.read(120, 10) == data[120:130]
+    assert cache.read(1000, 100) == data[1000:]
+    assert cache.read(1024, 10) == b""
+    # the least recently used block 2 was evicted by block 10
+    assert cache.read(200, 10) == data[200:210]
+    assert reads == [(100, 100), (200, 100), (1000, 24), (200, 100)]
+    assert cache.reads == 4
+
+
+def test_block_cache_reads_blocks_concurrently():
+    # both reads must be in progress at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def read(start, length):
+        barrier.wait()
+        return bytes(length)
+
+    cache = BlockCache(read, 200, block_size=100)
+    threads = [threading.Thread(target=cache.read, args=(start, 10)) for start in (0, 100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+    assert cache.reads == 2
+
+
+def test_range_server(tmp_path):
+    (tmp_path / "a b.bin").write_bytes(b"0123456789")
+
+    with RangeServer(LocalStorage(str(tmp_path)), "a b.bin", block_size=4) as server:
+        head = urllib.request.urlopen(urllib.request.Request(server.url, method="HEAD"))
+        assert head.headers["Content-Length"] == "10"
+        ranged = urllib.request.urlopen(urllib.request.Request(server.url, headers={"Range": "bytes=3-5"}))
+        assert (ranged.status, ranged.read()) == (206, b"345")
+        assert ranged.headers["Content-Range"] == "bytes 3-5/10"
+        suffix = urllib.request.urlopen(urllib.request.Request(server.url, headers={"Range": "bytes=-2"}))
+        assert suffix.read() == b"89"
+        assert urllib.request.urlopen(server.url).read() == b"0123456789"
+
+
+def test_get_nc_meta_dict_reads_ranges_of_remote_files(nc_file):
+    storage = RemoteStorage(str(nc_file.parent))
+
+    with open_remote_dataset(storage, nc_file.name) as dataset:
+        if dataset is None:
+            pytest.skip("libnetcdf was built without byte-range support")
+        dataset.close()
+    storage.bytes_read = 0
+    metadata = nc_utils.get_nc_meta_dict(str(nc_file))
+    remote_metadata = nc_utils.get_nc_meta_dict(nc_file.name, storage=storage)
+
+    assert json.dumps(remote_metadata, default=str) == json.dumps(
+        {**metadata, "content_files": [nc_file.name]}, default=str
+    )
+    # the 4 MB of temperatures are not read
+    assert 0 < storage.bytes_read < nc_file.stat().st_size / 4
+
+
+def test_get_nc_meta_dict_falls_back_to_the_path(nc_file):
+    class MissingStorage(RemoteStorage):
+        def size(self, path):
+            raise FileNotFoundError(path)
+
+    metadata = nc_utils.get_nc_meta_dict(str(nc_file), storage=MissingStorage(str(nc_file.parent)))
+
+    assert metadata == nc_utils.get_nc_meta_dict(str(nc_file))
+
+
+def test_get_nc_meta_dict_falls_back_when_the_ranged_read_fails(nc_file, monkeypatch):
+    storage = RemoteStorage(str(nc_file.parent))
+    with open_remote_dataset(storage, nc_file.name) as dataset:
+        if dataset is None:
+            pytest.skip("libnetcdf was built without byte-range support")
+    get_nc_meta_dict = nc_utils._get_nc_meta_dict
+    datasets = []
+
+    def failing_remote_read(nc_dataset, nc_file_name):
+        datasets.append(nc_dataset)
+        if len(datasets) == 1:
+            raise RuntimeError("NetCDF: HDF error")
+        return get_nc_meta_dict(nc_dataset, nc_file_name)
+
+    monkeypatch.setattr(nc_utils, "_get_nc_meta_dict", failing_remote_read)
+    metadata = nc_utils.get_nc_meta_dict(str(nc_file), storage=RemoteStorage("/"))
+
+    assert len(datasets) == 2 and not datasets[0].isopen()
+    monkeypatch.setattr(nc_utils, "_get_nc_meta_dict", get_nc_meta_dict)
+    assert metadata == nc_utils.get_nc_meta_dict(str(nc_file))
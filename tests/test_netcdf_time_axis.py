@@ -0,0 +1,57 @@
+import datetime
+
+import cftime
+import pytest
+
+from hsextract.netcdf.time_axis import TimeAxis, get_time_axis, to_datetime
+
+
+def test_get_time_axis_normalises_the_calendar():
+    time_axis = get_time_axis("days since 2000-01-01", " NoLeap ")
+
+    assert time_axis == TimeAxis("days since 2000-01-01", "noleap")
+    assert get_time_axis("days since 2000-01-01", "noleap") is time_axis
+    assert get_time_axis("days since 2000-01-01").calendar == "standard"
+    assert get_time_axis("days since 2000-01-01", "").calendar == "standard"
+
+
+@pytest.mark.parametrize(
+    "units, calendar",
+    [
+        ("days since 2000-01-01", "none"),
+        ("months since 2000-01-01", "standard"),
+        ("days after 2000-01-01", "standard"),
+        ("days since 0000-01-01", "standard"),
+        (b"days since 2000-01-01", "standard"),
+    ],
+)
+def test_get_time_axis_raises_the_reason(units, calendar):
+    with pytest.raises(ValueError, match="time units"):
+        get_time_axis(units, calendar)
+
+
+@pytest.mark.parametrize(
+    "units, calendar, values, expected",
+    [
+        ("days since 2000-01-01", "standard", [0, 1.5], [(2000, 1, 1), (2000, 1, 2, 12)]),
+        ("days since 2000-01-01", "360_day", [0, 59], [(2000, 1, 1), (2000, 2, 30)]),
+        ("days since 2001-01-01", "all_leap", [59], [(2001, 2, 29)]),
+        ("days since 2000-01-01", "noleap", [365], [(2001, 1, 1)]),
+        ("months since 2000-01-01", "360_day", [13], [(2001, 2, 1)]),
+        ("hours since 1582-10-04", "julian", [24], [(1582, 10, 5)]),
+    ],
+)
+def test_decode(units, calendar, values, expected):
+    dates = get_time_axis(units, calendar).decode(values)
+
+    assert dates == [cftime.datetime(*date, calendar=calendar) for date in expected]
+
+
+def test_to_datetime_clamps_the_day():
+    assert to_datetime(cftime.datetime(2000, 2, 30, 6, calendar="360_day")) == datetime.datetime(2000, 2, 29, 6)
+    assert to_datetime(cftime.datetime(2001, 2, 29, calendar="all_leap")) == datetime.datetime(2001, 2, 28)
+    assert to_datetime(cftime.datetime(2000, 1, 1, 0, 0, 1, 500, calendar="noleap")) == datetime.datetime(
+        2000, 1, 1, 0, 0, 1
+    )
+    with pytest.raises(ValueError):
+        to_datetime(cftime.datetime(0, 1, 1, calendar="360_day"))
@@ -0,0 +1,127 @@
+import numpy
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+if not hasattr(gdal, "Open"):
+    pytest.skip("GDAL is not installed", allow_module_level=True)
+
+from osgeo import osr
+
+from hsextract.raster import utils as raster_utils
+
+
+def _write_tif(path, values, no_data=None):
+    rows, columns = values.shape[-2:]
+    bands = values.reshape(-1, rows, columns)
+    dataset = gdal.GetDriverByName("GTiff").Create(str(path), columns, rows, len(bands), gdal.GDT_Float32)
+    dataset.SetGeoTransform((-111.9, 0.01, 0, 41.8, 0, -0.01))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    dataset.SetProjection(srs.ExportToWkt())
+    for i, band_values in enumerate(bands):
+        band = dataset.GetRasterBand(i + 1)
+        if no_data is not None:
+            band.SetNoDataValue(no_data)
+        band.WriteArray(band_values)
+    dataset.FlushCache()
+    return str(path)
+
+
+@pytest.fixture
+def tif_file(tmp_path):
+    values = numpy.arange(100, dtype=numpy.float32).reshape(10, 10)
+    values[0, 0] = -9999
+    return _write_tif(tmp_path / "logan.tif", values, no_data=-9999)
+
+
+def test_raster_meta_dict_opens_the_raster_once(tif_file, monkeypatch):
+    opened = []
+    gdal_open = gdal.Open
+
+    def counting_open(*args):
+        opened.append(args[0])
+        return gdal_open(*args)
+
+    monkeypatch.setattr(raster_utils.gdal, "Open", counting_open)
+    meta = raster_utils.get_raster_meta_dict(tif_file)
+
+    assert opened == [tif_file]
+    assert meta["cell_info"]["rows"] == 10
+    assert meta["cell_info"]["columns"] == 10
+    assert meta["band_info"][1]["minimumValue"] == 1
+    assert meta["band_info"][1]["maximumValue"] == 99
+    assert meta["spatial_coverage_info"]["original_coverage_info"]["northlimit"] == pytest.approx(41.8)
+
+
+def test_wgs84_coverage_reuses_original_coverage(tif_file, monkeypatch):
+    dataset = raster_utils.open_raster(tif_file)
+    original_coverage_info = raster_utils.get_original_coverage_info(dataset)
+    expected = raster_utils.get_wgs84_coverage_info(dataset)
+
+    monkeypatch.setattr(raster_utils, "get_original_coverage_info", None)
+
+    assert raster_utils.get_wgs84_coverage_info(dataset, original_coverage_info) == expected
+
+
+@pytest.mark.parametrize("statistics", ["exact", "approximate", "sampled"])
+def test_band_statistics_strategies(tif_file, statistics):
+    band_info = raster_utils.get_band_info(tif_file, statistics)[1]
+
+    assert band_info["statistics"] == statistics
+    assert (band_info["minimumValue"], band_info["maximumValue"]) == (1, 99)
+
+
+def test_existing_band_statistics(tif_file):
+    assert raster_utils.get_band_info(tif_file, "existing")[1]["statistics"] == "exact"
+
+    dataset = gdal.Open(tif_file)
+    dataset.GetRasterBand(1).ComputeStatistics(False)
+    # the statistics are stored in the .aux.xml when the dataset is closed
+    dataset = None
+
+    assert raster_utils.get_band_info(tif_file, "existing")[1]["statistics"] == "existing"
+
+
+def test_windowed_statistics_match_gdal(tmp_path):
+    values = numpy.random.default_rng(0).uniform(-100, 100, (3, 300, 200)).astype(numpy.float32)
+    values[:, :10, :10] = -9999
+    path = _write_tif(tmp_path / "tiled.tif", values, no_data=-9999)
+
+    band_info = raster_utils.get_band_info(path)
+
+    dataset = gdal.Open(path)
+    for i in range(3):
+        minimum, maximum, _, _ = dataset.GetRasterBand(i + 1).ComputeStatistics(False)
+        assert (band_info[i + 1]["minimumValue"], band_info[i + 1]["maximumValue"]) == (minimum, maximum)
+
+
+def test_extract_records_band_statistics(tif_file):
+    metadata = raster_utils.extract_from_tif_file(tif_file, statistics="sampled")
+
+    assert metadata["band_information"][0]["statistics"] == "sampled"
+
+
+def test_single_tif_is_read_without_a_vrt(tif_file, monkeypatch):
+    def translate(*args, **kwargs):
+        raise AssertionError("a VRT was written for a single GeoTIFF")
+
+    monkeypatch.setattr(raster_utils.gdal, "Translate", translate)
+    metadata = raster_utils.extract_from_tif_file(tif_file)
+
+    assert metadata["cell_information"]["name"] == "logan.tif.vrt"
+    assert metadata["content_files"] == [tif_file]
+    band_information = metadata["band_information"][0]
+    assert (band_information["minimum_value"], band_information["maximum_value"]) == (1, 99)
+
+
+def test_extract_multi_band_raster(tmp_path):
+    values = numpy.arange(5 * 20 * 30, dtype=numpy.float32).reshape(5, 20, 30)
+    values[:, 0, 0] = -9999
+    path = _write_tif(tmp_path / "cube.tif", values, no_data=-9999)
+
+    metadata = raster_utils.extract_from_tif_file(path)
+
+    assert [band["name"] for band in metadata["band_information"]] == [f"Band_{i}" for i in range(1, 6)]
+    for band, band_values in zip(metadata["band_information"], values):
+        assert (band["minimum_value"], band["maximum_value"]) == (band_values[0, 1], band_values.max())
+        assert band["no_data_value"] == -9999
@@ -0,0 +1,282 @@
+import numpy
+import pytest
+
+from hsextract.raster.statistics import (
+    band_statistics,
+    block_windows,
+    dataset_statistics,
+    read_bands,
+    sampled_statistics,
+    valid_values,
+    windowed_statistics,
+)
+
+
+class ArrayBand:
+    """The parts of a GDAL band the statistics read, backed by an array"""
+
+    def __init__(self, values, no_data=None, metadata=None, block_size=None):
+        self.values = values
+        self.no_data = no_data
+        self.metadata = metadata or {}
+        self.computed = []
+        self.reads = []
+        self.YSize, self.XSize = values.shape
+        self.DataType = values.dtype.str
+        self.block_size = block_size or [self.XSize, 1]
+
+    def GetNoDataValue(self):
+        return self.no_data
+
+    def SetNoDataValue(self, no_data):
+        self.no_data = no_data
+
+    def GetMetadataItem(self, name):
+        return self.metadata.get(name)
+
+    def GetBlockSize(self):
+        return self.block_size
+
+    def ComputeStatistics(self, approx_ok):
+        self.computed.append(approx_ok)
+        values = valid_values(self.values, self.no_data)
+        # like GDAL, which saves them to the .aux.xml
+        self.metadata["STATISTICS_MINIMUM"] = str(values.min())
+        self.metadata["STATISTICS_MAXIMUM"] = str(values.max())
+        if approx_ok:
+            self.metadata["STATISTICS_APPROXIMATE"] = "YES"
+        return float(values.min()), float(values.max()), float(values.mean()), float(values.std())
+
+    def ComputeRasterMinMax(self, approx_ok):
+        self.computed.append(approx_ok)
+        values = valid_values(self.values, self.no_data)
+        return (values.min(), values.max()) if values.size else None
+
+    def ReadAsArray(self, xoff, yoff, win_xsize, win_ysize, buf_xsize=None, buf_ysize=None):
+        self.reads.append((xoff, yoff, win_xsize, win_ysize))
+        window = self.values[yoff : yoff + win_ysize, xoff : xoff + win_xsize]
+        rows = numpy.linspace(0, win_ysize - 1, buf_ysize or win_ysize).astype(int)
+        columns = numpy.linspace(0, win_xsize - 1, buf_xsize or win_xsize).astype(int)
+        return window[numpy.ix_(rows, columns)]
+
+
+class ArrayDataset:
+    def __init__(self, *bands):
+        self.bands = bands
+        self.RasterCount = len(bands)
+        self.reads = []
+
+    def GetRasterBand(self, band_number):
+        return self.bands[band_number - 1]
+
+    def ReadAsArray(self, xoff, yoff, xsize, ysize, band_list):
+        self.reads.append((tuple(band_list), (xoff, yoff, xsize, ysize)))
+        values = [self.GetRasterBand(i).values[yoff : yoff + ysize, xoff : xoff + xsize] for i in band_list]
+        # like GDAL, a single band is read as a 2D array
+        return values[0] if len(values) == 1 else numpy.stack(values)
+
+
+@pytest.fixture
+def band():
+    values = numpy.arange(100, dtype=numpy.float32).reshape(10, 10)
+    values[0, 0] = numpy.float32(-3.4028234663852886e38)
+    values[0, 1] = numpy.nan
+    return ArrayBand(values, no_data=-3.4028234663852886e38)
+
+
+def test_valid_values_masks_float32_nodata_and_nan(band):
+    values = valid_values(band.values, band.no_data)
+
+    assert values.size == 98
+    assert values.min() == 2
+
+
+def test_valid_values_integer_nodata_out_of_range():
+    values = numpy.array([[0, 255]], dtype=numpy.uint8)
+
+    assert valid_values(values, -9999.0).tolist() == [0, 255]
+    assert valid_values(values, 255.0).tolist() == [0]
+
+
+def test_exact_and_approximate_statistics(band):
+    assert band_statistics(band) == (2, 99, "exact")
+    assert band_statistics(band, "approximate") == (2, 99, "approximate")
+    assert band.computed == [False, True]
+
+
+def test_approximate_statistics_are_not_stored(band):
+    assert band_statistics(band, "approximate") == (2, 99, "approximate")
+    assert band.metadata == {}
+
+
+def test_approximate_statistics_of_a_nodata_band():
+    band = ArrayBand(numpy.full((3, 3), -1, dtype=numpy.int16), no_data=-1)
+
+    assert band_statistics(band, "approximate") == (None, None, "approximate")
+
+
+def test_sampled_statistics_reads_a_decimated_band(band):
+    assert sampled_statistics(band, sample_size=4) == (3.0, 99.0)
+    assert band_statistics(band, "sampled") == (2.0, 99.0, "sampled")
+    assert band.computed == []
+
+
+def test_sampled_statistics_of_a_nodata_band():
+    band = ArrayBand(numpy.full((3, 3), -1, dtype=numpy.int16), no_data=-1)
+
+    assert band_statistics(band, "sampled") == (None, None, "sampled")
+
+
+def test_existing_statistics(band):
+    band.metadata = {"STATISTICS_MINIMUM": "5", "STATISTICS_MAXIMUM": "50.5"}
+
+    assert band_statistics(band, "existing") == (5.0, 50.5, "existing")
+    assert band.computed == []
+
+
+def test_existing_statistics_fall_back_to_exact(band):
+    assert band_statistics(band, "existing") == (2, 99, "exact")
+
+
+def test_existing_approximate_statistics_fall_back_to_exact(band):
+    band.metadata = {"STATISTICS_MINIMUM": "5", "STATISTICS_MAXIMUM": "50.5", "STATISTICS_APPROXIMATE": "YES"}
+
+    assert band_statistics(band, "existing") == (2, 99, "exact")
+
+
+def test_unknown_statistics(band):
+    with pytest.raises(ValueError):
+        band_statistics(band, "median")
+
+
+@pytest.mark.parametrize(
+    "block_size, window_pixels, expected",
+    [
+        # strips: full width windows of whole strips
+        ([10, 1], 25, [(0, 0, 10, 2), (0, 2, 10, 2), (0, 4, 10, 2), (0, 6, 10, 2), (0, 8, 10, 1)]),
+        # tiles: a row of tiles at a time, clipped to the band
+        ([4, 4], 48, [(0, 0, 10, 4), (0, 4, 10, 4), (0, 8, 10, 1)]),
+        # windows smaller than a row of tiles
+        ([4, 4], 16, [(0, 0, 4, 4), (4, 0, 4, 4), (8, 0, 2, 4)]),
+    ],
+)
+def test_block_windows(block_size, window_pixels, expected):
+    band = ArrayBand(numpy.zeros((9, 10)), block_size=block_size)
+
+    assert list(block_windows(band, window_pixels))[: len(expected)] == expected
+    covered = numpy.zeros((9, 10), dtype=int)
+    for xoff, yoff, xsize, ysize in block_windows(band, window_pixels):
+        covered[yoff : yoff + ysize, xoff : xoff + xsize] += 1
+    assert (covered == 1).all()
+
+
+@pytest.mark.parametrize("open_dataset", [False, True], ids=["serial", "threads"])
+def test_windowed_statistics(open_dataset):
+    rng = numpy.random.default_rng(0)
+    first = ArrayBand(rng.uniform(-50, 50, (37, 23)).astype(numpy.float32), no_data=-1e6, block_size=[8, 8])
+    first.values[5:9, 3] = -1e6
+    second = ArrayBand(rng.integers(0, 200, (37, 23), dtype=numpy.uint8))
+    dataset = ArrayDataset(first, second)
+
+    statistics = windowed_statistics(
+        dataset, open_dataset=(lambda: dataset) if open_dataset else None, window_pixels=64
+    )
+
+    valid = valid_values(first.values, -1e6)
+    assert statistics[0] == (float(valid.min()), float(valid.max()), -1e6, "exact", valid.size)
+    assert statistics[1] == (float(second.values.min()), float(second.values.max()), None, "exact", 37 * 23)
+    assert max(xsize * ysize for _, (_, _, xsize, ysize) in dataset.reads) <= 64
+
+
+def test_windowed_statistics_reads_bands_of_a_type_together():
+    rng = numpy.random.default_rng(0)
+    values = rng.uniform(0, 1, (200, 30, 20)).astype(numpy.float32)
+    values[:, 0, 0] = -9999
+    values[7, 1, 1] = numpy.nan
+    bands = [ArrayBand(band_values, no_data=None if i % 2 else -9999) for i, band_values in enumerate(values)]
+    bands.append(ArrayBand(numpy.arange(600, dtype=numpy.int16).reshape(30, 20), no_data=0))
+    dataset = ArrayDataset(*bands)
+
+    statistics = windowed_statistics(dataset, window_pixels=200 * 20 * 10)
+
+    for band, band_statistics in zip(bands, statistics):
+        valid = valid_values(band.values, band.no_data)
+        assert band_statistics == (float(valid.min()), float(valid.max()), band.no_data, "exact", valid.size)
+    # the float bands in 3 windows of 10 rows, the int16 band in a single window
+    assert [(len(bands), window) for bands, window in dataset.reads] == [
+        (200, (0, 0, 20, 10)),
+        (200, (0, 10, 20, 10)),
+        (200, (0, 20, 20, 10)),
+        (1, (0, 0, 20, 30)),
+    ]
+
+
+def test_windowed_statistics_bounds_bands_per_read():
+    bands = [ArrayBand(numpy.zeros((8, 8)), block_size=[4, 4]) for _ in range(5)]
+    dataset = ArrayDataset(*bands)
+
+    windowed_statistics(dataset, window_pixels=32)
+
+    assert {bands for bands, _ in dataset.reads} == {(1, 2), (3, 4), (5,)}
+    assert all(len(bands) * xsize * ysize <= 32 for bands, (_, _, xsize, ysize) in dataset.reads)
+
+
+def test_read_bands_without_band_list():
+    class OldGDALDataset(ArrayDataset):
+        def ReadAsArray(self, xoff=0, yoff=0, xsize=None, ysize=None, buf_obj=None):
+            raise AssertionError("the whole dataset was read")
+
+    values = numpy.arange(24, dtype=numpy.int16).reshape(2, 3, 4)
+    bands = [ArrayBand(band_values) for band_values in values]
+
+    window = read_bands(OldGDALDataset(*bands), [1, 2], (1, 1, 2, 2))
+
+    assert window.tolist() == values[:, 1:3, 1:3].tolist()
+    assert [band.reads for band in bands] == [[(1, 1, 2, 2)], [(1, 1, 2, 2)]]
+
+
+def test_windowed_statistics_corrects_nodata_in_one_pass():
+    values = numpy.arange(12, dtype=numpy.float64).reshape(3, 4)
+    values[0, :2] = -9999.00001
+    band = ArrayBand(values, no_data=-9999)
+    dataset = ArrayDataset(band)
+
+    statistics = windowed_statistics(dataset)[0]
+
+    assert statistics == (2.0, 11.0, -9999.00001, "exact", 10)
+    assert len(dataset.reads) == 1
+    assert band.no_data == -9999
+
+
+def test_windowed_statistics_of_a_nodata_band():
+    band = ArrayBand(numpy.full((3, 3), numpy.nan, dtype=numpy.float32), no_data=numpy.nan)
+
+    assert windowed_statistics(ArrayDataset(band))[0] == (None, None, band.no_data, "exact", 0)
+
+
+def test_dataset_statistics_corrects_approximate_nodata():
+    values = numpy.arange(12, dtype=numpy.float64).reshape(3, 4)
+    values[0, 0] = -9999.00001
+    band = ArrayBand(values, no_data=-9999)
+
+    assert dataset_statistics(ArrayDataset(band), "approximate") == [(1.0, 11.0, -9999.00001, "approximate", None)]
+    assert band.computed == [True, True]
+    assert band.no_data == -9999
+
+
+def test_dataset_statistics_existing(band):
+    stored = ArrayBand(numpy.zeros((2, 2)), metadata={"STATISTICS_MINIMUM": "5", "STATISTICS_MAXIMUM": "50"})
+    stale = ArrayBand(
+        numpy.array([[-9999.00001, 1.0]]),
+        no_data=-9999,
+        metadata={"STATISTICS_MINIMUM": "-9999.00001", "STATISTICS_MAXIMUM": "1"},
+    )
+
+    statistics = dataset_statistics(ArrayDataset(stored, band, stale), "existing")
+
+    assert statistics == [
+        (5.0, 50.0, None, "existing", None),
+        (2.0, 99.0, band.no_data, "exact", 98),
+        (1.0, 1.0, -9999.00001, "exact", 1),
+    ]
+    assert band.computed == []
@@ -0,0 +1,101 @@
+import json
+import math
+import os
+from datetime import datetime
+
+import pytest
+
+from hsextract import serialization
+from hsextract.adapters.hydroshare import HydroshareMetadataAdapter
+from hsextract.models.schema import CoreMetadataDOC
+from hsextract.serialization import dumps, loads, to_jsonable
+
+
+@pytest.fixture
+def resource_metadata():
+    with open(os.path.join(os.path.dirname(__file__), "data", "resource_meta.json"), "r") as f:
+        metadata = json.load(f)
+    metadata["sharing_status"] = "published"
+    return metadata
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def test_to_jsonable_matches_pydantic_json(resource_metadata):
+    catalog_record = HydroshareMetadataAdapter.to_catalog_record(resource_metadata)
+
+    assert to_jsonable(catalog_record) == json.loads(catalog_record.json())
+
+
+def test_to_jsonable_constructed_record():
+    record = CoreMetadataDOC.construct(
+        name="dataset", dateCreated=datetime(2020, 1, 2, 3, 4, 5), associatedMedia=[{"contentUrl": "a.csv"}]
+    )
+
+    assert to_jsonable(record) == json.loads(record.json())
+
+
+def test_to_jsonable_keys_and_tuples():
+    assert to_jsonable({1: (1, 2.5), True: None, "a": {"b": [True]}}) == json.loads(
+        json.dumps({1: (1, 2.5), True: None, "a": {"b": [True]}})
+    )
+
+
+def test_dumps_is_compact_unless_indented(encoder):
+    value = {"name": "é", "values": [1, 2.5, None]}
+
+    assert dumps(value) == '{"name":"é","values":[1,2.5,null]}'.encode("utf-8")
+    assert dumps(value, indent=2) == json.dumps(value, indent=2).encode("utf-8")
+    assert loads(dumps(value)) == value
+
+
+def test_indented_dumps_matches_json(encoder):
+    value = {"name": "Río Grande 雨", "values": [float("nan"), float("inf"), 1e16, 0.1]}
+
+    assert dumps(value, indent=2) == json.dumps(value, indent=2).encode("ascii")
+    assert b"\\u00ed" in dumps(value, indent=2) and b"NaN" in dumps(value, indent=2)
+    loaded = loads(dumps(value, indent=2))
+    assert loaded["name"] == value["name"]
+    assert math.isnan(loaded["values"][0]) and loaded["values"][1:] == [float("inf"), 1e16, 0.1]
+
+
+def test_compact_dumps_non_ascii_and_nan(encoder):
+    value = {"name": "Río Grande 雨", "value": float("nan")}
+
+    encoded = dumps(value)
+    loaded = loads(encoded)
+
+    assert "Río Grande 雨".encode("utf-8") in encoded
+    assert loaded["name"] == value["name"]
+    # non-finite numbers are written as null, which is valid JSON
+    assert loaded["value"] is None
+    assert json.loads(encoded, parse_constant=pytest.fail) == loaded
+
+
+def test_compact_dumps_with_and_without_orjson(monkeypatch):
+    if serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    value = {
+        "name": "Río Grande 雨",
+        "values": [float("nan"), float("-inf"), 0.1, -123.456, 2.5, 10, None, True],
+        "nested": {"tuple": (1, "a"), "empty": [], "escaped": 'quote " and \\ and \n'},
+    }
+
+    with_orjson = dumps(value)
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert dumps(value) == with_orjson
+
+
+def test_dumps_large_integers(encoder):
+    assert loads(dumps({"value": 2**70})) == {"value": 2**70}
+
+
+def test_loads_non_finite_numbers(encoder):
+    assert loads(b'{"value": Infinity}') == {"value": float("inf")}
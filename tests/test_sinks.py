@@ -0,0 +1,261 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from hsextract import extractors
+from hsextract.extractors import Extractor
+from hsextract.file_utils import FileMetadataRegistry
+from hsextract.listing import utils as listing_utils
+from hsextract.ndjson import NDJSONWriter, read_ndjson
+from hsextract.sinks import LocalSink, MemorySink, NDJSONSink, OutputSink, S3Sink
+from hsextract import utils as hsextract_utils
+from hsextract.utils import list_and_extract
+
+
+def extract_text(filepath):
+    return {"title": filepath, "sharing_status": "public", "content_files": [filepath]}
+
+
+@pytest.fixture
+def text_extractor(monkeypatch):
+    monkeypatch.setattr(listing_utils, "FILE_CATEGORIES", dict(listing_utils.FILE_CATEGORIES))
+    monkeypatch.setattr(listing_utils, "_suffixes_by_extension", {})
+    listing_utils.register_file_category(".txt", "text")
+    monkeypatch.setattr(extractors, "EXTRACTORS", dict(extractors.EXTRACTORS))
+    extractors.register_extractor("text", Extractor(__name__, "extract_text", "FileSetAggregation"))
+
+
+@pytest.fixture
+def resource(tmp_path):
+    input_path = tmp_path / "input"
+    for path in ["hs_user_meta.json", "a.txt", "sub/hs_user_meta.json", "sub/b.txt", "subling/c.txt"]:
+        (input_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (input_path / path).write_text(json.dumps({"name": path}) if path.endswith(".json") else path)
+    return input_path
+
+
+def _extract(resource, output_path, sink):
+    asyncio.run(
+        list_and_extract(
+            str(resource), str(output_path), "https://in.org/", "https://out.org/", "hs_user_meta.json", sink=sink
+        )
+    )
+
+
+async def _write_all(sink, records):
+    sink.start()
+    for name, record in records.items():
+        await sink.put(name, record)
+    await sink.aclose()
+
+
+def test_local_sink(tmp_path):
+    asyncio.run(_write_all(LocalSink(str(tmp_path), concurrency=2, max_pending=1), {"a/b.json": {"a": 1}}))
+
+    assert json.loads((tmp_path / "a" / "b.json").read_text()) == {"a": 1}
+
+
+def test_s3_sink():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="catalog")
+        asyncio.run(_write_all(S3Sink("catalog", "/records/", client=client), {"a/b.json": {"a": 1}}))
+
+        body = client.get_object(Bucket="catalog", Key="records/a/b.json")["Body"].read()
+        assert json.loads(body) == {"a": 1}
+
+
+def test_ndjson_sink_uploads_shards(tmp_path):
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="catalog")
+        sink = NDJSONSink(NDJSONWriter(str(tmp_path), shard_size=1), upload_to=S3Sink("catalog", client=client))
+        asyncio.run(_write_all(sink, {"a.json": {"a": 1}, "b.json": {"b": 2}}))
+
+        keys = [obj["Key"] for obj in client.list_objects_v2(Bucket="catalog")["Contents"]]
+        assert keys == ["catalog-00000.ndjson", "catalog-00001.ndjson"]
+    assert [record for shard in sink.writer.shards for record in read_ndjson(shard)] == [{"a": 1}, {"b": 2}]
+
+
+def test_sink_write_errors_are_raised():
+    class FailingSink(MemorySink):
+        def write(self, name, record):
+            raise OSError(f"cannot write {name}")
+
+    with pytest.raises(OSError, match="cannot write a.json"):
+        asyncio.run(_write_all(FailingSink(), {"a.json": {}}))
+
+
+def test_sink_without_write_cannot_be_created():
+    class IncompleteSink(OutputSink):
+        def finish(self):
+            pass
+
+    with pytest.raises(TypeError, match="write"):
+        IncompleteSink()
+
+
+def test_list_and_extract_streams_each_record_once(text_extractor, resource, tmp_path):
+    sink = MemorySink()
+    _extract(resource, tmp_path / "output", sink)
+
+    assert sorted(sink.writes) == [
+        "a.txt.json",
+        "dataset_metadata.json",
+        "sub/b.txt.json",
+        "sub/dataset_metadata.json",
+        "subling/c.txt.json",
+    ]
+    assert sink.records["sub/b.txt.json"]["isPartOf"] == ["https://out.org/sub/dataset_metadata.json"]
+    assert sink.records["subling/c.txt.json"]["isPartOf"] == ["https://out.org/dataset_metadata.json"]
+    assert [part["url"] for part in sink.records["sub/dataset_metadata.json"]["hasPart"]] == [
+        "https://out.org/sub/b.txt.json"
+    ]
+
+
+def test_list_and_extract_relinks_parts_of_failed_datasets(text_extractor, resource, tmp_path):
+    (resource / "sub" / "hs_user_meta.json").write_text("not json")
+    sink = MemorySink()
+    _extract(resource, tmp_path / "output", sink)
+
+    assert "sub/dataset_metadata.json" not in sink.records
+    assert sink.records["sub/b.txt.json"]["isPartOf"] == ["https://out.org/dataset_metadata.json"]
+
+
+def _extract_incremental(resource, output_path):
+    asyncio.run(
+        list_and_extract(
+            str(resource),
+            str(output_path),
+            "https://in.org/",
+            "https://out.org/",
+            "hs_user_meta.json",
+            incremental=True,
+        )
+    )
+
+
+@pytest.mark.parametrize("root_dataset", [True, False])
+def test_incremental_relinks_parts_of_removed_datasets(text_extractor, resource, tmp_path, root_dataset):
+    if not root_dataset:
+        (resource / "hs_user_meta.json").write_text("not json")
+    # a part in a nested directory is kept when the dataset above it is removed
+    (resource / "sub" / "deep").mkdir()
+    (resource / "sub" / "deep" / "d.txt").write_text("d")
+    output_path = tmp_path / "output"
+    _extract_incremental(resource, output_path)
+    part_path = output_path / "sub" / "deep" / "d.txt.json"
+    assert json.loads(part_path.read_text())["isPartOf"] == ["https://out.org/sub/dataset_metadata.json"]
+
+    (resource / "sub" / "hs_user_meta.json").unlink()
+    _extract_incremental(resource, output_path)
+
+    assert not (output_path / "sub" / "dataset_metadata.json").exists()
+    part = json.loads(part_path.read_text())
+    if root_dataset:
+        assert part["isPartOf"] == ["https://out.org/dataset_metadata.json"]
+    else:
+        assert "isPartOf" not in part
+
+    # the manifest records the new link, so a third run leaves the part as it is
+    _extract_incremental(resource, output_path)
+    assert json.loads(part_path.read_text()) == part
+
+
+def test_incremental_output_inside_input_is_not_extracted(text_extractor, resource):
+    output_path = resource / ".hs"
+    _extract_incremental(resource, output_path)
+    outputs = {path: path.stat().st_mtime_ns for path in output_path.rglob("*.json") if path.name != ".manifest.json"}
+
+    _extract_incremental(resource, output_path)
+
+    assert {path: path.stat().st_mtime_ns for path in outputs} == outputs
+    dataset = json.loads((output_path / "dataset_metadata.json").read_text())
+    assert [media["contentUrl"] for media in dataset["associatedMedia"]] == [
+        "https://in.org/a.txt",
+        "https://in.org/sub/b.txt",
+        "https://in.org/subling/c.txt",
+    ]
+
+
+@pytest.mark.parametrize("output", [".hs", ""])
+def test_checksum_cache_is_not_extracted(text_extractor, resource, output):
+    output_path = resource / output
+    _extract(resource, output_path, None)
+    assert (output_path / ".checksums.sqlite").exists()
+    # the second run lists the cache written by the first
+    _extract(resource, output_path, None)
+
+    dataset = json.loads((output_path / "dataset_metadata.json").read_text())
+    names = [media["name"] for media in dataset["associatedMedia"]]
+    assert not [name for name in names if name.startswith((".checksums.sqlite", ".manifest.json"))]
+    assert "a.txt" in names
+
+
+@pytest.mark.parametrize("max_pending", [1, 3])
+def test_list_and_extract_bounds_pending_tasks(text_extractor, resource, tmp_path, monkeypatch, max_pending):
+    for i in range(20):
+        (resource / "sub" / f"{i:02d}.txt").write_text(str(i))
+    pending = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def counted(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            with lock:
+                pending["now"] += 1
+                pending["peak"] = max(pending["peak"], pending["now"])
+            try:
+                time.sleep(0.001)
+                return func(*args)
+            finally:
+                with lock:
+                    pending["now"] -= 1
+
+        return wrapper
+
+    # the hashes and extractions run in threads, the extraction is followed by to_output_record
+    monkeypatch.setattr(FileMetadataRegistry, "file_metadata", counted(FileMetadataRegistry.file_metadata))
+    monkeypatch.setattr(hsextract_utils, "run_extraction_task", counted(hsextract_utils.run_extraction_task))
+    monkeypatch.setattr(hsextract_utils, "MAX_PENDING_TASKS", max_pending)
+    sink = MemorySink()
+    _extract(resource, tmp_path / "output", sink)
+
+    assert pending["peak"] <= max_pending
+    assert sink.records["sub/19.txt.json"]["isPartOf"] == ["https://out.org/sub/dataset_metadata.json"]
+    assert len(sink.records) == 25
+
+
+def test_list_and_extract_appending_sink(text_extractor, resource, tmp_path):
+    sink = MemorySink(rewritable=False)
+    _extract(resource, tmp_path / "output", sink)
+
+    assert sink.writes == [
+        "a.txt.json",
+        "dataset_metadata.json",
+        "sub/b.txt.json",
+        "sub/dataset_metadata.json",
+        "subling/c.txt.json",
+    ]
+    assert sink.records["sub/b.txt.json"]["isPartOf"] == ["https://out.org/sub/dataset_metadata.json"]
+
+
+def test_incremental_requires_local_sink(resource, tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(
+            list_and_extract(
+                str(resource),
+                str(tmp_path / "output"),
+                "https://in.org/",
+                "https://out.org/",
+                "hs_user_meta.json",
+                incremental=True,
+                sink=MemorySink(),
+            )
+        )
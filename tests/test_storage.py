@@ -0,0 +1,81 @@
+import pickle
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from hsextract.listing.storage import LocalStorage, S3Storage
+
+
+@pytest.fixture()
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="resource")
+        for key in ["data/b.txt", "data/a/c.txt", "data/.hidden/d.txt", "data/e/", "other/f.txt"]:
+            client.put_object(Bucket="resource", Key=key, Body=b"" if key.endswith("/") else b"0123456789")
+        yield client
+
+
+def test_s3_storage_lists_files_under_prefix(s3_client):
+    storage = S3Storage("resource", "data", client=s3_client)
+
+    listed_files = list(storage.list_files())
+
+    assert [f.path for f in listed_files] == ["a/c.txt", "b.txt"]
+    assert all(f.size == 10 and f.mtime_ns > 0 and f.version for f in listed_files)
+    assert [f.path for f in storage.list_files(include_hidden=True)] == [".hidden/d.txt", "a/c.txt", "b.txt"]
+
+
+def test_s3_storage_excludes_directories(s3_client):
+    storage = S3Storage("resource", "data", client=s3_client)
+
+    assert [f.path for f in storage.list_files(include_hidden=True, exclude=[".hidden"])] == ["a/c.txt", "b.txt"]
+    assert [f.path for f in storage.list_files(exclude=["b.txt"])] == ["a/c.txt"]
+
+
+def test_s3_storage_paginates(s3_client):
+    for i in range(1005):
+        s3_client.put_object(Bucket="resource", Key=f"many/{i:04d}.txt", Body=b"")
+
+    assert len(list(S3Storage("resource", "many", client=s3_client).list_files())) == 1005
+
+
+def test_s3_storage_read_range(s3_client):
+    storage = S3Storage("resource", "data/", client=s3_client)
+
+    assert storage.read_range("b.txt", 2, 3) == b"234"
+    assert storage.read_range("b.txt", 2, 0) == b""
+    assert storage.size("b.txt") == 10
+
+
+def test_s3_storage_pickles_without_its_client(s3_client):
+    storage = pickle.loads(pickle.dumps(S3Storage("resource", "data", client=s3_client)))
+
+    assert storage._client is None
+    assert storage.read_range("b.txt", 0, 2) == b"01"
+
+
+def test_local_storage(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "c.txt").write_bytes(b"0123456789")
+    (tmp_path / "b.txt").write_bytes(b"")
+
+    storage = LocalStorage(str(tmp_path))
+
+    assert [(f.path, f.size) for f in storage.list_files()] == [("a/c.txt", 10), ("b.txt", 0)]
+    assert storage.read_range("a/c.txt", 8, 5) == b"89"
+    assert storage.size("a/c.txt") == 10
+
+
+def test_local_storage_excludes_directories(tmp_path):
+    for path in ["a/c.txt", "out/a.json", "out/.manifest.json", "b.txt"]:
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_bytes(b"")
+
+    storage = LocalStorage(str(tmp_path))
+
+    assert [f.path for f in storage.list_files(include_hidden=True, exclude=["out"])] == ["a/c.txt", "b.txt"]